@@ -44,6 +44,7 @@ INSTALLED_APPS = [
 
 
 MIDDLEWARE = [
+    'locations.metrics.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -86,6 +87,73 @@ DATABASES = {
     }
 }
 
+# Set USE_POSTGRES=1 to run on PostgreSQL, configured from POSTGRES_*
+# variables (the migrations need the PostGIS extension, as in the
+# docker-compose.yml container). With USE_POSTGIS=1 proximity queries also
+# run in the database on GiST-indexed geography columns (see
+# locations/postgis.py).
+USE_POSTGIS = os.environ.get('USE_POSTGIS') == '1'
+USE_POSTGRES = USE_POSTGIS or os.environ.get('USE_POSTGRES') == '1'
+
+# Catalog reads are spread over the hosts in POSTGRES_REPLICA_HOSTS
+# ('host[:port],...'); see locations/routers.py.
+DATABASE_REPLICAS = []
+DATABASE_ROUTERS = ['locations.routers.ReadReplicaRouter']
+
+if USE_POSTGRES:
+    DATABASES['default'] = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.environ.get('POSTGRES_DB', 'chicago'),
+        'USER': os.environ.get('POSTGRES_USER', 'postgres'),
+        'PASSWORD': os.environ.get('POSTGRES_PASSWORD', 'postgres'),
+        'HOST': os.environ.get('POSTGRES_HOST', 'localhost'),
+        'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+        # Keep connections open between requests and check them before reuse
+        'CONN_MAX_AGE': int(os.environ.get('POSTGRES_CONN_MAX_AGE', 300)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'connect_timeout': int(os.environ.get('POSTGRES_CONNECT_TIMEOUT', 5)),
+        },
+    }
+    # A process-wide pool (psycopg 3 with psycopg_pool, see requirements.txt) replaces
+    # persistent per-thread connections, which suits ASGI workers better.
+    if os.environ.get('POSTGRES_POOL_MAX_SIZE'):
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.environ.get('POSTGRES_POOL_MIN_SIZE', 2)),
+            'max_size': int(os.environ['POSTGRES_POOL_MAX_SIZE']),
+            'timeout': int(os.environ.get('POSTGRES_POOL_TIMEOUT', 10)),
+        }
+    for number, replica in enumerate(filter(None, os.environ.get('POSTGRES_REPLICA_HOSTS', '').split(',')), start=1):
+        host, _, port = replica.strip().partition(':')
+        alias = f"replica{number}"
+        DATABASES[alias] = {
+            **DATABASES['default'],
+            'HOST': host,
+            'PORT': port or DATABASES['default']['PORT'],
+            'OPTIONS': dict(DATABASES['default']['OPTIONS']),
+            'TEST': {'MIRROR': 'default'},
+        }
+        DATABASE_REPLICAS.append(alias)
+
+
+# Django's cache holds the published catalog snapshot and per-client feed
+# state. Set CACHE_REDIS_URL (redis://host:port/db) to share them between
+# worker processes; the default local-memory cache keeps one copy per process.
+
+if os.environ.get('CACHE_REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['CACHE_REDIS_URL'],
+        }
+    }
+
+# The catalog version (see locations/catalog.py) is kept in the database;
+# each process rereads it at most once every this many seconds.
+
+CATALOG_VERSION_POLL_SECONDS = float(os.environ.get('CATALOG_VERSION_POLL_SECONDS', 1))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -125,4 +193,85 @@ STATIC_URL = 'static/'
 
 STATICFILES_DIRS = [
     os.path.join(BASE_DIR, 'reactapp/build/static'),
-]
\ No newline at end of file
+]
+
+STATIC_ROOT = os.environ.get('STATIC_ROOT', os.path.join(BASE_DIR, 'staticfiles'))
+
+# collectstatic writes .gz/.br variants next to each compressible file
+# (see locations/staticfiles.py)
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'locations.staticfiles.CompressedStaticFilesStorage',
+    },
+}
+
+# Serve the collected static files and the React index.html from Django
+# itself (on by default when DEBUG is off). index.html is revalidated after
+# STATIC_INDEX_MAX_AGE seconds.
+
+SERVE_STATIC = os.environ.get('SERVE_STATIC', '0' if DEBUG else '1') == '1'
+STATIC_INDEX_FILE = os.path.join(BASE_DIR, 'reactapp/build/index.html')
+STATIC_INDEX_MAX_AGE = 60
+
+# Google Maps response cache (see locations/cache.py)
+# Coordinates are rounded to PRECISION decimal places before keying, and each
+# endpoint keeps its entries for TTL seconds.
+
+GOOGLE_MAPS_CACHE = {
+    'PRECISION': 4,
+    'MAX_ENTRIES': 10000,
+    'PERSIST': True,
+    'TTL': {
+        'distancematrix': 24 * 60 * 60,
+        'directions': 6 * 60 * 60,
+        # opening hours go stale quickly
+        'place_details': 15 * 60,
+    },
+}
+
+# Stored opening hours (see locations/places.py) are evaluated in this time zone
+
+PLACE_TIME_ZONE = 'America/Chicago'
+
+# Add a Server-Timing header (Google, database and total time) to every response
+
+SERVER_TIMING_HEADERS = DEBUG
+
+# Clients (addresses or CIDR networks, comma-separated) allowed to read
+# /metrics. Behind a reverse proxy REMOTE_ADDR is the proxy's address, so
+# keep the endpoint off the public route rather than allowing the proxy.
+
+METRICS_ALLOWED_IPS = list(filter(None, os.environ.get('METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(',')))
+
+# Google Maps request budget (see locations/quota.py)
+# QPS limits apply per process; DAILY budgets can be shared by all processes
+# through the database with SHARED. Background work (place enrichment, matrix
+# builds) may only use BACKGROUND_DAILY_SHARE of each daily budget.
+
+GOOGLE_MAPS_QUOTA = {
+    'SHARED': os.environ.get('GOOGLE_MAPS_QUOTA_SHARED') == '1',
+    'LIMITS': {
+        'DEFAULT': {'QPS': 10, 'DAILY': None},
+        # Distance Matrix is counted in elements (origins x destinations), not requests
+        'distancematrix': {'QPS': 1000, 'DAILY': 20000},
+        'directions': {'QPS': 20, 'DAILY': 20000},
+        'place/nearbysearch': {'QPS': 10, 'DAILY': 5000},
+        'place/details': {'QPS': 10, 'DAILY': 5000},
+    },
+}
+
+# Precomputed POI x POI travel matrix (see locations/travel_matrix.py)
+
+TRAVEL_MATRIX_DIR = os.environ.get('TRAVEL_MATRIX_DIR', os.path.join(BASE_DIR, 'travel_matrix'))
+
+# Transit travel times: 'google' (Distance Matrix/Directions) or 'gtfs' (local
+# RAPTOR router over the static GTFS feed below, see locations/transit.py).
+# The feed is compiled with 'manage.py build_transit_timetable' (re-run it
+# after updating the feed); until then transit goes to Google.
+
+TRANSIT_BACKEND = os.environ.get('TRANSIT_BACKEND', 'google')
+GTFS_FEED_PATH = os.environ.get('GTFS_FEED_PATH', os.path.join(BASE_DIR, 'gtfs'))
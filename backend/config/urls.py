@@ -14,11 +14,24 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
 from django.contrib import admin
-from django.urls import path
+from django.urls import include, path, re_path
 from django.views.generic import TemplateView
 
+from locations.staticfiles import serve_static, spa_index
+from locations.views import metrics
+
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('', TemplateView.as_view(template_name='index.html')),
+    path('api/', include('locations.urls')),
+    path('metrics', metrics, name='metrics'),
 ]
+
+if settings.SERVE_STATIC:
+    urlpatterns += [
+        re_path(rf'^{settings.STATIC_URL.strip("/")}/(?P<path>.+)$', serve_static, name='static'),
+        path('', spa_index, name='spa-index'),
+    ]
+else:
+    urlpatterns.append(path('', TemplateView.as_view(template_name='index.html')))
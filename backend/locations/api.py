@@ -1,7 +1,39 @@
+import contextvars
 import logging
+import math
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
+from django.conf import settings
+
+from .cache import get_google_maps_cache
+from .geo import estimate_walking_minutes, haversine_km
+from .metrics import CATALOG_LATENCY, record_google_call, timed
 from .models import Architecture, Films, History, Music
+from .postgis import locations_within_radius, nearest_locations, postgis_enabled
+from .quota import get_google_maps_quota
+from .routing import solve_route
+from .spatial import IndexedLocation, get_loaded_spatial_index, get_spatial_index
+from .transit import get_transit_timetable, transit_elements, transit_route
+from .travel_matrix import get_travel_matrix, location_key
+
+
+GOOGLE_MAPS_API_URL = 'https://maps.googleapis.com/maps/api'
+GOOGLE_MAPS_TIMEOUT = 5
+# Distance Matrix accepts at most 25 origins or destinations and 100 elements per request
+DISTANCE_MATRIX_MAX_DESTINATIONS = 25
+DISTANCE_MATRIX_MAX_ELEMENTS = 100
+GOOGLE_MAPS_MAX_CONCURRENCY = 8
+# Modes requested by get_distance_matrix, in order of preference
+DISTANCE_MATRIX_MODES = ['transit', 'walking']
+COMMUTE_MODES = ['transit', 'walking']
+LOCATION_MODELS = (Architecture, Films, History, Music)
+# How many of the nearest locations get real travel times from Distance Matrix
+NEARBY_DEFAULT_LIMIT = 10
+# The origin plus this many stops still fits in one Distance Matrix row
+MAX_ROUTE_STOPS = 24
 
 
 def logger():
@@ -14,70 +46,277 @@ def get_google_maps_api_key():
         logger().warning("GOOGLE_MAPS_API_KEY not set in environment variables")
     return api_key
 
+def google_maps_api_url():
+    """Maps web services root; settings.GOOGLE_MAPS_API_URL points it elsewhere (e.g. a stand-in server)."""
+    return getattr(settings, 'GOOGLE_MAPS_API_URL', GOOGLE_MAPS_API_URL)
+
+def quota_units(endpoint, params):
+    """Quota units a call costs: Distance Matrix is limited and billed per element, everything else per request."""
+    if endpoint == 'distancematrix':
+        return len(params['origins'].split('|')) * len(params['destinations'].split('|'))
+    return 1
+
+def _google_get(endpoint, params):
+    """
+    Call a Google Maps web service endpoint and return the decoded JSON body.
+
+    Args:
+        endpoint (str): Endpoint path below the Maps API root, e.g. 'distancematrix'
+        params (dict): Query string parameters (including the API key)
+
+    Returns:
+        dict: Decoded response, or None on a non-200 response
+
+    Raises:
+        QuotaExceeded: The call was shed by the quota scheduler (see locations.quota)
+    """
+    quota = get_google_maps_quota()
+    quota.acquire(endpoint, quota_units(endpoint, params))
+    started = time.perf_counter()
+    try:
+        response = requests.get(
+            f"{google_maps_api_url()}/{endpoint}/json",
+            params=params,
+            timeout=GOOGLE_MAPS_TIMEOUT
+        )
+    except requests.Timeout:
+        record_google_call(endpoint, params.get('mode'), 'timeout', time.perf_counter() - started)
+        quota.report(endpoint, 'timeout')
+        raise
+    except requests.RequestException:
+        record_google_call(endpoint, params.get('mode'), 'error', time.perf_counter() - started)
+        raise
+    if response.status_code != 200:
+        record_google_call(endpoint, params.get('mode'), f"HTTP {response.status_code}", time.perf_counter() - started)
+        quota.report(endpoint, f"HTTP {response.status_code}")
+        logger().error(f"Google Maps {endpoint} returned HTTP {response.status_code}")
+        return None
+    data = response.json()
+    record_google_call(endpoint, params.get('mode'), data.get('status', 'OK'), time.perf_counter() - started)
+    quota.report(endpoint, data.get('status', 'OK'))
+    return data
+
+def describe_destination(dest):
+    """
+    Return ((lat, lon), name, id, type) for a model instance, IndexedLocation or (lat, lon) tuple.
+
+    Locations linked to a venue are routed to the venue's point, so entries
+    sharing a venue share one Distance Matrix element.
+    """
+    if isinstance(dest, LOCATION_MODELS):
+        dest = IndexedLocation(dest.__class__.__name__, dest.id, dest.name, dest.latitude, dest.longitude,
+                               None, dest.venue_id)
+    if isinstance(dest, IndexedLocation):
+        index = get_loaded_spatial_index()
+        point = (dest.latitude, dest.longitude) if index is None else index.routing_point(dest)
+        return point, dest.name, dest.id, dest.location_type
+    return (dest[0], dest[1]), None, None, None
+
+def distance_matrix_params(origins, destinations, mode, api_key):
+    return {
+        'origins': '|'.join(origins),
+        'destinations': '|'.join(destinations),
+        'key': api_key,
+        'mode': mode
+    }
+
+def parse_distance_matrix(data, mode):
+    """
+    Turn a Distance Matrix response into rows of elements.
+
+    Returns:
+        list: One row per origin, each with one element per destination
+              ({} where no route was found), or None if the request failed
+    """
+    if not data:
+        return None
+    if data['status'] != 'OK':
+        logger().error(f"Distance Matrix API returned {data['status']} for mode {mode}")
+        return None
+    return [
+        [element if element['status'] == 'OK' else {} for element in row['elements']]
+        for row in data['rows']
+    ]
+
+def _fetch_distance_matrix_batch(origins, destinations, mode, api_key):
+    """Fetch one multi-origin, multi-destination Distance Matrix request (see parse_distance_matrix)."""
+    try:
+        data = _google_get('distancematrix', distance_matrix_params(origins, destinations, mode, api_key))
+    except Exception as e:
+        logger().error(f"Error calling Distance Matrix API for mode {mode}: {str(e)}")
+        return None
+    return parse_distance_matrix(data, mode)
+
+def _plan_distance_matrix_batches(rows):
+    """
+    Pack the (mode, origin) -> destinations rows still needed into requests.
+
+    Origins that need the same destinations share a request, within the API
+    limits of 25 origins, 25 destinations and 100 elements per request.
+
+    Returns:
+        list: (mode, origins, destinations) tuples
+    """
+    groups = {}
+    for (mode, origin), destinations in rows.items():
+        groups.setdefault((mode, tuple(destinations)), []).append(origin)
+
+    batches = []
+    size = DISTANCE_MATRIX_MAX_DESTINATIONS
+    for (mode, destinations), origins in groups.items():
+        for start in range(0, len(destinations), size):
+            destination_batch = list(destinations[start:start + size])
+            origins_per_request = max(1, min(size, DISTANCE_MATRIX_MAX_ELEMENTS // len(destination_batch)))
+            for origin_start in range(0, len(origins), origins_per_request):
+                batches.append((mode, origins[origin_start:origin_start + origins_per_request], destination_batch))
+    return batches
+
+class DistanceMatrixRequest:
+    """
+    Cache keys and upstream batches for one origins x destinations x modes lookup.
+
+    Shared by the sync and async Distance Matrix clients.
+    """
+
+    def __init__(self, origin_points, destination_points, modes):
+        cache = get_google_maps_cache()
+        self.modes = modes
+        self.keys = {
+            mode: [
+                [cache.make_key('distancematrix', origin, destination, mode=mode) for destination in destination_points]
+                for origin in origin_points
+            ]
+            for mode in modes
+        }
+        self.requested = {}
+        for mode in modes:
+            for origin, row in zip(origin_points, self.keys[mode]):
+                for key, destination in zip(row, destination_points):
+                    self.requested[key] = (mode, cache.quantize(*origin), cache.quantize(*destination))
+        self.key_for = {request: key for key, request in self.requested.items()}
+
+    def batches(self, missing):
+        """Return the (mode, origins, destinations) requests needed for the missing keys."""
+        rows = {}
+        for key in missing:
+            mode, origin, destination = self.requested[key]
+            rows.setdefault((mode, origin), []).append(destination)
+        return _plan_distance_matrix_batches(rows)
+
+    def collect(self, batch, batch_rows, fetched):
+        """Map one batch's parsed rows back onto cache keys."""
+        mode, origins, destinations = batch
+        if batch_rows is None:
+            return
+        for origin, row in zip(origins, batch_rows):
+            for destination, element in zip(destinations, row):
+                fetched[self.key_for[(mode, origin, destination)]] = element
+
+    def rows(self, values):
+        """Arrange resolved values into mode -> rows of elements (None where unavailable)."""
+        return {
+            mode: [[values.get(key) or None for key in row] for row in self.keys[mode]]
+            for mode in self.modes
+        }
+
+def _fetch_distance_matrix(origin_points, destination_points, modes, api_key):
+    """
+    Fetch Distance Matrix elements for every origin, destination and mode.
+
+    Elements are looked up in the Google Maps cache first. The misses are
+    packed into multi-origin/multi-destination requests and every request
+    runs concurrently.
+
+    Returns:
+        dict: mode -> one row per origin point, each a list of elements aligned
+              with destination_points (None where no route is available, and
+              for every mode the local router does not answer when api_key is unset)
+    """
+    local = local_transit_rows(origin_points, destination_points, modes)
+    modes = [mode for mode in modes if mode not in local]
+    if not modes:
+        return local
+    if not api_key:
+        return {**no_routes(origin_points, destination_points, modes), **local}
+    request = DistanceMatrixRequest(origin_points, destination_points, modes)
+
+    def fetch_missing(missing):
+        batches = request.batches(missing)
+        fetched = {}
+        with ThreadPoolExecutor(max_workers=min(len(batches), GOOGLE_MAPS_MAX_CONCURRENCY)) as executor:
+            futures = {
+                executor.submit(
+                    contextvars.copy_context().run, _fetch_distance_matrix_batch, origins, destinations, mode, api_key
+                ):
+                    (mode, origins, destinations)
+                for mode, origins, destinations in batches
+            }
+            for future, batch in futures.items():
+                request.collect(batch, future.result(), fetched)
+        return fetched
+
+    values = get_google_maps_cache().get_many_or_fetch('distancematrix', list(request.requested), fetch_missing)
+    return {**request.rows(values), **local}
+
+def no_routes(origin_points, destination_points, modes):
+    """Rows of None for modes nothing can answer (see _fetch_distance_matrix)."""
+    return {mode: [[None] * len(destination_points) for _ in origin_points] for mode in modes}
+
+def local_transit_rows(origin_points, destination_points, modes):
+    """
+    Transit rows answered by the local GTFS router instead of Distance Matrix.
+
+    Returns:
+        dict: {'transit': rows} when transit is requested and the 'gtfs' backend
+              is enabled (see locations.transit), else {}; rows hold None where
+              a destination is out of reach, as _fetch_distance_matrix does
+    """
+    if 'transit' not in modes:
+        return {}
+    timetable = get_transit_timetable()
+    if timetable is None:
+        return {}
+    rows = transit_elements(timetable, origin_points, destination_points)
+    return {'transit': [[element if element['status'] == 'OK' else None for element in row] for row in rows]}
+
 def get_distance_matrix(origin_lat, origin_lon, destination_locations):
     """
     Get distances and travel times from origin to destinations using Google Maps Distance Matrix API.
+
+    Cached elements are reused; the rest are sent in batches of up to 25
+    destinations per request, with the transit and walking requests issued
+    side by side. With settings.TRANSIT_BACKEND = 'gtfs' transit times come
+    from the local GTFS router instead (see locations.transit).
     
     Args:
         origin_lat (float): User's latitude
         origin_lon (float): User's longitude
-        destination_locations (list): List of Location objects or tuples (lat, lon)
+        destination_locations (list): List of Location objects, IndexedLocations or tuples (lat, lon)
     
     Returns:
         list: List of dicts with 'location', 'distance_km', 'travel_time_min', 'travel_mode'
     """
     api_key = get_google_maps_api_key()
-    if not api_key:
+    # Without a key only the local transit router can answer
+    if not api_key and get_transit_timetable() is None:
         return []
     
+    described = [describe_destination(dest) for dest in destination_locations]
+    destinations = [point for point, _, _, _ in described]
+
+    # Distance Matrix API calls for transit (primary) and walking (secondary)
+    rows = _fetch_distance_matrix([(origin_lat, origin_lon)], destinations, DISTANCE_MATRIX_MODES, api_key)
+    return format_distance_results(described, rows)
+
+def format_distance_results(described, rows):
+    """Build get_distance_matrix's per-location dicts from described destinations and fetched rows."""
     results = []
-    origin = f"{origin_lat},{origin_lon}"
-    
-    for dest in destination_locations:
-        # Check if dest is one of our model instances
-        if isinstance(dest, (Architecture, Films, History, Music)):
-            destination = f"{dest.latitude},{dest.longitude}"
-            location_name = dest.name
-            location_id = dest.id
-            location_type = dest.__class__.__name__
-        else:
-            destination = f"{dest[0]},{dest[1]}"
-            location_name = None
-            location_id = None
-            location_type = None
-        
-        try:
-            # Distance Matrix API call for transit (primary) and walking (secondary)
-            transit_result = None
-            walking_result = None
-            
-            for mode in ['transit', 'walking']:
-                params = {
-                    'origins': origin,
-                    'destinations': destination,
-                    'key': api_key,
-                    'mode': mode
-                }
-                
-                response = requests.get(
-                    'https://maps.googleapis.com/maps/api/distancematrix/json',
-                    params=params,
-                    timeout=5
-                )
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    if data['status'] == 'OK':
-                        element = data['rows'][0]['elements'][0]
-                        if element['status'] == 'OK':
-                            if mode == 'transit' and transit_result is None:
-                                transit_result = (element, 'transit')
-                            elif mode == 'walking' and walking_result is None:
-                                walking_result = (element, 'walking')
-            
-            # Prefer transit, fallback to walking
-            if transit_result:
-                element, mode = transit_result
+    elements = {mode: mode_rows[0] for mode, mode_rows in rows.items()}
+    for index, (_, location_name, location_id, location_type) in enumerate(described):
+        # Prefer transit, fallback to walking
+        for mode in DISTANCE_MATRIX_MODES:
+            element = elements[mode][index]
+            if element is not None:
                 results.append({
                     'location_id': location_id,
                     'location_name': location_name,
@@ -88,28 +327,338 @@ def get_distance_matrix(origin_lat, origin_lon, destination_locations):
                     'travel_time_text': element['duration']['text'],
                     'travel_mode': mode
                 })
-            elif walking_result:
-                element, mode = walking_result
-                results.append({
-                    'location_id': location_id,
-                    'location_name': location_name,
-                    'location_type': location_type,
-                    'distance_km': element['distance']['value'] / 1000,
-                    'distance_text': element['distance']['text'],
-                    'travel_time_min': element['duration']['value'] / 60,
-                    'travel_time_text': element['duration']['text'],
-                    'travel_mode': mode
-                })
-            else:
-                logger().warning(f"No transit or walking route found for {location_name}")
-        except Exception as e:
-            logger().error(f"Error calling Distance Matrix API: {str(e)}")
+                break
+        else:
+            logger().warning(f"No transit or walking route found for {location_name}")
     
     return results
 
+def location_type_filter(location_type):
+    """Translate the optional location_type filter used across this module for the spatial index."""
+    return None if location_type is None else [location_type]
+
+def find_nearest_locations(latitude, longitude, limit=10, location_type=None, max_distance_km=None):
+    """
+    Find the nearest locations.
+
+    Runs as a KNN query in the database when PostGIS is enabled, otherwise
+    uses the in-process spatial index.
+
+    Args:
+        latitude (float): Search latitude
+        longitude (float): Search longitude
+        limit (int): Maximum number of locations to return
+        location_type (str, optional): Restrict to one location type
+        max_distance_km (float, optional): Ignore locations further away than this
+
+    Returns:
+        list: IndexedLocation tuples, nearest first
+    """
+    if postgis_enabled():
+        return nearest_locations(
+            latitude, longitude, limit=limit,
+            location_type=location_type, max_distance_km=max_distance_km
+        )
+    return get_spatial_index().nearest(
+        latitude, longitude, k=limit,
+        location_types=location_type_filter(location_type),
+        max_distance_km=max_distance_km
+    )
+
+def find_locations_within_radius(latitude, longitude, radius_km, location_type=None):
+    """
+    Find every location within radius_km.
+
+    Runs as an ST_DWithin query in the database when PostGIS is enabled,
+    otherwise uses the in-process spatial index.
+
+    Returns:
+        list: IndexedLocation tuples, nearest first
+    """
+    if postgis_enabled():
+        return locations_within_radius(latitude, longitude, radius_km, location_type=location_type)
+    return get_spatial_index().within_radius(
+        latitude, longitude, radius_km, location_types=location_type_filter(location_type)
+    )
+
+def find_locations_in_bbox(south, west, north, east, location_type=None):
+    """
+    Find every location inside a bounding box using the in-process spatial index.
+
+    Returns:
+        list: IndexedLocation tuples
+    """
+    return get_spatial_index().within_bbox(
+        south, west, north, east, location_types=location_type_filter(location_type)
+    )
+
+def get_nearby_travel_times(origin_lat, origin_lon, location_type=None, limit=NEARBY_DEFAULT_LIMIT, radius_km=None):
+    """
+    Estimate distances to every location and fetch real travel times for the nearest ones.
+
+    Every location gets an approximate straight-line distance and walking
+    time computed locally from the spatial index. Only the nearest `limit`
+    locations (optionally restricted to `radius_km`) are sent on to the
+    Distance Matrix API.
+
+    Args:
+        origin_lat (float): User's latitude
+        origin_lon (float): User's longitude
+        location_type (str, optional): Restrict to one location type
+        limit (int, optional): Number of nearest locations sent to Distance Matrix
+                               (None for NEARBY_DEFAULT_LIMIT)
+        radius_km (float, optional): Only send locations within this distance
+
+    Returns:
+        list: One dict per location, nearest first, with 'approx_distance_km' and
+              'approx_walking_time_min', plus the get_distance_matrix fields for
+              locations that were sent upstream
+    """
+    ranked = get_spatial_index().rank(origin_lat, origin_lon, location_type_filter(location_type))
+    candidates = nearby_candidates(ranked, limit, radius_km)
+    return format_nearby_results(ranked, get_distance_matrix(origin_lat, origin_lon, candidates))
+
+def nearby_candidates(ranked, limit, radius_km):
+    """
+    Pick the ranked locations that are worth a Distance Matrix lookup.
+
+    Entries sharing a venue cost one lookup between them, so `limit` counts
+    venues rather than entries. A `limit` of None means NEARBY_DEFAULT_LIMIT.
+    """
+    if limit is None:
+        limit = NEARBY_DEFAULT_LIMIT
+    candidates = []
+    if limit < 1:
+        return candidates
+    places = set()
+    for location in ranked:
+        if radius_km is not None and location.distance_km > radius_km:
+            continue
+        place = ('venue', location.venue_id) if location.venue_id else (location.location_type, location.id)
+        if place not in places:
+            if len(places) == limit:
+                break
+            places.add(place)
+        candidates.append(location)
+    return candidates
+
+def format_nearby_results(ranked, travel_time_results):
+    """Merge local distance estimates with the Distance Matrix results for the candidates."""
+    travel_times = {
+        (result['location_type'], result['location_id']): result
+        for result in travel_time_results
+    }
+    results = []
+    for location in ranked:
+        result = {
+            'location_id': location.id,
+            'location_name': location.name,
+            'location_type': location.location_type,
+            'venue_id': location.venue_id,
+            'latitude': location.latitude,
+            'longitude': location.longitude,
+            'approx_distance_km': round(location.distance_km, 3),
+            'approx_walking_time_min': round(estimate_walking_minutes(location.distance_km), 1),
+        }
+        result.update(travel_times.get((location.location_type, location.id), {}))
+        results.append(result)
+    return results
+
+def get_travel_time_matrix(origin_points, destination_points, mode='walking'):
+    """
+    Get a travel-time matrix between points from the Distance Matrix API.
+
+    Pairs without a route (or, when no API key is configured, every pair the
+    local transit router does not answer) fall back to a straight-line
+    walking estimate, so every cell has a value.
+
+    Args:
+        origin_points (list): (lat, lon) tuples
+        destination_points (list): (lat, lon) tuples
+        mode (str): Distance Matrix travel mode
+
+    Returns:
+        tuple: (durations in minutes, distances in km, number of estimated cells),
+               each matrix as one row per origin
+    """
+    api_key = get_google_maps_api_key()
+    rows = None
+    if origin_points and destination_points:
+        rows = _fetch_distance_matrix(origin_points, destination_points, [mode], api_key)[mode]
+
+    durations = []
+    distances = []
+    estimated = 0
+    for i, origin in enumerate(origin_points):
+        duration_row = []
+        distance_row = []
+        for j, destination in enumerate(destination_points):
+            element = rows[i][j] if rows else None
+            if element is not None:
+                duration_row.append(element['duration']['value'] / 60)
+                distance_row.append(element['distance']['value'] / 1000)
+            else:
+                distance = haversine_km(origin[0], origin[1], destination[0], destination[1])
+                duration_row.append(estimate_walking_minutes(distance))
+                distance_row.append(distance)
+                estimated += 1
+        durations.append(duration_row)
+        distances.append(distance_row)
+    return durations, distances, estimated
+
+def _fill_unroutable(durations, distances, points):
+    """Replace precomputed cells without a route (inf) by the walking estimate, as get_travel_time_matrix does."""
+    estimated = 0
+    for i, row in enumerate(durations):
+        for j, value in enumerate(row):
+            if math.isinf(value):
+                distance = haversine_km(points[i][0], points[i][1], points[j][0], points[j][1])
+                row[j] = estimate_walking_minutes(distance)
+                distances[i][j] = distance
+                estimated += 1
+    return durations, distances, estimated
+
+def plan_route(origin_lat, origin_lon, stops, mode='walking'):
+    """
+    Plan the fastest order to visit a set of locations from the user's position.
+
+    Only the legs from the user's position are fetched (mostly from cache);
+    legs between stops come from the precomputed travel matrix (see
+    locations.travel_matrix) when it covers them. The visiting order is
+    solved locally.
+
+    Args:
+        origin_lat (float): User's latitude
+        origin_lon (float): User's longitude
+        stops (list): (location_type, location_id) pairs to visit
+        mode (str): Travel mode used for every leg
+
+    Returns:
+        dict: 'stops' in visiting order with per-leg and cumulative times,
+              'total_duration_min', 'total_distance_km', 'optimal' and 'estimated_legs'
+    """
+    index = get_spatial_index()
+    locations = []
+    for location_type, location_id in dict.fromkeys(stops):
+        location = index.get(location_type, location_id)
+        if location is None:
+            raise ValueError(f"Unknown location {location_type}:{location_id}")
+        locations.append(location)
+    if len(locations) > MAX_ROUTE_STOPS:
+        raise ValueError(f"A route can have at most {MAX_ROUTE_STOPS} stops")
+
+    stop_points = [index.routing_point(location) for location in locations]
+    durations, distances, estimated = get_travel_time_matrix([(origin_lat, origin_lon)], stop_points, mode)
+    # Legs between stops come from the precomputed matrix when it covers them
+    precomputed = get_travel_matrix(mode).legs(
+        [location_key(location.location_type, location.id, location.venue_id) for location in locations],
+        stop_points,
+    )
+    if precomputed is None:
+        stop_durations, stop_distances, stop_estimated = get_travel_time_matrix(stop_points, stop_points, mode)
+    else:
+        stop_durations, stop_distances, stop_estimated = _fill_unroutable(*precomputed, stop_points)
+    estimated += stop_estimated
+    durations += stop_durations
+    distances += stop_distances
+    # Column 0 (back to the origin) is never used by an open route
+    matrix = [[0] + row for row in durations]
+    order, optimal = solve_route(matrix)
+
+    legs = []
+    elapsed = 0
+    total_distance = 0
+    previous = 0
+    for node in order:
+        leg_duration = durations[previous][node - 1]
+        leg_distance = distances[previous][node - 1]
+        elapsed += leg_duration
+        total_distance += leg_distance
+        location = locations[node - 1]
+        legs.append({
+            'location_id': location.id,
+            'location_name': location.name,
+            'location_type': location.location_type,
+            'latitude': location.latitude,
+            'longitude': location.longitude,
+            'leg_duration_min': round(leg_duration, 1),
+            'leg_distance_km': round(leg_distance, 3),
+            'arrival_min': round(elapsed, 1),
+        })
+        previous = node
+
+    logger().info(f"Planned {mode} route through {len(legs)} stops ({elapsed:.1f} min)")
+    return {
+        'travel_mode': mode,
+        'stops': legs,
+        'total_duration_min': round(elapsed, 1),
+        'total_distance_km': round(total_distance, 3),
+        'optimal': optimal,
+        'estimated_legs': estimated,
+    }
+
+def _nearby_search_params(latitude, longitude, api_key):
+    return {
+        'location': f"{latitude},{longitude}",
+        'radius': 100,  # 100 meters
+        'key': api_key
+    }
+
+def _parse_nearby_search(data):
+    """Return the first place_id from a Nearby Search response, '' if none, or None on failure."""
+    if not data or data['status'] not in ('OK', 'ZERO_RESULTS'):
+        return None
+    if not data['results']:
+        return ''
+    return data['results'][0]['place_id']
+
+def _place_details_params(place_id, api_key):
+    return {
+        'place_id': place_id,
+        'fields': 'opening_hours,rating,review,formatted_address,photos',
+        'key': api_key
+    }
+
+def _parse_place_details(data):
+    """Return the summary dict from a Place Details response, or None on failure."""
+    if not data or data['status'] != 'OK':
+        return None
+    result = data.get('result', {})
+    return {
+        'opening_hours': result.get('opening_hours'),
+        'is_open': result.get('opening_hours', {}).get('open_now'),
+        'rating': result.get('rating'),
+        'reviews': result.get('reviews'),
+        'formatted_address': result.get('formatted_address')
+    }
+
+def _fetch_place_details(latitude, longitude, api_key):
+    """
+    Run the Nearby Search -> Place Details chain for a coordinate.
+
+    Returns:
+        dict: Place details ({} if no place was found), or None if a request failed
+    """
+    try:
+        # First, find place ID using Nearby Search or Place API
+        place_id = _parse_nearby_search(
+            _google_get('place/nearbysearch', _nearby_search_params(latitude, longitude, api_key))
+        )
+        if not place_id:
+            return None if place_id is None else {}
+        
+        # Get detailed information
+        return _parse_place_details(_google_get('place/details', _place_details_params(place_id, api_key)))
+    except Exception as e:
+        logger().error(f"Error calling Place Details API: {str(e)}")
+    
+    return None
+
 def get_place_details(latitude, longitude):
     """
     Get place details including opening hours using Google Maps Place Details API.
+
+    Results are cached per quantized coordinate (see locations.cache).
     
     Args:
         latitude (float): Place latitude
@@ -122,57 +671,102 @@ def get_place_details(latitude, longitude):
     if not api_key:
         return {}
     
-    try:
-        # First, find place ID using Nearby Search or Place API
-        params = {
-            'location': f"{latitude},{longitude}",
-            'radius': 100,  # 100 meters
-            'key': api_key
+    cache = get_google_maps_cache()
+    key = cache.make_key('place_details', (latitude, longitude))
+    details = cache.get_or_fetch(
+        'place_details', key, lambda: _fetch_place_details(latitude, longitude, api_key)
+    )
+    return details or {}
+
+def directions_params(origin, destination, mode, api_key):
+    return {
+        'origin': origin,
+        'destination': destination,
+        'mode': mode,
+        'key': api_key,
+        'alternatives': 'true'  # Get alternative routes
+    }
+
+def parse_directions(data, mode):
+    """
+    Summarise the best route of a Directions response.
+
+    Returns:
+        dict: Route summary ({} if there is no route), or None if the request failed
+    """
+    if not data:
+        return None
+    if data['status'] == 'OK' and data['routes']:
+        # Get the best (first) route
+        route = data['routes'][0]
+        return {
+            'distance_km': route['legs'][0]['distance']['value'] / 1000,
+            'distance_text': route['legs'][0]['distance']['text'],
+            'duration_min': route['legs'][0]['duration']['value'] / 60,
+            'duration_text': route['legs'][0]['duration']['text'],
+            'steps': len(route['legs'][0]['steps']),
+            'polyline': route['overview_polyline']['points']  # For map visualization
         }
-        
-        response = requests.get(
-            'https://maps.googleapis.com/maps/api/place/nearbysearch/json',
-            params=params,
-            timeout=5
+    if data['status'] == 'ZERO_RESULTS':
+        return {}
+    logger().error(f"Directions API returned {data['status']} for mode {mode}")
+    return None
+
+def _fetch_directions(origin, destination, mode, api_key):
+    """Fetch the best Directions API route for one mode (see parse_directions)."""
+    try:
+        return parse_directions(
+            _google_get('directions', directions_params(origin, destination, mode, api_key)), mode
         )
-        
-        if response.status_code == 200:
-            data = response.json()
-            if data['status'] == 'OK' and data['results']:
-                place_id = data['results'][0]['place_id']
-                
-                # Get detailed information
-                details_params = {
-                    'place_id': place_id,
-                    'fields': 'opening_hours,rating,review,formatted_address,photos',
-                    'key': api_key
-                }
-                
-                details_response = requests.get(
-                    'https://maps.googleapis.com/maps/api/place/details/json',
-                    params=details_params,
-                    timeout=5
-                )
-                
-                if details_response.status_code == 200:
-                    details_data = details_response.json()
-                    if details_data['status'] == 'OK':
-                        result = details_data.get('result', {})
-                        return {
-                            'opening_hours': result.get('opening_hours'),
-                            'is_open': result.get('opening_hours', {}).get('open_now'),
-                            'rating': result.get('rating'),
-                            'reviews': result.get('reviews'),
-                            'formatted_address': result.get('formatted_address')
-                        }
     except Exception as e:
-        logger().error(f"Error calling Place Details API: {str(e)}")
+        logger().error(f"Error calling Directions API for mode {mode}: {str(e)}")
+    return None
+
+def local_commute_routes(origin_point, destination_point, keys):
+    """Commute routes the local GTFS router answers, by Directions cache key ({} for the Google backend)."""
+    timetable = get_transit_timetable()
+    if timetable is None:
+        return {}
+    return {
+        key: transit_route(timetable, origin_point, destination_point)
+        for key, mode in keys.items() if mode == 'transit'
+    }
+
+def commute_keys(origin_point, destination_point):
+    """Map each commute mode's Directions cache key to its mode."""
+    cache = get_google_maps_cache()
+    return {
+        cache.make_key('directions', origin_point, destination_point, mode=mode): mode
+        for mode in COMMUTE_MODES
+    }
+
+def best_commute(keys, cached):
+    """
+    Pick the fastest mode from the cached per-mode routes.
+
+    Every option keeps Google's full overview polyline; zoom-simplified
+    geometry is served by the route geometry endpoint.
+    """
+    results = {keys[key]: route for key, route in cached.items() if route}
+    
+    # Return best commute (lowest duration)
+    if results:
+        best_mode = min(results.keys(), key=lambda x: results[x]['duration_min'])
+        return {
+            'best_commute_mode': best_mode,
+            'best_commute': results[best_mode],
+            'all_options': results
+        }
     
     return {}
 
 def get_best_commute_options(origin_lat, origin_lon, destination_lat, destination_lon):
     """
     Get best commute options between two locations using Google Maps Directions API.
+
+    Each mode's route is cached per quantized origin/destination pair, and
+    uncached modes are requested concurrently. With settings.TRANSIT_BACKEND
+    = 'gtfs' the transit route is planned locally (see locations.transit).
     
     Args:
         origin_lat (float): Origin latitude
@@ -184,80 +778,73 @@ def get_best_commute_options(origin_lat, origin_lon, destination_lat, destinatio
         dict: Best commute options with alternatives (driving, transit, walking, bicycling)
     """
     api_key = get_google_maps_api_key()
+    cache = get_google_maps_cache()
+    origin = cache.quantize(origin_lat, origin_lon)
+    destination = cache.quantize(destination_lat, destination_lon)
+    keys = commute_keys((origin_lat, origin_lon), (destination_lat, destination_lon))
+    local = local_commute_routes((origin_lat, origin_lon), (destination_lat, destination_lon), keys)
+
+    def fetch_missing(missing):
+        with ThreadPoolExecutor(max_workers=len(missing)) as executor:
+            futures = {
+                key: executor.submit(
+                    contextvars.copy_context().run, _fetch_directions, origin, destination, keys[key], api_key
+                )
+                for key in missing
+            }
+            return {key: future.result() for key, future in futures.items()}
+
+    # Without a key only the locally planned modes are available
+    remote = [key for key in keys if key not in local] if api_key else []
+    cached = cache.get_many_or_fetch('directions', remote, fetch_missing) if remote else {}
+    return best_commute(keys, {**cached, **local})
+
+def get_route(origin_lat, origin_lon, destination_lat, destination_lon, mode):
+    """
+    Get the best Directions route for one mode.
+
+    Shares its cache entries with get_best_commute_options, so drawing a
+    route that was already compared needs no upstream call.
+
+    Returns:
+        dict: Route summary with the full 'polyline' ({} if there is no route)
+    """
+    timetable = get_transit_timetable() if mode == 'transit' else None
+    if timetable is not None:
+        return transit_route(timetable, (origin_lat, origin_lon), (destination_lat, destination_lon))
+    api_key = get_google_maps_api_key()
     if not api_key:
         return {}
-    
-    origin = f"{origin_lat},{origin_lon}"
-    destination = f"{destination_lat},{destination_lon}"
-    
-    commute_modes = ['transit', 'walking']
-    results = {}
-    
-    for mode in commute_modes:
-        try:
-            params = {
-                'origin': origin,
-                'destination': destination,
-                'mode': mode,
-                'key': api_key,
-                'alternatives': 'true'  # Get alternative routes
-            }
-            
-            response = requests.get(
-                'https://maps.googleapis.com/maps/api/directions/json',
-                params=params,
-                timeout=5
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                if data['status'] == 'OK' and data['routes']:
-                    # Get the best (first) route
-                    route = data['routes'][0]
-                    results[mode] = {
-                        'distance_km': route['legs'][0]['distance']['value'] / 1000,
-                        'distance_text': route['legs'][0]['distance']['text'],
-                        'duration_min': route['legs'][0]['duration']['value'] / 60,
-                        'duration_text': route['legs'][0]['duration']['text'],
-                        'steps': len(route['legs'][0]['steps']),
-                        'polyline': route['overview_polyline']['points']  # For map visualization
-                    }
-        except Exception as e:
-            logger().error(f"Error calling Directions API for mode {mode}: {str(e)}")
-    
-    # Return best commute (lowest duration)
-    if results:
-        best_mode = min(results.keys(), key=lambda x: results[x]['duration_min'])
-        return {
-            'best_commute_mode': best_mode,
-            'best_commute': results[best_mode],
-            'all_options': results
-        }
-    
-    return {}
+    cache = get_google_maps_cache()
+    origin = cache.quantize(origin_lat, origin_lon)
+    destination = cache.quantize(destination_lat, destination_lon)
+    key = cache.make_key('directions', (origin_lat, origin_lon), (destination_lat, destination_lon), mode=mode)
+    route = cache.get_or_fetch('directions', key, lambda: _fetch_directions(origin, destination, mode, api_key))
+    return route or {}
 
-def get_all_locations(location_type=None):
+def get_all_locations(location_type=None, include_fact=False):
     """
     Get all locations from all models or filter by specific type.
-    
+
+    The `fact` column is deferred unless asked for, so listing the catalog
+    does not read every location's long text.
+
     Args:
         location_type (str, optional): Filter by location type ('Architecture', 'Films', 'History', 'Music')
                                       If None, returns all locations
-    
+        include_fact (bool): Also load each location's fact text
+
     Returns:
         list: Combined list of all location objects
     """
     locations = []
-    
-    if location_type is None or location_type == 'Architecture':
-        locations.extend(list(Architecture.objects.all()))
-    if location_type is None or location_type == 'Films':
-        locations.extend(list(Films.objects.all()))
-    if location_type is None or location_type == 'History':
-        locations.extend(list(History.objects.all()))
-    if location_type is None or location_type == 'Music':
-        locations.extend(list(Music.objects.all()))
-    
+
+    with timed(CATALOG_LATENCY, 'get_all_locations'):
+        for model in LOCATION_MODELS:
+            if location_type is None or location_type == model.__name__:
+                queryset = model.objects.order_by('id')
+                locations.extend(queryset if include_fact else queryset.defer('fact'))
+
     logger().info(f"Retrieved {len(locations)} locations")
     return locations
 
@@ -0,0 +1,174 @@
+import asyncio
+import logging
+import time
+import weakref
+
+import httpx
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from . import api
+from .cache import get_google_maps_cache
+from .metrics import record_google_call
+from .quota import get_google_maps_quota
+from .spatial import get_spatial_index
+from .transit import get_transit_timetable
+
+
+# Upper bound on in-flight Google requests per event loop
+DEFAULT_ASYNC_CONCURRENCY = 32
+
+
+def logger():
+    return logging.getLogger(__name__)
+
+
+class AsyncGoogleMapsClient:
+    """
+    asyncio client for the Google Maps web services.
+
+    All requests share one connection pool and a semaphore, so any number
+    of concurrent views can fan out without exceeding the concurrency bound.
+    """
+
+    def __init__(self, max_concurrency=DEFAULT_ASYNC_CONCURRENCY):
+        self._client = httpx.AsyncClient(
+            timeout=api.GOOGLE_MAPS_TIMEOUT,
+            limits=httpx.Limits(max_connections=max_concurrency),
+        )
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def get(self, endpoint, params):
+        """Async counterpart of api._google_get."""
+        quota = get_google_maps_quota()
+        await quota.aacquire(endpoint, api.quota_units(endpoint, params))
+        async with self._semaphore:
+            started = time.perf_counter()
+            try:
+                response = await self._client.get(f"{api.google_maps_api_url()}/{endpoint}/json", params=params)
+            except httpx.TimeoutException:
+                record_google_call(endpoint, params.get('mode'), 'timeout', time.perf_counter() - started)
+                quota.report(endpoint, 'timeout')
+                raise
+            except httpx.HTTPError:
+                record_google_call(endpoint, params.get('mode'), 'error', time.perf_counter() - started)
+                raise
+        if response.status_code != 200:
+            record_google_call(endpoint, params.get('mode'), f"HTTP {response.status_code}", time.perf_counter() - started)
+            quota.report(endpoint, f"HTTP {response.status_code}")
+            logger().error(f"Google Maps {endpoint} returned HTTP {response.status_code}")
+            return None
+        data = response.json()
+        record_google_call(endpoint, params.get('mode'), data.get('status', 'OK'), time.perf_counter() - started)
+        quota.report(endpoint, data.get('status', 'OK'))
+        return data
+
+    async def aclose(self):
+        await self._client.aclose()
+
+
+_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_client():
+    """Return the AsyncGoogleMapsClient bound to the running event loop."""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = AsyncGoogleMapsClient(
+            getattr(settings, 'GOOGLE_MAPS_ASYNC_CONCURRENCY', DEFAULT_ASYNC_CONCURRENCY)
+        )
+        _clients[loop] = client
+    return client
+
+
+async def _fetch_distance_matrix_batch(origins, destinations, mode, api_key):
+    try:
+        data = await get_async_client().get(
+            'distancematrix', api.distance_matrix_params(origins, destinations, mode, api_key)
+        )
+    except Exception as e:
+        logger().error(f"Error calling Distance Matrix API for mode {mode}: {str(e)}")
+        return None
+    return api.parse_distance_matrix(data, mode)
+
+
+async def _fetch_distance_matrix(origin_points, destination_points, modes, api_key):
+    """Async counterpart of api._fetch_distance_matrix."""
+    local = await sync_to_async(api.local_transit_rows)(origin_points, destination_points, modes)
+    modes = [mode for mode in modes if mode not in local]
+    if not modes:
+        return local
+    if not api_key:
+        return {**api.no_routes(origin_points, destination_points, modes), **local}
+    request = api.DistanceMatrixRequest(origin_points, destination_points, modes)
+
+    async def fetch_missing(missing):
+        batches = request.batches(missing)
+        batch_rows = await asyncio.gather(*(
+            _fetch_distance_matrix_batch(origins, destinations, mode, api_key)
+            for mode, origins, destinations in batches
+        ))
+        fetched = {}
+        for batch, rows in zip(batches, batch_rows):
+            request.collect(batch, rows, fetched)
+        return fetched
+
+    values = await get_google_maps_cache().aget_many_or_fetch(
+        'distancematrix', list(request.requested), fetch_missing
+    )
+    return {**request.rows(values), **local}
+
+
+async def aget_distance_matrix(origin_lat, origin_lon, destination_locations):
+    """Async counterpart of api.get_distance_matrix."""
+    api_key = api.get_google_maps_api_key()
+    if not api_key and await sync_to_async(get_transit_timetable)() is None:
+        return []
+    described = [api.describe_destination(dest) for dest in destination_locations]
+    destinations = [point for point, _, _, _ in described]
+    rows = await _fetch_distance_matrix(
+        [(origin_lat, origin_lon)], destinations, api.DISTANCE_MATRIX_MODES, api_key
+    )
+    return api.format_distance_results(described, rows)
+
+
+async def aget_nearby_travel_times(origin_lat, origin_lon, location_type=None,
+                                   limit=api.NEARBY_DEFAULT_LIMIT, radius_km=None):
+    """Async counterpart of api.get_nearby_travel_times."""
+    index = await sync_to_async(get_spatial_index)()
+    # Ranking sorts the whole catalog, so it runs off the event loop
+    ranked = await sync_to_async(index.rank, thread_sensitive=False)(
+        origin_lat, origin_lon, api.location_type_filter(location_type)
+    )
+    candidates = api.nearby_candidates(ranked, limit, radius_km)
+    return api.format_nearby_results(ranked, await aget_distance_matrix(origin_lat, origin_lon, candidates))
+
+
+async def aget_best_commute_options(origin_lat, origin_lon, destination_lat, destination_lon):
+    """Async counterpart of api.get_best_commute_options."""
+    api_key = api.get_google_maps_api_key()
+    cache = get_google_maps_cache()
+    origin = cache.quantize(origin_lat, origin_lon)
+    destination = cache.quantize(destination_lat, destination_lon)
+    keys = api.commute_keys((origin_lat, origin_lon), (destination_lat, destination_lon))
+    local = await sync_to_async(api.local_commute_routes)(
+        (origin_lat, origin_lon), (destination_lat, destination_lon), keys
+    )
+    client = get_async_client()
+
+    async def fetch_mode(mode):
+        try:
+            data = await client.get('directions', api.directions_params(origin, destination, mode, api_key))
+            return api.parse_directions(data, mode)
+        except Exception as e:
+            logger().error(f"Error calling Directions API for mode {mode}: {str(e)}")
+            return None
+
+    async def fetch_missing(missing):
+        routes = await asyncio.gather(*(fetch_mode(keys[key]) for key in missing))
+        return dict(zip(missing, routes))
+
+    remote = [key for key in keys if key not in local] if api_key else []
+    cached = await cache.aget_many_or_fetch('directions', remote, fetch_missing) if remote else {}
+    return api.best_commute(keys, {**cached, **local})
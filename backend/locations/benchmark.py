@@ -0,0 +1,231 @@
+"""
+Latency benchmark for the Google Maps API layer.
+
+FakeGoogleMapsServer is a local stand-in for the Distance Matrix, Places
+and Directions endpoints with configurable latency, error rate and payload
+size. run_scenario drives one api function from many simulated users and
+reports latency percentiles and upstream call counts. See the
+benchmark_api management command.
+"""
+import json
+import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from .geometry import encode_polyline
+
+
+# Rough bounding box of Chicago (south, west, north, east)
+CHICAGO_BBOX = (41.64, -87.94, 42.02, -87.52)
+ROUTE_POINTS = 200
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, round(p / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def random_point(rng, bbox=CHICAGO_BBOX):
+    south, west, north, east = bbox
+    return rng.uniform(south, north), rng.uniform(west, east)
+
+
+class _FakeGoogleHandler(BaseHTTPRequestHandler):
+    """Answers Maps web service requests with synthetic but well-formed bodies."""
+
+    def do_GET(self):
+        server = self.server
+        url = urlparse(self.path)
+        params = {name: values[0] for name, values in parse_qs(url.query).items()}
+        endpoint = url.path.strip('/').removesuffix('/json')
+        server.count(endpoint)
+
+        delay = server.latency + server.rng_uniform(0, server.jitter)
+        if delay > 0:
+            time.sleep(delay)
+        if server.rng_uniform(0, 1) < server.error_rate:
+            self._send(500, {'status': 'UNKNOWN_ERROR'})
+            return
+
+        body = {
+            'distancematrix': self._distance_matrix,
+            'directions': self._directions,
+            'place/nearbysearch': self._nearby_search,
+            'place/details': self._place_details,
+        }.get(endpoint)
+        if body is None:
+            self._send(404, {'status': 'NOT_FOUND'})
+            return
+        payload = body(params)
+        if server.padding:
+            payload['padding'] = server.padding
+        self._send(200, payload)
+
+    def _distance_matrix(self, params):
+        origins = params.get('origins', '').split('|')
+        destinations = params.get('destinations', '').split('|')
+        rows = []
+        for _ in origins:
+            elements = []
+            for number, _ in enumerate(destinations, start=1):
+                elements.append({
+                    'status': 'OK',
+                    'distance': {'value': 400 * number, 'text': f"{0.4 * number:.1f} km"},
+                    'duration': {'value': 300 * number, 'text': f"{5 * number} mins"},
+                })
+            rows.append({'elements': elements})
+        return {'status': 'OK', 'rows': rows}
+
+    def _directions(self, params):
+        origin_lat, origin_lon = (float(value) for value in params['origin'].split(','))
+        destination_lat, destination_lon = (float(value) for value in params['destination'].split(','))
+        steps = ROUTE_POINTS - 1
+        latitudes = [origin_lat + (destination_lat - origin_lat) * i / steps for i in range(ROUTE_POINTS)]
+        longitudes = [origin_lon + (destination_lon - origin_lon) * i / steps + (i % 2) * 1e-4
+                      for i in range(ROUTE_POINTS)]
+        duration = 900 if params.get('mode') == 'walking' else 600
+        return {'status': 'OK', 'routes': [{
+            'legs': [{
+                'distance': {'value': 1500, 'text': '1.5 km'},
+                'duration': {'value': duration, 'text': f"{duration // 60} mins"},
+                'steps': [{}] * 5,
+            }],
+            'overview_polyline': {'points': encode_polyline(latitudes, longitudes)},
+        }]}
+
+    def _nearby_search(self, params):
+        return {'status': 'OK', 'results': [{'place_id': f"place-{params.get('location')}"}]}
+
+    def _place_details(self, params):
+        return {'status': 'OK', 'result': {
+            'place_id': params.get('place_id'),
+            'rating': 4.5,
+            'formatted_address': '121 N LaSalle St, Chicago, IL 60602',
+            'opening_hours': {
+                'open_now': True,
+                'periods': [{'open': {'day': day, 'time': '0900'}, 'close': {'day': day, 'time': '1700'}}
+                            for day in range(7)],
+                'weekday_text': [],
+            },
+        }}
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeGoogleMapsServer(ThreadingHTTPServer):
+    """
+    Local stand-in for the Google Maps web services.
+
+    Args:
+        latency (float): Seconds added to every response
+        jitter (float): Up to this many extra seconds, uniformly distributed
+        error_rate (float): Fraction of requests answered with HTTP 500
+        payload_bytes (int): Extra bytes of padding in every response body
+    """
+
+    daemon_threads = True
+
+    def __init__(self, latency=0.05, jitter=0.0, error_rate=0.0, payload_bytes=0, seed=0):
+        super().__init__(('127.0.0.1', 0), _FakeGoogleHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.padding = 'x' * payload_bytes
+        self.calls = Counter()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def rng_uniform(self, low, high):
+        with self._lock:
+            return self._rng.uniform(low, high)
+
+    def count(self, endpoint):
+        with self._lock:
+            self.calls[endpoint] += 1
+
+    def reset_calls(self):
+        with self._lock:
+            calls = dict(self.calls)
+            self.calls.clear()
+        return calls
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
+
+
+def run_scenario(call, users, requests_per_user, on_thread_exit=None):
+    """
+    Run `call(user, number)` requests_per_user times from each of `users` threads.
+
+    Returns:
+        dict: Request and error counts, latency percentiles (ms) and throughput
+    """
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def simulate(user):
+        nonlocal errors
+        local = []
+        failed = 0
+        try:
+            for number in range(requests_per_user):
+                started = time.perf_counter()
+                try:
+                    if not call(user, number):
+                        failed += 1
+                except Exception:
+                    failed += 1
+                local.append((time.perf_counter() - started) * 1000)
+        finally:
+            if on_thread_exit:
+                on_thread_exit()
+        with lock:
+            latencies.extend(local)
+            errors += failed
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=users) as executor:
+        list(executor.map(simulate, range(users)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'latency_ms': {
+            'p50': round(percentile(latencies, 50), 3),
+            'p95': round(percentile(latencies, 95), 3),
+            'p99': round(percentile(latencies, 99), 3),
+            'mean': round(sum(latencies) / len(latencies), 3),
+            'max': round(latencies[-1], 3),
+        },
+        'throughput_rps': round(len(latencies) / elapsed, 1) if elapsed else None,
+    }
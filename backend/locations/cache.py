@@ -0,0 +1,277 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DatabaseError
+
+from .metrics import CACHE_LOOKUPS
+from .models import CachedResponse
+
+
+DEFAULT_CACHE_SETTINGS = {
+    'PRECISION': 4,          # decimal places kept from coordinates (~11 m)
+    'MAX_ENTRIES': 10000,    # in-process LRU bound
+    'PERSIST': True,         # back the LRU with the CachedResponse table
+    'WAIT_TIMEOUT': 10,      # seconds a coalesced caller waits for the leader
+    'TTL': {
+        'distancematrix': 24 * 60 * 60,
+        'directions': 6 * 60 * 60,
+        'place_details': 15 * 60,
+    },
+    'DEFAULT_TTL': 60 * 60,
+}
+
+# Persisted rows are swept once every this many writes
+PURGE_EVERY = 500
+
+
+def logger():
+    return logging.getLogger(__name__)
+
+
+class GoogleMapsCache:
+    """
+    Two-level cache for Google Maps responses.
+
+    Entries live in a bounded in-process LRU backed by the CachedResponse
+    table, so they survive restarts and are shared between workers. Keys are
+    built from quantized coordinates so nearby requests share entries, and
+    concurrent lookups of the same missing key are coalesced into a single
+    upstream call.
+    """
+
+    def __init__(self, precision=4, max_entries=10000, ttls=None, default_ttl=3600,
+                 persist=True, wait_timeout=10):
+        self.precision = precision
+        self.max_entries = max_entries
+        self.ttls = ttls or {}
+        self.default_ttl = default_ttl
+        self.persist = persist
+        self.wait_timeout = wait_timeout
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def quantize(self, latitude, longitude):
+        """Round a coordinate pair to the configured precision."""
+        return f"{round(float(latitude), self.precision)},{round(float(longitude), self.precision)}"
+
+    def make_key(self, endpoint, *points, mode=None):
+        """
+        Build a cache key from an endpoint, (lat, lon) points and an optional mode.
+
+        Example: make_key('directions', (41.88, -87.62), (41.87, -87.63), mode='walking')
+        """
+        parts = [endpoint]
+        if mode:
+            parts.append(mode)
+        parts.extend(self.quantize(lat, lon) for lat, lon in points)
+        return ':'.join(parts)
+
+    def ttl_for(self, endpoint):
+        return self.ttls.get(endpoint, self.default_ttl)
+
+    def get_or_fetch(self, endpoint, key, fetch):
+        """
+        Return the cached value for key, calling fetch() on a miss.
+
+        fetch() returns the value to cache, or None if the upstream call
+        failed (failures are not cached).
+        """
+        results = self.get_many_or_fetch(
+            endpoint, [key], lambda missing: {key: fetch()} if missing else {}
+        )
+        return results.get(key)
+
+    def get_many_or_fetch(self, endpoint, keys, fetch_missing):
+        """
+        Resolve many keys at once.
+
+        fetch_missing(missing_keys) is called once with the keys that are
+        neither cached nor already being fetched by another caller, and
+        returns a dict of key -> value. Keys it leaves out (or maps to None)
+        are treated as failures and are not cached.
+
+        Returns:
+            dict: key -> value for every key that could be resolved
+        """
+        results, leading, waiting = self._claim(endpoint, keys)
+        fetched = {}
+        try:
+            if leading:
+                fetched = self._successful(fetch_missing(leading))
+        finally:
+            self._complete(endpoint, leading, fetched)
+        results.update(fetched)
+        results.update(self._wait_for(waiting))
+        return results
+
+    async def aget_many_or_fetch(self, endpoint, keys, fetch_missing):
+        """
+        Async variant of get_many_or_fetch; fetch_missing is a coroutine function.
+
+        Cache reads and writes run in Django's sync thread and waiting on
+        another caller's fetch runs in a worker thread, so the event loop is
+        never blocked.
+        """
+        results, leading, waiting = await sync_to_async(self._claim)(endpoint, keys)
+        fetched = {}
+        try:
+            if leading:
+                fetched = self._successful(await fetch_missing(leading))
+        finally:
+            await sync_to_async(self._complete)(endpoint, leading, fetched)
+        results.update(fetched)
+        if waiting:
+            results.update(await sync_to_async(self._wait_for, thread_sensitive=False)(waiting))
+        return results
+
+    def _claim(self, endpoint, keys):
+        """
+        Split keys into cached results, keys this caller must fetch (leading)
+        and keys another caller is already fetching (waiting).
+        """
+        results = {}
+        leading = []
+        waiting = []
+        now = time.time()
+
+        with self._lock:
+            for key in dict.fromkeys(keys):
+                value = self._get_local(key, now)
+                if value is not None:
+                    results[key] = value
+                elif key in self._inflight:
+                    waiting.append((key, self._inflight[key]))
+                else:
+                    self._inflight[key] = threading.Event()
+                    leading.append(key)
+        CACHE_LOOKUPS.inc(endpoint, 'memory', amount=len(results))
+        CACHE_LOOKUPS.inc(endpoint, 'coalesced', amount=len(waiting))
+
+        if leading:
+            try:
+                stored = self._load(leading)
+            except BaseException:
+                self._release(leading)
+                raise
+            with self._lock:
+                for key, (expires_at, value) in stored.items():
+                    self._set_local(key, value, expires_at)
+                    results[key] = value
+            self._release([key for key in leading if key in stored])
+            leading = [key for key in leading if key not in stored]
+            CACHE_LOOKUPS.inc(endpoint, 'database', amount=len(stored))
+        CACHE_LOOKUPS.inc(endpoint, 'miss', amount=len(leading))
+        return results, leading, waiting
+
+    def _complete(self, endpoint, leading, fetched):
+        """Cache what the leader fetched, wake up its waiters, then persist."""
+        expires_at = time.time() + self.ttl_for(endpoint)
+        with self._lock:
+            for key, value in fetched.items():
+                self._set_local(key, value, expires_at)
+        self._release(leading)
+        self._persist(endpoint, fetched)
+
+    def _wait_for(self, waiting):
+        results = {}
+        for key, event in waiting:
+            event.wait(self.wait_timeout)
+            with self._lock:
+                value = self._get_local(key, time.time())
+            if value is not None:
+                results[key] = value
+        return results
+
+    def _release(self, keys):
+        with self._lock:
+            for key in keys:
+                self._inflight.pop(key).set()
+
+    @staticmethod
+    def _successful(fetched):
+        return {key: value for key, value in (fetched or {}).items() if value is not None}
+
+    def clear(self):
+        """Drop every in-process entry (persisted rows are left alone)."""
+        with self._lock:
+            self._entries.clear()
+
+    def _get_local(self, key, now):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= now:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _set_local(self, key, value, expires_at):
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _load(self, keys):
+        """Load unexpired persisted entries; returns key -> (expires_at, value)."""
+        if not self.persist:
+            return {}
+        try:
+            rows = CachedResponse.objects.filter(
+                key__in=keys, expires_at__gt=datetime.now(timezone.utc)
+            ).values_list('key', 'payload', 'expires_at')
+            return {key: (expires_at.timestamp(), payload) for key, payload, expires_at in rows}
+        except DatabaseError as e:
+            logger().error(f"Error reading Google Maps cache: {str(e)}")
+            return {}
+
+    def _persist(self, endpoint, values):
+        if not values or not self.persist:
+            return
+        expires = datetime.now(timezone.utc) + timedelta(seconds=self.ttl_for(endpoint))
+        try:
+            CachedResponse.objects.bulk_create(
+                [
+                    CachedResponse(key=key, endpoint=endpoint, payload=value, expires_at=expires)
+                    for key, value in values.items()
+                ],
+                update_conflicts=True,
+                unique_fields=['key'],
+                update_fields=['endpoint', 'payload', 'expires_at'],
+            )
+            self._writes += len(values)
+            if self._writes >= PURGE_EVERY:
+                self._writes = 0
+                CachedResponse.objects.filter(expires_at__lte=datetime.now(timezone.utc)).delete()
+        except DatabaseError as e:
+            logger().error(f"Error writing Google Maps cache: {str(e)}")
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_google_maps_cache():
+    """Return the process-wide GoogleMapsCache configured from settings.GOOGLE_MAPS_CACHE."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                options = {**DEFAULT_CACHE_SETTINGS, **getattr(settings, 'GOOGLE_MAPS_CACHE', {})}
+                _cache = GoogleMapsCache(
+                    precision=options['PRECISION'],
+                    max_entries=options['MAX_ENTRIES'],
+                    ttls={**DEFAULT_CACHE_SETTINGS['TTL'], **options['TTL']},
+                    default_ttl=options['DEFAULT_TTL'],
+                    persist=options['PERSIST'],
+                    wait_timeout=options['WAIT_TIMEOUT'],
+                )
+    return _cache
@@ -0,0 +1,168 @@
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import CharField, F, Value
+
+from .metrics import CATALOG_LATENCY, timed
+from .models import Architecture, CatalogVersion, Films, History, Music
+
+
+# Ordered by name so (location_type, id) keyset pagination follows the UNION's ORDER BY
+CATEGORY_MODELS = {
+    'Architecture': Architecture,
+    'Films': Films,
+    'History': History,
+    'Music': Music,
+}
+CATALOG_FIELDS = ('id', 'name', 'latitude', 'longitude', 'venue_id')
+CATALOG_PAGE_SIZE = 500
+CATALOG_VERSION_ROW = 1
+# Seconds a process trusts its last read of the catalog version
+CATALOG_VERSION_POLL_SECONDS = 1.0
+
+
+def logger():
+    return logging.getLogger(__name__)
+
+
+def catalog_query(location_type=None, include_fact=False, after=None):
+    """
+    Build one UNION ALL query over every location model.
+
+    Each row is a dict with 'location_type', 'id', 'name', 'latitude',
+    'longitude' (and 'fact' when include_fact is set), ordered by
+    (location_type, id).
+
+    Args:
+        location_type (str, optional): Restrict to one location type
+        include_fact (bool): Also select the fact text
+        after (tuple, optional): (location_type, id) keyset; only rows after it are returned
+
+    Returns:
+        QuerySet: Combined values() queryset, or None if no table can match
+    """
+    fields = CATALOG_FIELDS + (('fact',) if include_fact else ())
+    querysets = []
+    for name, model in CATEGORY_MODELS.items():
+        if location_type is not None and name != location_type:
+            continue
+        queryset = model.objects.all()
+        if after is not None:
+            after_type, after_id = after
+            if name < after_type:
+                continue
+            if name == after_type:
+                queryset = queryset.filter(id__gt=after_id)
+        querysets.append(
+            queryset.annotate(location_type=Value(name, output_field=CharField()))
+            .values('location_type', *fields)
+        )
+    if not querysets:
+        return None
+    return querysets[0].union(*querysets[1:], all=True).order_by('location_type', 'id')
+
+
+def get_catalog_page(location_type=None, include_fact=False, after=None, limit=CATALOG_PAGE_SIZE):
+    """
+    Fetch one keyset-paginated page of the catalog.
+
+    Returns:
+        tuple: (rows, next_after) where next_after is the keyset for the following
+               page, or None when this is the last page
+    """
+    query = catalog_query(location_type, include_fact, after)
+    if query is None:
+        return [], None
+    with timed(CATALOG_LATENCY, 'catalog_page'):
+        rows = list(query[:limit].iterator(chunk_size=limit))
+    next_after = None
+    if len(rows) == limit:
+        next_after = (rows[-1]['location_type'], rows[-1]['id'])
+    return rows, next_after
+
+
+def iter_catalog(location_type=None, include_fact=False, page_size=CATALOG_PAGE_SIZE):
+    """
+    Stream every catalog row page by page.
+
+    Only one page is held in memory at a time, so memory stays flat no
+    matter how large the catalog grows.
+    """
+    after = None
+    total = 0
+    while True:
+        rows, after = get_catalog_page(location_type, include_fact, after, page_size)
+        total += len(rows)
+        yield from rows
+        if after is None:
+            break
+    logger().info(f"Streamed {total} catalog rows")
+
+
+def parse_keyset(value):
+    """Parse an 'Type:id' cursor string into a (location_type, id) keyset."""
+    if not value:
+        return None
+    location_type, _, location_id = value.partition(':')
+    if location_type not in CATEGORY_MODELS or not location_id.isdigit():
+        raise ValueError(f"Invalid cursor: {value}")
+    return location_type, int(location_id)
+
+
+def format_keyset(keyset):
+    """Format a (location_type, id) keyset as an 'Type:id' cursor string."""
+    if keyset is None:
+        return None
+    return f"{keyset[0]}:{keyset[1]}"
+
+
+_version = None              # (version, time.monotonic() it was read at)
+_version_lock = threading.Lock()
+
+
+def _remember_version(version):
+    global _version
+    with _version_lock:
+        _version = (version, time.monotonic())
+    return version
+
+
+def _read_catalog_version():
+    versions = CatalogVersion.objects.filter(pk=CATALOG_VERSION_ROW).values_list('version', flat=True)
+    version = versions.first()
+    if version is None:
+        # The row is created by migration 0009; recreate it if it was deleted
+        CatalogVersion.objects.bulk_create([CatalogVersion(pk=CATALOG_VERSION_ROW)], ignore_conflicts=True)
+        version = versions.get()
+    return version
+
+
+def get_catalog_version():
+    """
+    Return the current catalog version.
+
+    The version lives in a CatalogVersion row on the primary database, so
+    every worker process sees the same value whatever cache backend is
+    configured. It is bumped on every location write (see locations.signals).
+    A process reuses its last read for CATALOG_VERSION_POLL_SECONDS, so
+    writes from other processes show up within that long.
+    """
+    poll_seconds = getattr(settings, 'CATALOG_VERSION_POLL_SECONDS', CATALOG_VERSION_POLL_SECONDS)
+    cached = _version
+    if cached is not None and time.monotonic() - cached[1] < poll_seconds:
+        return cached[0]
+    return _remember_version(_read_catalog_version())
+
+
+def bump_catalog_version():
+    """Increment the catalog version and return the new value."""
+    with transaction.atomic():
+        rows = CatalogVersion.objects.filter(pk=CATALOG_VERSION_ROW)
+        if not rows.update(version=F('version') + 1):
+            _read_catalog_version()
+            rows.update(version=F('version') + 1)
+        version = rows.values_list('version', flat=True).get()
+    return _remember_version(version)
@@ -0,0 +1,26 @@
+from django.core.checks import Tags, Warning, register
+from django.db import DatabaseError, connections
+
+from .search import missing_sqlite_search_triggers
+
+
+@register(Tags.database)
+def check_search_triggers(app_configs, databases=None, **kwargs):
+    """Warn when SQLite has lost the triggers that keep the FTS5 search table in sync."""
+    warnings = []
+    for alias in databases or ():
+        connection = connections[alias]
+        if connection.vendor != 'sqlite':
+            continue
+        try:
+            missing = missing_sqlite_search_triggers(connection)
+        except DatabaseError:
+            continue
+        if missing:
+            warnings.append(Warning(
+                f"The full-text search index of database '{alias}' is missing its sync triggers "
+                f"({', '.join(missing)}), so location writes no longer reach search.",
+                hint="Run 'manage.py rebuild_search_index', e.g. after a migration that rebuilt a location table.",
+                id='locations.W001',
+            ))
+    return warnings
@@ -0,0 +1,263 @@
+"""
+Zoom-aware marker clusters for map views.
+
+Locations are bucketed into a pyramid of Web Mercator grids, one level per
+zoom: a cell is CLUSTER_CELL_PX map pixels wide at its zoom, and each level
+is built by merging the four child cells of the level below, so the whole
+pyramid costs one pass per level. Levels are kept in process memory for the
+catalog version they were built from and rebuilt when it moves on, the same
+way as the spatial index. A viewport query only looks at the cells inside
+its bounding box, so panning costs the same at tens of thousands of
+locations as at a hundred.
+"""
+import logging
+import math
+import threading
+
+from .spatial import CATEGORIES, get_spatial_index
+
+
+# Width of a cluster cell in map pixels at the zoom it is shown at
+CLUSTER_CELL_PX = 64
+TILE_SIZE_PX = 256
+MIN_CLUSTER_ZOOM = 0
+# Beyond this zoom every location is returned on its own
+MAX_CLUSTER_ZOOM = 16
+# Web Mercator stops short of the poles
+MAX_MERCATOR_LATITUDE = 85.05112878
+
+
+def logger():
+    return logging.getLogger(__name__)
+
+
+def _project(latitude, longitude):
+    """Web Mercator position of a point as fractions (x, y) of the world, both in [0, 1)."""
+    latitude = max(-MAX_MERCATOR_LATITUDE, min(MAX_MERCATOR_LATITUDE, latitude))
+    sin = math.sin(math.radians(latitude))
+    x = (longitude + 180) / 360
+    y = 0.5 - math.log((1 + sin) / (1 - sin)) / (4 * math.pi)
+    return min(max(x, 0.0), math.nextafter(1.0, 0)), min(max(y, 0.0), math.nextafter(1.0, 0))
+
+
+def _cells_per_axis(zoom):
+    return TILE_SIZE_PX * 2 ** zoom // CLUSTER_CELL_PX
+
+
+class _Cluster:
+    """Running totals for one grid cell."""
+
+    __slots__ = ('count', 'latitude_sum', 'longitude_sum', 'types', 'representative', 'expansion_zoom')
+
+    def __init__(self):
+        self.count = 0
+        self.latitude_sum = 0.0
+        self.longitude_sum = 0.0
+        self.types = [0] * len(CATEGORIES)
+        self.representative = None      # IndexedLocation standing in for the cluster
+        self.expansion_zoom = None       # first zoom at which the cluster splits up
+
+
+class ClusterIndex:
+    """
+    Precomputed cluster levels for MIN_CLUSTER_ZOOM..MAX_CLUSTER_ZOOM.
+
+    Args:
+        locations (list): IndexedLocations to cluster
+        version: Catalog version the locations were read at
+    """
+
+    def __init__(self, locations, version=None):
+        self.version = version
+        self.levels = {}
+        self._build(locations)
+
+    def __len__(self):
+        return sum(cluster.count for cluster in self.levels[MIN_CLUSTER_ZOOM].values())
+
+    def _build(self, locations):
+        cells = _cells_per_axis(MAX_CLUSTER_ZOOM)
+        leaves = {}
+        members = {}
+        for location in locations:
+            x, y = _project(location.latitude, location.longitude)
+            cell = (int(x * cells), int(y * cells))
+            cluster = leaves.get(cell)
+            if cluster is None:
+                cluster = leaves[cell] = _Cluster()
+            cluster.count += 1
+            cluster.latitude_sum += location.latitude
+            cluster.longitude_sum += location.longitude
+            cluster.types[CATEGORIES.index(location.location_type)] += 1
+            members.setdefault(cell, []).append(location)
+        for cell, cluster in leaves.items():
+            # The member closest to the centroid stands in for the cell
+            latitude = cluster.latitude_sum / cluster.count
+            longitude = cluster.longitude_sum / cluster.count
+            cluster.representative = min(
+                members[cell],
+                key=lambda member: (member.latitude - latitude) ** 2 + (member.longitude - longitude) ** 2,
+            )
+            cluster.expansion_zoom = MAX_CLUSTER_ZOOM + 1
+        self.levels[MAX_CLUSTER_ZOOM] = leaves
+
+        for zoom in range(MAX_CLUSTER_ZOOM - 1, MIN_CLUSTER_ZOOM - 1, -1):
+            children = {}
+            for (x, y), child in self.levels[zoom + 1].items():
+                children.setdefault((x // 2, y // 2), []).append(child)
+            parents = {}
+            for cell, group in children.items():
+                if len(group) == 1:
+                    # Nothing merges here, so the child is shared rather than copied
+                    parents[cell] = group[0]
+                    continue
+                parent = parents[cell] = _Cluster()
+                for child in group:
+                    parent.count += child.count
+                    parent.latitude_sum += child.latitude_sum
+                    parent.longitude_sum += child.longitude_sum
+                    for number, count in enumerate(child.types):
+                        parent.types[number] += count
+                # The biggest child's representative stands in for the parent
+                parent.representative = max(group, key=lambda child: child.count).representative
+                parent.expansion_zoom = zoom + 1
+            self.levels[zoom] = parents
+
+    def query(self, south, west, north, east, zoom):
+        """
+        Return the clusters inside a bounding box at a zoom level.
+
+        Args:
+            south, west, north, east (float): Viewport bounds; west > east crosses the antimeridian
+            zoom (int): Map zoom level, clamped to the precomputed levels
+
+        Returns:
+            list: Cluster dicts ('key', 'count', 'latitude', 'longitude', 'types',
+                  'expansion_zoom' and the representative 'location'), biggest first
+        """
+        zoom = max(MIN_CLUSTER_ZOOM, min(MAX_CLUSTER_ZOOM, zoom))
+        level = self.levels[zoom]
+        cells = _cells_per_axis(zoom)
+        results = []
+        for span_west, span_east in _spans(west, east):
+            min_x, max_y = (int(value * cells) for value in _project(south, span_west))
+            max_x, min_y = (int(value * cells) for value in _project(north, span_east))
+            for cell, cluster in self._cells_in(level, min_x, min_y, max_x, max_y):
+                results.append(_format_cluster(zoom, cell, cluster))
+        results.sort(key=lambda result: -result['count'])
+        return results
+
+    @staticmethod
+    def _cells_in(level, min_x, min_y, max_x, max_y):
+        if (max_x - min_x + 1) * (max_y - min_y + 1) > len(level):
+            # Box covers more cells than are occupied; walk the occupied ones instead
+            for (x, y), cluster in level.items():
+                if min_x <= x <= max_x and min_y <= y <= max_y:
+                    yield (x, y), cluster
+            return
+        for x in range(min_x, max_x + 1):
+            for y in range(min_y, max_y + 1):
+                cluster = level.get((x, y))
+                if cluster is not None:
+                    yield (x, y), cluster
+
+
+def _spans(west, east):
+    """Split a west-east range crossing the antimeridian into two."""
+    return [(west, east)] if west <= east else [(west, 180.0), (-180.0, east)]
+
+
+def _format_location(location):
+    return {
+        'location_id': location.id,
+        'location_name': location.name,
+        'location_type': location.location_type,
+        'latitude': location.latitude,
+        'longitude': location.longitude,
+    }
+
+
+def _format_cluster(zoom, cell, cluster):
+    return {
+        'key': f"{zoom}/{cell[0]}/{cell[1]}",
+        'count': cluster.count,
+        'latitude': round(cluster.latitude_sum / cluster.count, 6),
+        'longitude': round(cluster.longitude_sum / cluster.count, 6),
+        'types': {CATEGORIES[number]: count for number, count in enumerate(cluster.types) if count},
+        'expansion_zoom': cluster.expansion_zoom if cluster.count > 1 else None,
+        'location': _format_location(cluster.representative),
+    }
+
+
+def _format_single(location):
+    return {
+        'key': f"{location.location_type}:{location.id}",
+        'count': 1,
+        'latitude': location.latitude,
+        'longitude': location.longitude,
+        'types': {location.location_type: 1},
+        'expansion_zoom': None,
+        'location': _format_location(location),
+    }
+
+
+_clusters = {}
+_clusters_lock = threading.Lock()
+
+
+def get_cluster_index(location_type=None):
+    """
+    Return the process-wide cluster levels for one location type (None for all).
+
+    They are rebuilt from the spatial index whenever the catalog version
+    moves on, so any location write invalidates them.
+    """
+    index = get_spatial_index()
+    clusters = _clusters.get(location_type)
+    if clusters is None or clusters.version != index.version:
+        with _clusters_lock:
+            clusters = _clusters.get(location_type)
+            if clusters is None or clusters.version != index.version:
+                locations = index.within_bbox(
+                    -90, -180, 90, 180, None if location_type is None else [location_type]
+                )
+                clusters = _clusters[location_type] = ClusterIndex(locations, version=index.version)
+                logger().info(f"Built cluster levels for {len(locations)} locations (type {location_type})")
+    return clusters
+
+
+def get_map_clusters(south, west, north, east, zoom, location_type=None):
+    """
+    Clusters (or, past MAX_CLUSTER_ZOOM, single locations) to draw in a map viewport.
+
+    Args:
+        south, west, north, east (float): Viewport bounds
+        zoom (int): Map zoom level
+        location_type (str, optional): Restrict to one location type
+
+    Returns:
+        dict: 'version' (catalog version the clusters reflect), 'zoom', 'clustered'
+              and 'clusters' (see ClusterIndex.query; single locations have a
+              count of 1)
+    """
+    if zoom > MAX_CLUSTER_ZOOM:
+        index = get_spatial_index()
+        location_types = None if location_type is None else [location_type]
+        locations = [
+            location
+            for span_west, span_east in _spans(west, east)
+            for location in index.within_bbox(south, span_west, north, span_east, location_types)
+        ]
+        return {
+            'version': index.version,
+            'zoom': zoom,
+            'clustered': False,
+            'clusters': [_format_single(location) for location in locations],
+        }
+    clusters = get_cluster_index(location_type)
+    return {
+        'version': clusters.version,
+        'zoom': zoom,
+        'clustered': True,
+        'clusters': clusters.query(south, west, north, east, zoom),
+    }
@@ -0,0 +1,117 @@
+import hashlib
+import logging
+
+from django.core.cache import cache
+
+from .catalog import get_catalog_version
+from .geo import haversine_km
+from .spatial import get_spatial_index
+
+
+# Movements smaller than this reuse the client's previous result
+MOVEMENT_THRESHOLD_KM = 0.02
+FEED_DEFAULT_RADIUS_KM = 1.5
+FEED_DEFAULT_LIMIT = 20
+# Forget clients that have not polled for this long (seconds)
+FEED_STATE_TTL = 10 * 60
+
+
+def logger():
+    return logging.getLogger(__name__)
+
+
+def _state_key(client_id):
+    return f"locations:nearby-feed:{client_id}"
+
+
+def _item_key(location):
+    return f"{location.location_type}:{location.id}"
+
+
+def _item(location):
+    return {
+        'key': _item_key(location),
+        'location_id': location.id,
+        'location_name': location.name,
+        'location_type': location.location_type,
+        'latitude': location.latitude,
+        'longitude': location.longitude,
+        'distance_km': round(location.distance_km, 2),
+    }
+
+
+def _etag(version, query, keys):
+    digest = hashlib.sha1(f"{version}|{query}|{','.join(keys)}".encode()).hexdigest()
+    return f'"{digest[:20]}"'
+
+
+def get_nearby_feed(client_id, latitude, longitude, location_type=None,
+                    radius_km=FEED_DEFAULT_RADIUS_KM, limit=FEED_DEFAULT_LIMIT, if_none_match=None):
+    """
+    Return what changed in a client's nearby list since its last poll.
+
+    The client's last position and result are kept in Django's cache. If it
+    has moved less than MOVEMENT_THRESHOLD_KM (and neither the query nor the
+    catalog changed) nothing is recomputed. The ETag identifies the ordered
+    result set, so an unchanged list costs a 304.
+
+    Args:
+        client_id (str): Stable identifier for the polling client
+        latitude (float): Current latitude
+        longitude (float): Current longitude
+        location_type (str, optional): Restrict to one location type
+        radius_km (float): Only include locations within this distance
+        limit (int): Maximum number of locations
+        if_none_match (str, optional): ETag the client currently holds
+
+    Returns:
+        tuple: (payload dict or None when unchanged, etag)
+    """
+    version = get_catalog_version()
+    query = f"{location_type}|{radius_km}|{limit}"
+    state = cache.get(_state_key(client_id))
+
+    if (state and state['version'] == version and state['query'] == query
+            and haversine_km(state['latitude'], state['longitude'], latitude, longitude) < MOVEMENT_THRESHOLD_KM):
+        cache.touch(_state_key(client_id), FEED_STATE_TTL)
+        if if_none_match == state['etag']:
+            return None, state['etag']
+        return {'full': True, 'etag': state['etag'], 'results': state['items']}, state['etag']
+
+    nearest = get_spatial_index().nearest(
+        latitude, longitude, k=limit,
+        location_types=None if location_type is None else [location_type],
+        max_distance_km=radius_km,
+    )
+    items = [_item(location) for location in nearest]
+    keys = [item['key'] for item in items]
+    etag = _etag(version, query, keys)
+    cache.set(_state_key(client_id), {
+        'version': version,
+        'query': query,
+        'latitude': latitude,
+        'longitude': longitude,
+        'items': items,
+        'etag': etag,
+    }, FEED_STATE_TTL)
+
+    if if_none_match == etag:
+        return None, etag
+    if not state or if_none_match != state['etag']:
+        # The client does not hold our previous result, so a delta is meaningless
+        return {'full': True, 'etag': etag, 'results': items}, etag
+
+    previous = [item['key'] for item in state['items']]
+    previous_set = set(previous)
+    current_set = set(keys)
+    payload = {
+        'full': False,
+        'etag': etag,
+        'entered': [item for item in items if item['key'] not in previous_set],
+        'left': [key for key in previous if key not in current_set],
+    }
+    kept_before = [key for key in previous if key in current_set]
+    kept_now = [key for key in keys if key in previous_set]
+    if payload['entered'] or kept_before != kept_now:
+        payload['order'] = keys
+    return payload, etag
@@ -0,0 +1,52 @@
+import math
+from array import array
+
+
+EARTH_RADIUS_KM = 6371.0088
+# Average walking pace, and how much longer the street grid is than a straight line
+WALKING_SPEED_KMH = 4.8
+WALKING_DETOUR_FACTOR = 1.3
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in kilometres between two points given in degrees."""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(1.0, a)))
+
+
+def estimate_walking_minutes(distance_km):
+    """Rough walking time for a straight-line distance, allowing for street detours."""
+    return distance_km * WALKING_DETOUR_FACTOR / WALKING_SPEED_KMH * 60
+
+
+class CoordinateArrays:
+    """
+    Latitudes and longitudes packed into parallel double arrays.
+
+    Distances to every point are computed in one pass over the arrays with
+    the equirectangular approximation, which is well within a metre of the
+    haversine distance at city scale and several times cheaper.
+    """
+
+    def __init__(self, latitudes=(), longitudes=()):
+        self.latitudes = array('d', latitudes)
+        self.longitudes = array('d', longitudes)
+
+    def __len__(self):
+        return len(self.latitudes)
+
+    def distances_km(self, origin_lat, origin_lon):
+        """Return an array of approximate distances (km) from the origin to every point."""
+        to_rad = math.pi / 180
+        scale = EARTH_RADIUS_KM * to_rad
+        cos_lat = math.cos(origin_lat * to_rad)
+        sqrt = math.sqrt
+        return array('d', (
+            scale * sqrt(((lon - origin_lon) * cos_lat) ** 2 + (lat - origin_lat) ** 2)
+            for lat, lon in zip(self.latitudes, self.longitudes)
+        ))
+
@@ -0,0 +1,198 @@
+"""
+Route geometry: decoding, per-zoom simplification and compact encoding.
+
+Directions polylines are decoded once into coordinate arrays. Every vertex
+then gets a Douglas-Peucker significance: the largest tolerance at which
+that vertex survives. Simplifying for a zoom level is then a single
+threshold pass instead of a fresh Douglas-Peucker run.
+"""
+import math
+import sys
+from array import array
+from functools import lru_cache
+
+from .geo import EARTH_RADIUS_KM
+
+
+# Web Mercator ground resolution at the equator, zoom 0 (metres per pixel)
+METRES_PER_PIXEL_ZOOM_0 = 156543.03392
+MIN_ZOOM = 0
+MAX_ZOOM = 21
+# Vertices closer than this many pixels to the simplified line are dropped
+PIXEL_TOLERANCE = 1.0
+POLYLINE_PRECISION = 1e5
+ROUTE_GEOMETRY_CACHE_SIZE = 1024
+
+
+def decode_polyline(encoded):
+    """
+    Decode a Google encoded polyline.
+
+    Returns:
+        tuple: (latitudes, longitudes) as array('d')
+    """
+    latitudes = array('d')
+    longitudes = array('d')
+    index = lat = lon = 0
+    length = len(encoded)
+    while index < length:
+        deltas = []
+        for _ in range(2):
+            shift = result = 0
+            while True:
+                byte = ord(encoded[index]) - 63
+                index += 1
+                result |= (byte & 0x1f) << shift
+                shift += 5
+                if byte < 0x20:
+                    break
+            deltas.append(~(result >> 1) if result & 1 else result >> 1)
+        lat += deltas[0]
+        lon += deltas[1]
+        latitudes.append(lat / POLYLINE_PRECISION)
+        longitudes.append(lon / POLYLINE_PRECISION)
+    return latitudes, longitudes
+
+
+def _encode_value(value, chunks):
+    value = ~(value << 1) if value < 0 else value << 1
+    while value >= 0x20:
+        chunks.append(chr((0x20 | (value & 0x1f)) + 63))
+        value >>= 5
+    chunks.append(chr(value + 63))
+
+
+def encode_polyline(latitudes, longitudes, indices=None):
+    """Encode the points at `indices` (all points by default) as a Google polyline."""
+    chunks = []
+    previous_lat = previous_lon = 0
+    for i in range(len(latitudes)) if indices is None else indices:
+        lat = round(latitudes[i] * POLYLINE_PRECISION)
+        lon = round(longitudes[i] * POLYLINE_PRECISION)
+        _encode_value(lat - previous_lat, chunks)
+        _encode_value(lon - previous_lon, chunks)
+        previous_lat, previous_lon = lat, lon
+    return ''.join(chunks)
+
+
+def encode_deltas(latitudes, longitudes, indices=None):
+    """
+    Pack the points at `indices` as little-endian int32 deltas.
+
+    The first pair is absolute; every following (lat, lon) pair is the
+    difference from the previous point, all in 1e-5 degree units.
+    """
+    packed = array('i')
+    previous_lat = previous_lon = 0
+    for i in range(len(latitudes)) if indices is None else indices:
+        lat = round(latitudes[i] * POLYLINE_PRECISION)
+        lon = round(longitudes[i] * POLYLINE_PRECISION)
+        packed.append(lat - previous_lat)
+        packed.append(lon - previous_lon)
+        previous_lat, previous_lon = lat, lon
+    if sys.byteorder != 'little':
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def _project(latitudes, longitudes):
+    """Project to local equirectangular metres around the line's mean latitude."""
+    scale = EARTH_RADIUS_KM * 1000 * math.pi / 180
+    mean_lat = sum(latitudes) / len(latitudes)
+    x_scale = scale * math.cos(math.radians(mean_lat))
+    xs = array('d', (lon * x_scale for lon in longitudes))
+    ys = array('d', (lat * scale for lat in latitudes))
+    return xs, ys
+
+
+def _segment_distance(px, py, ax, ay, bx, by):
+    """Distance from P to segment AB."""
+    dx = bx - ax
+    dy = by - ay
+    length_sq = dx * dx + dy * dy
+    if length_sq == 0:
+        return math.hypot(px - ax, py - ay)
+    t = max(0.0, min(1.0, ((px - ax) * dx + (py - ay) * dy) / length_sq))
+    return math.hypot(px - ax - t * dx, py - ay - t * dy)
+
+
+def douglas_peucker_significance(latitudes, longitudes):
+    """
+    Rank every vertex by the Douglas-Peucker tolerance (metres) it survives.
+
+    Keeping the vertices whose significance exceeds a tolerance gives exactly
+    the Douglas-Peucker simplification for that tolerance. The endpoints are
+    always kept.
+
+    Returns:
+        array: One significance per vertex (inf for the endpoints)
+    """
+    count = len(latitudes)
+    significance = array('d', [0.0]) * count
+    if count == 0:
+        return significance
+    significance[0] = significance[-1] = math.inf
+    if count < 3:
+        return significance
+    xs, ys = _project(latitudes, longitudes)
+    # (first, last, significance of the split that created this range)
+    stack = [(0, count - 1, math.inf)]
+    while stack:
+        first, last, ceiling = stack.pop()
+        if last - first < 2:
+            continue
+        ax, ay, bx, by = xs[first], ys[first], xs[last], ys[last]
+        farthest = first + 1
+        farthest_distance = -1.0
+        for i in range(first + 1, last):
+            distance = _segment_distance(xs[i], ys[i], ax, ay, bx, by)
+            if distance > farthest_distance:
+                farthest, farthest_distance = i, distance
+        # A vertex can never outlive the split that exposed it
+        value = min(farthest_distance, ceiling)
+        significance[farthest] = value
+        stack.append((first, farthest, value))
+        stack.append((farthest, last, value))
+    return significance
+
+
+def zoom_tolerance_m(zoom, latitude):
+    """Ground distance (metres) covered by PIXEL_TOLERANCE pixels at a zoom level and latitude."""
+    return PIXEL_TOLERANCE * METRES_PER_PIXEL_ZOOM_0 * math.cos(math.radians(latitude)) / (2 ** zoom)
+
+
+class RouteGeometry:
+    """A decoded route with per-vertex significance for zoom-dependent simplification."""
+
+    def __init__(self, latitudes, longitudes):
+        self.latitudes = latitudes
+        self.longitudes = longitudes
+        self.significance = douglas_peucker_significance(latitudes, longitudes)
+        self._indices = {}
+
+    def __len__(self):
+        return len(self.latitudes)
+
+    def indices(self, zoom):
+        """Indices of the vertices kept at a zoom level."""
+        zoom = max(MIN_ZOOM, min(MAX_ZOOM, int(zoom)))
+        kept = self._indices.get(zoom)
+        if kept is None:
+            if not self.latitudes:
+                return array('l')
+            tolerance = zoom_tolerance_m(zoom, self.latitudes[0])
+            kept = array('l', (i for i, value in enumerate(self.significance) if value > tolerance))
+            self._indices[zoom] = kept
+        return kept
+
+    def polyline(self, zoom):
+        return encode_polyline(self.latitudes, self.longitudes, self.indices(zoom))
+
+    def deltas(self, zoom):
+        return encode_deltas(self.latitudes, self.longitudes, self.indices(zoom))
+
+
+@lru_cache(maxsize=ROUTE_GEOMETRY_CACHE_SIZE)
+def route_geometry(encoded):
+    """Decode and rank a polyline once per process; repeated views reuse the result."""
+    return RouteGeometry(*decode_polyline(encoded))
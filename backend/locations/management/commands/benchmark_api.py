@@ -0,0 +1,165 @@
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+from datetime import datetime, timezone
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connections
+from django.test.utils import override_settings, setup_databases, teardown_databases
+
+from locations import api
+from locations.benchmark import FakeGoogleMapsServer, random_point, run_scenario
+from locations.cache import get_google_maps_cache
+from locations.catalog import CATEGORY_MODELS
+from locations.models import CachedResponse
+from locations.signals import catalog_changed
+
+
+SCENARIOS = ('nearby', 'distance_matrix', 'place_details', 'commute')
+
+
+def _int_list(value):
+    try:
+        return [int(part) for part in value.split(',') if part]
+    except ValueError:
+        raise CommandError(f"Expected a comma-separated list of integers, got {value!r}")
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the Google Maps API layer against a local stand-in server. "
+        "Runs every scenario for each catalog size and user count on a throwaway test "
+        "database and reports p50/p95/p99 latency and upstream call counts as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10,100,1000,10000', help="Catalog sizes (POIs)")
+        parser.add_argument('--users', default='1,8,32', help="Concurrent simulated users")
+        parser.add_argument('--requests', type=int, default=20, help="Requests per user per run")
+        parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                            help=f"Comma-separated subset of {', '.join(SCENARIOS)}")
+        parser.add_argument('--origins', type=int, default=50,
+                            help="Distinct user positions to draw from (controls the cache hit rate)")
+        parser.add_argument('--latency-ms', type=float, default=50, help="Stand-in server latency")
+        parser.add_argument('--jitter-ms', type=float, default=20, help="Extra random stand-in latency")
+        parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of HTTP 500 responses")
+        parser.add_argument('--payload-kb', type=float, default=0, help="Padding added to every response")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help="Write the JSON report here instead of stdout")
+
+    def handle(self, *args, **options):
+        scenarios = [name for name in options['scenarios'].split(',') if name]
+        unknown = set(scenarios) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+        sizes = _int_list(options['sizes'])
+        user_counts = _int_list(options['users'])
+        if options['requests'] < 1 or options['origins'] < 1 or min(sizes + user_counts, default=0) < 1:
+            raise CommandError("--sizes, --users, --requests and --origins must be positive")
+
+        os.environ.setdefault('GOOGLE_MAPS_API_KEY', 'benchmark')
+        with tempfile.TemporaryDirectory() as directory:
+            # A file-backed SQLite test database can be shared by the simulated users' threads
+            if connections['default'].vendor == 'sqlite':
+                connections['default'].settings_dict['TEST']['NAME'] = os.path.join(directory, 'benchmark.sqlite3')
+            databases = setup_databases(verbosity=0, interactive=False, aliases={'default'})
+            try:
+                report = self._run(scenarios, sizes, user_counts, options)
+            finally:
+                teardown_databases(databases, verbosity=0)
+
+        text = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as handle:
+                handle.write(text + '\n')
+            self.stderr.write(f"Wrote {len(report['results'])} results to {options['output']}")
+        else:
+            self.stdout.write(text)
+
+    def _run(self, scenarios, sizes, user_counts, options):
+        report = {
+            'generated_at': datetime.now(timezone.utc).isoformat(),
+            'environment': {
+                'python': sys.version.split()[0],
+                'django': django.get_version(),
+                'platform': platform.platform(),
+                'database': connections['default'].vendor,
+            },
+            'config': {
+                name: options[name] for name in
+                ('requests', 'origins', 'latency_ms', 'jitter_ms', 'error_rate', 'payload_kb', 'seed')
+            },
+            'results': [],
+        }
+        server = FakeGoogleMapsServer(
+            latency=options['latency_ms'] / 1000,
+            jitter=options['jitter_ms'] / 1000,
+            error_rate=options['error_rate'],
+            payload_bytes=int(options['payload_kb'] * 1024),
+            seed=options['seed'],
+        )
+        with server, override_settings(GOOGLE_MAPS_API_URL=server.url):
+            for size in sizes:
+                self._load_catalog(size, options['seed'])
+                rng = random.Random(options['seed'])
+                origins = [random_point(rng) for _ in range(options['origins'])]
+                for users in user_counts:
+                    for scenario in scenarios:
+                        self._reset_caches(server)
+                        result = run_scenario(
+                            self._scenario(scenario, origins, options['seed']),
+                            users, options['requests'], on_thread_exit=close_old_connections,
+                        )
+                        result.update(scenario=scenario, catalog_size=size, users=users,
+                                      upstream_calls=server.reset_calls())
+                        report['results'].append(result)
+                        self.stderr.write(
+                            f"{scenario:>15} size={size:<6} users={users:<4} "
+                            f"p50={result['latency_ms']['p50']:.1f}ms p95={result['latency_ms']['p95']:.1f}ms "
+                            f"p99={result['latency_ms']['p99']:.1f}ms calls={sum(result['upstream_calls'].values())}"
+                        )
+        return report
+
+    def _load_catalog(self, size, seed):
+        """Replace the test catalog with `size` POIs spread over Chicago."""
+        rng = random.Random(seed)
+        models = list(CATEGORY_MODELS.values())
+        for model in models:
+            model.objects.all().delete()
+        rows = {model: [] for model in models}
+        for number in range(size):
+            latitude, longitude = random_point(rng)
+            model = models[number % len(models)]
+            rows[model].append(model(name=f"POI {number}", latitude=latitude, longitude=longitude, fact=''))
+        for model, objects in rows.items():
+            model.objects.bulk_create(objects, batch_size=1000)
+        catalog_changed()
+
+    def _reset_caches(self, server):
+        get_google_maps_cache().clear()
+        CachedResponse.objects.all().delete()
+        server.reset_calls()
+
+    def _scenario(self, scenario, origins, seed):
+        """Return a call(user, number) that makes one request and reports success."""
+
+        def origin(user, number):
+            return origins[random.Random(f"{seed}:{user}:{number}").randrange(len(origins))]
+
+        if scenario == 'nearby':
+            return lambda user, number: bool(api.get_nearby_travel_times(*origin(user, number)))
+        if scenario == 'distance_matrix':
+            def call(user, number):
+                latitude, longitude = origin(user, number)
+                destinations = api.find_nearest_locations(latitude, longitude, limit=api.NEARBY_DEFAULT_LIMIT)
+                return bool(api.get_distance_matrix(latitude, longitude, destinations))
+            return call
+        if scenario == 'place_details':
+            return lambda user, number: bool(api.get_place_details(*origin(user, number)))
+        return lambda user, number: bool(api.get_best_commute_options(
+            *origin(user, number), *origins[(user + number) % len(origins)]
+        ))
@@ -0,0 +1,33 @@
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from locations.transit import compile_timetable, compiled_timetable_path
+
+
+class Command(BaseCommand):
+    help = (
+        "Compile the static GTFS feed into the timetable the 'gtfs' transit backend "
+        "routes with, saved next to the feed. Web processes only load the compiled file "
+        "and pick up a new one within a minute, so re-run this after every feed update."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--feed', default=None,
+                            help="GTFS directory or .zip to compile (default settings.GTFS_FEED_PATH)")
+
+    def handle(self, *args, **options):
+        path = options['feed'] or getattr(settings, 'GTFS_FEED_PATH', None)
+        if not path or not Path(path).exists():
+            raise CommandError(f"GTFS feed {path} not found")
+        started = time.perf_counter()
+        try:
+            timetable = compile_timetable(path)
+        except (OSError, KeyError, ValueError) as e:
+            raise CommandError(f"Could not compile GTFS feed {path}: {str(e)}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Compiled {len(timetable.stop_ids)} stops and {len(timetable.trip_services)} trips "
+            f"into {compiled_timetable_path(path)} in {time.perf_counter() - started:.1f}s"
+        ))
@@ -0,0 +1,109 @@
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand, CommandError
+
+from locations.api import (
+    GOOGLE_MAPS_MAX_CONCURRENCY,
+    _fetch_distance_matrix_batch,
+    _plan_distance_matrix_batches,
+    get_google_maps_api_key,
+)
+from locations.catalog import iter_catalog
+from locations.models import Venue
+from locations.quota import BACKGROUND, request_priority
+from locations.travel_matrix import TravelMatrixBuilder, location_key, travel_matrix_dir
+
+
+DEFAULT_MODES = ['walking', 'transit']
+# Publish progress after this many batches so an interrupted build loses little
+SAVE_EVERY = 50
+
+
+class Command(BaseCommand):
+    help = (
+        "Precompute the POI x POI travel time and distance matrix for each mode into "
+        "memory-mapped files. Only missing cells are fetched, so re-running resumes an "
+        "interrupted build and adding POIs only fetches their rows and columns."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mode', action='append', choices=['walking', 'transit', 'bicycling', 'driving'],
+                            help="Travel mode to build (repeatable; default walking and transit)")
+        parser.add_argument('--concurrency', type=int, default=GOOGLE_MAPS_MAX_CONCURRENCY,
+                            help="Most Distance Matrix requests in flight at once")
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Report how many cells and requests are missing without fetching them")
+
+    def handle(self, *args, **options):
+        api_key = get_google_maps_api_key()
+        if not api_key and not options['dry_run']:
+            raise CommandError("GOOGLE_MAPS_API_KEY is not set")
+        if options['concurrency'] < 1:
+            raise CommandError("--concurrency must be positive")
+
+        # Entries sharing a venue share one row and column, routed to the venue's point
+        venues = {
+            venue_id: (latitude, longitude)
+            for venue_id, latitude, longitude in Venue.objects.values_list('id', 'latitude', 'longitude')
+        }
+        points = {}
+        for row in iter_catalog():
+            point = venues.get(row['venue_id'], (row['latitude'], row['longitude']))
+            points[location_key(row['location_type'], row['id'], row['venue_id'])] = point
+        directory = travel_matrix_dir()
+        try:
+            builder = TravelMatrixBuilder(directory, points)
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(f"{len(points)} POIs ({builder.added} new, {len(builder.moved)} moved) in {directory}")
+        point_for = {slot: f"{points[key][0]},{points[key][1]}" for key, slot in builder.slots.items()}
+        try:
+            for mode in options['mode'] or DEFAULT_MODES:
+                self._build(builder, mode, point_for, api_key, options)
+        finally:
+            builder.close()
+
+    def _build(self, builder, mode, point_for, api_key, options):
+        started = time.perf_counter()
+        missing = builder.missing(mode)
+        batches = _plan_distance_matrix_batches({(mode, origin): row for origin, row in missing.items()})
+        cells = sum(len(row) for row in missing.values())
+        self.stdout.write(f"{mode}: {cells} missing cells in {len(batches)} requests")
+        if options['dry_run'] or not batches:
+            if not options['dry_run']:
+                builder.save(mode, complete=True)
+            return
+
+        failed = 0
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+            futures = {
+                executor.submit(contextvars.copy_context().run, self._fetch, batch, point_for, api_key): batch
+                for batch in batches
+            }
+            for done, future in enumerate(as_completed(futures), start=1):
+                _, origins, destinations = futures[future]
+                rows = future.result()
+                if rows is None:
+                    failed += 1
+                else:
+                    builder.store(mode, origins, destinations, rows)
+                if done % SAVE_EVERY == 0:
+                    builder.save(mode, complete=False)
+                    self.stdout.write(f"{mode}: {done}/{len(batches)} requests")
+
+        builder.save(mode, complete=not failed)
+        message = f"{mode}: {len(batches) - failed} requests stored in {time.perf_counter() - started:.1f}s"
+        if failed:
+            self.stdout.write(self.style.WARNING(f"{message}; {failed} failed, re-run to resume"))
+        else:
+            self.stdout.write(self.style.SUCCESS(message))
+
+    def _fetch(self, batch, point_for, api_key):
+        mode, origins, destinations = batch
+        # Matrix builds give way to user requests and stay within the background budget
+        with request_priority(BACKGROUND):
+            return _fetch_distance_matrix_batch(
+                [point_for[slot] for slot in origins], [point_for[slot] for slot in destinations], mode, api_key
+            )
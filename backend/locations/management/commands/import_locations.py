@@ -0,0 +1,196 @@
+import csv
+import json
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from locations.catalog import CATEGORY_MODELS
+from locations.routers import use_primary
+from locations.signals import catalog_changed
+
+
+GEOJSON_SEQ_SUFFIXES = ('.geojsonl', '.geojsons', '.ndjson', '.jsonl')
+# Rows whose name and rounded coordinates match are treated as the same location
+KEY_PRECISION = 5
+MAX_REPORTED_ERRORS = 20
+
+
+def location_key(name, latitude, longitude):
+    return (name.strip().casefold(), round(latitude, KEY_PRECISION), round(longitude, KEY_PRECISION))
+
+
+class Command(BaseCommand):
+    help = (
+        "Import or re-sync locations from a CSV or GeoJSON file. Rows are validated, "
+        "deduplicated by name and coordinates, diffed against the database and written "
+        "with batched bulk_create/bulk_update inside one transaction."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV (name,latitude,longitude,fact[,type]) or GeoJSON file")
+        parser.add_argument('--type', choices=list(CATEGORY_MODELS),
+                            help="Import only this location type: rows without a 'type' column/property "
+                                 "get it, rows of another type are rejected")
+        parser.add_argument('--format', choices=['csv', 'geojson', 'geojsonseq'],
+                            help="Input format (guessed from the file extension by default)")
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--delete-missing', action='store_true',
+                            help="Delete existing rows of the imported types that are not in the file")
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Report what would change without writing anything")
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        if not path.exists():
+            raise CommandError(f"{path} does not exist")
+        input_format = options['format'] or self._guess_format(path)
+        batch_size = options['batch_size']
+        started = time.perf_counter()
+
+        types = [options['type']] if options['type'] else list(CATEGORY_MODELS)
+        # Diff against the primary: a lagging replica would have rows re-created
+        with use_primary():
+            existing = self._load_existing(types)
+        seen = set()
+        stats = {'created': 0, 'updated': 0, 'unchanged': 0, 'duplicates': 0, 'invalid': 0, 'deleted': 0}
+        to_create = {location_type: [] for location_type in CATEGORY_MODELS}
+        to_update = {location_type: [] for location_type in CATEGORY_MODELS}
+        touched_types = set()
+
+        with transaction.atomic():
+            for line, row in self._read_rows(path, input_format):
+                try:
+                    location_type, name, latitude, longitude, fact = self._validate(row, options['type'])
+                except ValueError as e:
+                    stats['invalid'] += 1
+                    if stats['invalid'] <= MAX_REPORTED_ERRORS:
+                        self.stderr.write(f"{path}:{line}: {e}")
+                    continue
+
+                key = location_key(name, latitude, longitude)
+                if (location_type, key) in seen:
+                    stats['duplicates'] += 1
+                    continue
+                seen.add((location_type, key))
+                touched_types.add(location_type)
+
+                model = CATEGORY_MODELS[location_type]
+                current = existing.get(location_type, {}).get(key)
+                if current is None:
+                    to_create[location_type].append(
+                        model(name=name, latitude=latitude, longitude=longitude, fact=fact)
+                    )
+                    stats['created'] += 1
+                elif current[1] != fact:
+                    to_update[location_type].append(model(id=current[0], fact=fact))
+                    stats['updated'] += 1
+                else:
+                    stats['unchanged'] += 1
+
+                if len(to_create[location_type]) >= batch_size or len(to_update[location_type]) >= batch_size:
+                    self._flush(location_type, to_create, to_update, batch_size, options['dry_run'])
+
+            for location_type in CATEGORY_MODELS:
+                self._flush(location_type, to_create, to_update, batch_size, options['dry_run'])
+
+            if options['delete_missing']:
+                for location_type in touched_types:
+                    stale = [
+                        location_id for key, (location_id, _) in existing.get(location_type, {}).items()
+                        if (location_type, key) not in seen
+                    ]
+                    stats['deleted'] += len(stale)
+                    if not options['dry_run']:
+                        model = CATEGORY_MODELS[location_type]
+                        for start in range(0, len(stale), batch_size):
+                            model.objects.filter(id__in=stale[start:start + batch_size]).delete()
+
+        if not options['dry_run'] and (stats['created'] or stats['updated'] or stats['deleted']):
+            catalog_changed()
+
+        elapsed = time.perf_counter() - started
+        prefix = "[dry run] " if options['dry_run'] else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}{stats['created']} created, {stats['updated']} updated, "
+            f"{stats['unchanged']} unchanged, {stats['deleted']} deleted, "
+            f"{stats['duplicates']} duplicates skipped, {stats['invalid']} invalid rows "
+            f"in {elapsed:.2f}s"
+        ))
+
+    def _guess_format(self, path):
+        suffix = path.suffix.lower()
+        if suffix == '.csv':
+            return 'csv'
+        if suffix in GEOJSON_SEQ_SUFFIXES:
+            return 'geojsonseq'
+        if suffix in ('.geojson', '.json'):
+            return 'geojson'
+        raise CommandError(f"Cannot guess the format of {path}; pass --format")
+
+    def _load_existing(self, types):
+        """Map location_type -> {key: (id, fact)} for the rows that may be matched."""
+        existing = {}
+        for location_type in types:
+            rows = CATEGORY_MODELS[location_type].objects.values_list('id', 'name', 'latitude', 'longitude', 'fact')
+            existing[location_type] = {
+                location_key(name, latitude, longitude): (location_id, fact)
+                for location_id, name, latitude, longitude, fact in rows.iterator(chunk_size=2000)
+            }
+        return existing
+
+    def _read_rows(self, path, input_format):
+        """Yield (line or feature number, properties dict with latitude/longitude) pairs."""
+        with path.open(encoding='utf-8', newline='') as handle:
+            if input_format == 'csv':
+                reader = csv.DictReader(handle)
+                for row in reader:
+                    yield reader.line_num, row
+            elif input_format == 'geojsonseq':
+                for line, text in enumerate(handle, start=1):
+                    text = text.strip().lstrip('\x1e')
+                    if text:
+                        yield line, self._feature_row(json.loads(text))
+            else:
+                data = json.load(handle)
+                features = data.get('features', []) if data.get('type') == 'FeatureCollection' else [data]
+                for number, feature in enumerate(features, start=1):
+                    yield number, self._feature_row(feature)
+
+    def _feature_row(self, feature):
+        row = dict(feature.get('properties') or {})
+        geometry = feature.get('geometry') or {}
+        if geometry.get('type') == 'Point':
+            row['longitude'], row['latitude'] = geometry['coordinates'][:2]
+        return row
+
+    def _validate(self, row, default_type):
+        location_type = (row.get('type') or row.get('category') or default_type or '').strip()
+        location_type = {name.lower(): name for name in CATEGORY_MODELS}.get(location_type.lower())
+        if location_type is None:
+            raise ValueError(f"unknown or missing location type {row.get('type') or row.get('category')!r}")
+        # Only default_type's rows were loaded to diff against, so other types would be re-created
+        if default_type and location_type != default_type:
+            raise ValueError(f"location type {location_type} does not match --type {default_type}")
+        name = (row.get('name') or '').strip()
+        if not name or len(name) > 255:
+            raise ValueError("name must be 1-255 characters")
+        try:
+            latitude = float(row.get('latitude'))
+            longitude = float(row.get('longitude'))
+        except (TypeError, ValueError):
+            raise ValueError("latitude and longitude must be numbers")
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            raise ValueError("coordinates out of range")
+        fact = (row.get('fact') or '').strip()
+        return location_type, name, latitude, longitude, fact
+
+    def _flush(self, location_type, to_create, to_update, batch_size, dry_run):
+        model = CATEGORY_MODELS[location_type]
+        if to_create[location_type] and not dry_run:
+            model.objects.bulk_create(to_create[location_type], batch_size=batch_size)
+        if to_update[location_type] and not dry_run:
+            model.objects.bulk_update(to_update[location_type], ['fact'], batch_size=batch_size)
+        to_create[location_type] = []
+        to_update[location_type] = []
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from locations.venues import VENUE_MAX_DISTANCE_M, VENUE_NAME_SIMILARITY, link_venues
+
+
+class Command(BaseCommand):
+    help = (
+        "Link catalog entries of different types that describe the same venue (close "
+        "together, similar names) to one shared Venue, so routing and Places lookups run "
+        "once per venue. Safe to re-run after every import."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--distance', type=float, default=VENUE_MAX_DISTANCE_M,
+                            help=f"Largest distance in metres between entries of one venue "
+                                 f"(default {VENUE_MAX_DISTANCE_M})")
+        parser.add_argument('--similarity', type=float, default=VENUE_NAME_SIMILARITY,
+                            help=f"Smallest name similarity between 0 and 1 (default {VENUE_NAME_SIMILARITY})")
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Report what would change without writing anything")
+
+    def handle(self, *args, **options):
+        if options['distance'] <= 0:
+            raise CommandError("--distance must be positive")
+        if not 0 < options['similarity'] <= 1:
+            raise CommandError("--similarity must be between 0 and 1")
+        started = time.perf_counter()
+        stats = link_venues(options['distance'], options['similarity'], options['dry_run'])
+        prefix = "[dry run] " if options['dry_run'] else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}{stats['venues']} shared venues across {stats['locations']} locations: "
+            f"{stats['created']} created, {stats['relinked']} entries relinked, {stats['deleted']} deleted "
+            f"in {time.perf_counter() - started:.2f}s"
+        ))
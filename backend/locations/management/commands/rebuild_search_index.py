@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections
+
+from locations.search import rebuild_sqlite_search_index
+
+
+class Command(BaseCommand):
+    help = (
+        "Recreate the triggers that keep the SQLite FTS5 search table in sync with the "
+        "location tables and reindex every location. Run it after a migration that rebuilds "
+        "a location table (SQLite drops a table's triggers with it). PostgreSQL's generated "
+        "search columns need no rebuild."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS,
+                            help="Database to rebuild the index in (default: the primary)")
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if connection.vendor != 'sqlite':
+            self.stdout.write(f"Nothing to rebuild on {connection.vendor}")
+            return
+        started = time.perf_counter()
+        try:
+            indexed = rebuild_sqlite_search_index(connection)
+        except OperationalError as e:
+            raise CommandError(f"Could not rebuild the search index (is SQLite built with FTS5?): {str(e)}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {indexed} locations for search in {time.perf_counter() - started:.2f}s"
+        ))
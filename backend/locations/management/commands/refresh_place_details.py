@@ -0,0 +1,101 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.db.models import Q
+from django.utils import timezone
+
+from locations.api import GOOGLE_MAPS_MAX_CONCURRENCY, get_google_maps_api_key
+from locations.catalog import CATEGORY_MODELS
+from locations.models import Venue
+from locations.places import refresh_place_details, refresh_venue_details
+from locations.quota import BACKGROUND, request_priority
+
+
+class Command(BaseCommand):
+    help = (
+        "Refresh the stored Google Places data (place_id, address, rating, opening hours) "
+        "of locations that have never been refreshed or were refreshed too long ago. "
+        "Entries linked to a shared venue are refreshed once through the venue. "
+        "Use --every to keep running as a background worker."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--type', choices=list(CATEGORY_MODELS), help="Only refresh one location type")
+        parser.add_argument('--max-age', type=float, default=24,
+                            help="Refresh locations whose data is older than this many hours (default 24)")
+        parser.add_argument('--concurrency', type=int, default=GOOGLE_MAPS_MAX_CONCURRENCY,
+                            help="Most Places requests in flight at once")
+        parser.add_argument('--limit', type=int, help="Refresh at most this many locations per pass")
+        parser.add_argument('--every', type=float,
+                            help="Run a pass every this many minutes instead of exiting")
+
+    def handle(self, *args, **options):
+        api_key = get_google_maps_api_key()
+        if not api_key:
+            raise CommandError("GOOGLE_MAPS_API_KEY is not set")
+        if options['concurrency'] < 1:
+            raise CommandError("--concurrency must be positive")
+
+        while True:
+            self._refresh(api_key, options)
+            if not options['every']:
+                break
+            time.sleep(options['every'] * 60)
+
+    def _stale(self, options):
+        """
+        Yield (location_type, location) pairs due for a refresh, oldest first.
+
+        Venues come first with a location_type of None; with --type only
+        venues that have an entry of that type are included.
+        """
+        cutoff = timezone.now() - timedelta(hours=options['max_age'])
+        due = Q(place_details_refreshed_at__isnull=True) | Q(place_details_refreshed_at__lt=cutoff)
+        types = [options['type']] if options['type'] else list(CATEGORY_MODELS)
+        remaining = options['limit']
+        venues = Venue.objects.filter(due)
+        if options['type']:
+            venues = venues.filter(id__in=CATEGORY_MODELS[options['type']].objects.values('venue_id'))
+        querysets = [(None, venues)] + [
+            (location_type, CATEGORY_MODELS[location_type].objects.filter(due, venue__isnull=True))
+            for location_type in types
+        ]
+        for location_type, queryset in querysets:
+            queryset = (
+                queryset
+                .only('id', 'name', 'latitude', 'longitude', 'place_id')
+                .order_by('place_details_refreshed_at', 'id')
+            )
+            if remaining is not None:
+                queryset = queryset[:remaining]
+            locations = list(queryset)
+            for location in locations:
+                yield location_type, location
+            if remaining is not None:
+                remaining -= len(locations)
+                if remaining <= 0:
+                    break
+
+    def _refresh_one(self, item, api_key):
+        try:
+            # Enrichment gives way to user requests and is shed first near the quota
+            with request_priority(BACKGROUND):
+                if item[0] is None:
+                    return refresh_venue_details(item[1], api_key)
+                return refresh_place_details(item[0], item[1], api_key)
+        finally:
+            close_old_connections()
+
+    def _refresh(self, api_key, options):
+        started = time.perf_counter()
+        stale = list(self._stale(options))
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+            results = list(executor.map(lambda item: self._refresh_one(item, api_key), stale))
+        refreshed = sum(results)
+        self.stdout.write(self.style.SUCCESS(
+            f"Refreshed {refreshed} of {len(stale)} locations and venues "
+            f"({len(stale) - refreshed} failed) in {time.perf_counter() - started:.2f}s"
+        ))
@@ -0,0 +1,322 @@
+"""
+In-process metrics with Prometheus text exposition.
+
+Counters and histograms are kept per process and rendered by the /metrics
+view; scrape every worker (or run one worker per scrape target). The view
+only answers clients in settings.METRICS_ALLOWED_IPS (default: this host),
+so scrapers must reach it directly or the list must name them. Per-request
+phase timings ('google', 'db', ...) are collected through a context variable
+and emitted as a Server-Timing header by ServerTimingMiddleware.
+"""
+import contextvars
+import ipaddress
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+
+
+# Upper bounds (seconds) of the latency histogram buckets
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Clients (addresses or networks) allowed to read /metrics
+DEFAULT_METRICS_ALLOWED_IPS = ('127.0.0.1', '::1')
+
+
+def logger():
+    return logging.getLogger(__name__)
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{_escape(value)}"' for name, value in extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter with a fixed set of label names."""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values):
+        return self._values.get(label_values, 0)
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for label_values, value in sorted(values.items()):
+            yield f"{self.name}{_format_labels(self.labels, label_values)} {_format_number(value)}"
+
+
+class Histogram:
+    """Cumulative-bucket histogram with a fixed set of label names."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}   # label values -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        slot = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[slot] += 1
+            series[-1] += value
+
+    def count(self, *label_values):
+        series = self._series.get(label_values)
+        return sum(series[:-1]) if series else 0
+
+    def samples(self):
+        with self._lock:
+            all_series = {labels: list(series) for labels, series in self._series.items()}
+        for label_values, series in sorted(all_series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), series[:-1]):
+                cumulative += count
+                labels = _format_labels(self.labels, label_values, [('le', _format_number(bound))])
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labels, label_values)
+            yield f"{self.name}_sum{labels} {_format_number(series[-1])}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class Registry:
+    """Named collection of metrics rendered together."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labels=()):
+        return self.register(Counter(name, documentation, labels))
+
+    def histogram(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labels, buckets))
+
+    def render(self):
+        """Render every metric in the Prometheus text exposition format (0.0.4)."""
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+GOOGLE_REQUESTS = REGISTRY.counter(
+    'google_maps_requests_total', "Google Maps web service calls by endpoint, mode and response status",
+    ['endpoint', 'mode', 'status'],
+)
+GOOGLE_LATENCY = REGISTRY.histogram(
+    'google_maps_request_seconds', "Google Maps web service call latency", ['endpoint', 'mode', 'status'],
+)
+GOOGLE_TIMEOUTS = REGISTRY.counter(
+    'google_maps_timeouts_total', "Google Maps web service calls that timed out", ['endpoint'],
+)
+QUOTA_SHED = REGISTRY.counter(
+    'google_maps_quota_shed_total', "Google Maps calls shed by the quota scheduler, by priority and reason",
+    ['endpoint', 'priority', 'reason'],
+)
+QUOTA_WAIT = REGISTRY.histogram(
+    'google_maps_quota_wait_seconds', "Time Google Maps calls waited for a quota token", ['endpoint', 'priority'],
+)
+CACHE_LOOKUPS = REGISTRY.counter(
+    'google_maps_cache_lookups_total',
+    "Google Maps cache lookups by result (memory, database, coalesced or miss)",
+    ['endpoint', 'result'],
+)
+CATALOG_LATENCY = REGISTRY.histogram(
+    'catalog_query_seconds', "Catalog query latency", ['query'],
+)
+DB_LATENCY = REGISTRY.histogram(
+    'db_query_seconds', "Database query latency", ['alias'],
+)
+HTTP_LATENCY = REGISTRY.histogram(
+    'http_request_seconds', "HTTP request latency by view, method and status code", ['view', 'method', 'status'],
+)
+
+
+# Per-request phase intervals (name -> [(started, ended), ...]); None outside a request
+_request_timings = contextvars.ContextVar('request_timings', default=None)
+
+
+def add_timing(phase, seconds, ended=None):
+    """
+    Record that the current request spent `seconds` in a phase, ending now (or at `ended`).
+
+    Intervals rather than sums are kept, so calls that overlap (concurrent
+    Distance Matrix batches, for example) count their wall-clock time once.
+    """
+    timings = _request_timings.get()
+    if timings is not None:
+        ended = time.perf_counter() if ended is None else ended
+        timings.setdefault(phase, []).append((ended - seconds, ended))
+
+
+def _wall_clock(intervals):
+    """Length of the union of (started, ended) intervals."""
+    total = 0.0
+    current_start = current_end = None
+    for started, ended in sorted(intervals):
+        if current_end is None or started > current_end:
+            if current_end is not None:
+                total += current_end - current_start
+            current_start, current_end = started, ended
+        else:
+            current_end = max(current_end, ended)
+    if current_end is not None:
+        total += current_end - current_start
+    return total
+
+
+@contextmanager
+def timed(histogram, *label_values, phase=None):
+    """Observe the duration of the block in a histogram (and a request phase)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        ended = time.perf_counter()
+        histogram.observe(ended - started, *label_values)
+        if phase:
+            add_timing(phase, ended - started, ended)
+
+
+def record_google_call(endpoint, mode, status, seconds):
+    GOOGLE_REQUESTS.inc(endpoint, mode or '', status)
+    GOOGLE_LATENCY.observe(seconds, endpoint, mode or '', status)
+    add_timing('google', seconds)
+    if status == 'timeout':
+        GOOGLE_TIMEOUTS.inc(endpoint)
+
+
+def _time_query(execute, sql, params, many, context):
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        ended = time.perf_counter()
+        DB_LATENCY.observe(ended - started, context['connection'].alias)
+        add_timing('db', ended - started, ended)
+
+
+def _instrument_connection(sender, connection, **kwargs):
+    if _time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_time_query)
+
+
+connection_created.connect(_instrument_connection, dispatch_uid='locations.metrics')
+
+
+def _server_timing(timings, total):
+    parts = [f"{phase};dur={_wall_clock(intervals) * 1000:.1f}" for phase, intervals in sorted(timings.items())]
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ', '.join(parts)
+
+
+class ServerTimingMiddleware:
+    """
+    Time every request, collecting per-phase timings from the code it calls.
+
+    Request latency goes to http_request_seconds. With
+    settings.SERVER_TIMING_HEADERS (default: DEBUG) the response also gets a
+    Server-Timing header with the time spent in Google calls, database
+    queries and in total; the remainder is view logic and serialization.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        token = _request_timings.set({})
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+            return self._finish(request, response, started)
+        finally:
+            _request_timings.reset(token)
+
+    async def __acall__(self, request):
+        token = _request_timings.set({})
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+            return self._finish(request, response, started)
+        finally:
+            _request_timings.reset(token)
+
+    def _finish(self, request, response, started):
+        total = time.perf_counter() - started
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match and match.view_name else 'unmatched'
+        HTTP_LATENCY.observe(total, view, request.method, str(response.status_code))
+        if getattr(settings, 'SERVER_TIMING_HEADERS', settings.DEBUG):
+            response['Server-Timing'] = _server_timing(_request_timings.get(), total)
+        return response
+
+
+def metrics_allowed(request):
+    """Whether the client may read /metrics (see settings.METRICS_ALLOWED_IPS)."""
+    try:
+        address = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        return False
+    for allowed in getattr(settings, 'METRICS_ALLOWED_IPS', DEFAULT_METRICS_ALLOWED_IPS):
+        try:
+            if address in ipaddress.ip_network(allowed, strict=False):
+                return True
+        except ValueError:
+            logger().error(f"Invalid METRICS_ALLOWED_IPS entry: {allowed}")
+    return False
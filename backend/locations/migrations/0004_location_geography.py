@@ -0,0 +1,63 @@
+from django.db import migrations
+
+
+LOCATION_TABLES = [
+    'locations_architecture',
+    'locations_films',
+    'locations_history',
+    'locations_music',
+]
+
+SYNC_FUNCTION = """
+CREATE OR REPLACE FUNCTION locations_sync_geog() RETURNS trigger AS $$
+BEGIN
+    NEW.geog := ST_SetSRID(ST_MakePoint(NEW.longitude, NEW.latitude), 4326)::geography;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+def add_geography_columns(apps, schema_editor):
+    """
+    Add a GiST-indexed geography(Point) column to every location table on PostGIS.
+
+    The column is backfilled from latitude/longitude and kept in sync by a
+    trigger, so the ORM keeps writing the plain float fields. Other database
+    backends are left untouched.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS postgis")
+    schema_editor.execute(SYNC_FUNCTION)
+    for table in LOCATION_TABLES:
+        schema_editor.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS geog geography(Point, 4326)")
+        schema_editor.execute(
+            f"UPDATE {table} SET geog = ST_SetSRID(ST_MakePoint(longitude, latitude), 4326)::geography"
+        )
+        schema_editor.execute(f"CREATE INDEX IF NOT EXISTS {table}_geog_gist ON {table} USING GIST (geog)")
+        schema_editor.execute(f"DROP TRIGGER IF EXISTS {table}_sync_geog ON {table}")
+        schema_editor.execute(
+            f"CREATE TRIGGER {table}_sync_geog BEFORE INSERT OR UPDATE OF latitude, longitude "
+            f"ON {table} FOR EACH ROW EXECUTE FUNCTION locations_sync_geog()"
+        )
+
+
+def remove_geography_columns(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table in LOCATION_TABLES:
+        schema_editor.execute(f"DROP TRIGGER IF EXISTS {table}_sync_geog ON {table}")
+        schema_editor.execute(f"ALTER TABLE {table} DROP COLUMN IF EXISTS geog")
+    schema_editor.execute("DROP FUNCTION IF EXISTS locations_sync_geog()")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('locations', '0003_cachedresponse'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_geography_columns, remove_geography_columns),
+    ]
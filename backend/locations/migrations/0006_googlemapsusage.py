@@ -0,0 +1,25 @@
+# Generated by Django 6.0.2 on 2026-10-18 18:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('locations', '0005_place_details_fields'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GoogleMapsUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('endpoint', models.CharField(max_length=32)),
+                ('day', models.DateField()),
+                ('used', models.IntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('endpoint', 'day'), name='unique_google_maps_usage_day')],
+            },
+        ),
+    ]
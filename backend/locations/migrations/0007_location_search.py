@@ -0,0 +1,105 @@
+"""
+Full-text search indexes for the location tables (see locations.search).
+
+On SQLite the FTS5 table only stays in sync through triggers on the
+location tables. SQLite drops a table's triggers when the table is
+dropped, and Django's SQLite schema editor rebuilds the whole table
+(create, copy, drop, rename) for most AlterField/RemoveField operations. A
+later migration that does that to a location table silently disconnects
+search: run 'manage.py rebuild_search_index' after it. The locations.W001
+system check ('manage.py check --database default', also run by migrate)
+reports missing triggers.
+"""
+from django.db import migrations
+from django.db.utils import OperationalError
+
+
+# Location type codes folded into the FTS5 rowid (id * 4 + code); see locations.search
+LOCATION_TABLES = {
+    'locations_architecture': 0,
+    'locations_films': 1,
+    'locations_history': 2,
+    'locations_music': 3,
+}
+
+SEARCH_VECTOR = (
+    "setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(fact, '')), 'B')"
+)
+
+
+def _add_postgres_search(schema_editor):
+    for table in LOCATION_TABLES:
+        schema_editor.execute(
+            f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search tsvector "
+            f"GENERATED ALWAYS AS ({SEARCH_VECTOR}) STORED"
+        )
+        schema_editor.execute(f"CREATE INDEX IF NOT EXISTS {table}_search_gin ON {table} USING GIN (search)")
+
+
+def _add_sqlite_search(schema_editor):
+    try:
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS locations_search USING fts5("
+            "name, fact, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+    except OperationalError:
+        # SQLite built without FTS5: locations.search falls back to LIKE queries
+        return
+    for table, code in LOCATION_TABLES.items():
+        row = f"NEW.id * 4 + {code}, NEW.name, NEW.fact"
+        schema_editor.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {table}_search_insert AFTER INSERT ON {table} BEGIN "
+            f"INSERT INTO locations_search(rowid, name, fact) VALUES ({row}); END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {table}_search_update AFTER UPDATE OF id, name, fact ON {table} BEGIN "
+            f"DELETE FROM locations_search WHERE rowid = OLD.id * 4 + {code}; "
+            f"INSERT INTO locations_search(rowid, name, fact) VALUES ({row}); END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {table}_search_delete AFTER DELETE ON {table} BEGIN "
+            f"DELETE FROM locations_search WHERE rowid = OLD.id * 4 + {code}; END"
+        )
+        schema_editor.execute(
+            f"INSERT INTO locations_search(rowid, name, fact) SELECT id * 4 + {code}, name, fact FROM {table}"
+        )
+
+
+def add_search_index(apps, schema_editor):
+    """
+    Index location names and facts for full-text search.
+
+    On PostgreSQL every location table gets a generated, GIN-indexed
+    tsvector column (name weighted above fact). On SQLite one FTS5 table
+    covers all location tables and is kept in sync by triggers, so bulk
+    writes are indexed too.
+    """
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        _add_postgres_search(schema_editor)
+    elif vendor == 'sqlite':
+        _add_sqlite_search(schema_editor)
+
+
+def remove_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        for table in LOCATION_TABLES:
+            schema_editor.execute(f"ALTER TABLE {table} DROP COLUMN IF EXISTS search")
+    elif vendor == 'sqlite':
+        for table in LOCATION_TABLES:
+            for event in ('insert', 'update', 'delete'):
+                schema_editor.execute(f"DROP TRIGGER IF EXISTS {table}_search_{event}")
+        schema_editor.execute("DROP TABLE IF EXISTS locations_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('locations', '0006_googlemapsusage'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_search_index, remove_search_index),
+    ]
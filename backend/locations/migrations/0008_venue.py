@@ -0,0 +1,52 @@
+# Generated by Django 6.0.2 on 2026-10-18 18:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('locations', '0007_location_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Venue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('place_id', models.CharField(blank=True, default='', max_length=255)),
+                ('formatted_address', models.CharField(blank=True, default='', max_length=512)),
+                ('rating', models.FloatField(blank=True, null=True)),
+                ('opening_periods', models.JSONField(blank=True, null=True)),
+                ('opening_weekday_text', models.JSONField(blank=True, null=True)),
+                ('place_details_refreshed_at', models.DateTimeField(blank=True, db_index=True, null=True)),
+                ('name', models.CharField(max_length=255)),
+                ('latitude', models.FloatField()),
+                ('longitude', models.FloatField()),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.AddField(
+            model_name='architecture',
+            name='venue',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='locations.venue'),
+        ),
+        migrations.AddField(
+            model_name='films',
+            name='venue',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='locations.venue'),
+        ),
+        migrations.AddField(
+            model_name='history',
+            name='venue',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='locations.venue'),
+        ),
+        migrations.AddField(
+            model_name='music',
+            name='venue',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='locations.venue'),
+        ),
+    ]
@@ -1,38 +1,105 @@
 from django.db import models
 
-class Architecture(models.Model):
+class PlaceDetailsFields(models.Model):
+    """Google Places data stored on each location and refreshed by the refresh_place_details command."""
+    place_id = models.CharField(max_length=255, blank=True, default='')
+    formatted_address = models.CharField(max_length=512, blank=True, default='')
+    rating = models.FloatField(null=True, blank=True)
+    # Places 'opening_hours.periods' and 'weekday_text'; null when Google has no hours
+    opening_periods = models.JSONField(null=True, blank=True)
+    opening_weekday_text = models.JSONField(null=True, blank=True)
+    place_details_refreshed_at = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    class Meta:
+        abstract = True
+
+class Venue(PlaceDetailsFields):
+    """
+    One physical venue shared by the catalog entries at it (see locations.venues).
+
+    Routing and Places enrichment run once per venue instead of once per entry.
+    """
+    name = models.CharField(max_length=255)
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+
+    def __str__(self):
+        return self.name
+
+class Architecture(PlaceDetailsFields):
     name =  models.CharField(max_length=255)
     latitude = models.FloatField()
     longitude = models.FloatField()
     fact = models.TextField()
+    venue = models.ForeignKey(Venue, null=True, blank=True, on_delete=models.SET_NULL)
 
     def __str__(self):
         return f"{self.name} - {self.fact}"
 
-class History(models.Model):
+class History(PlaceDetailsFields):
     name =  models.CharField(max_length=255)
     latitude = models.FloatField()
     longitude = models.FloatField()
     fact = models.TextField()
+    venue = models.ForeignKey(Venue, null=True, blank=True, on_delete=models.SET_NULL)
 
 
     def __str__(self):
         return f"{self.name} - {self.fact}"
     
-class Music(models.Model):
+class Music(PlaceDetailsFields):
     name =  models.CharField(max_length=255)
     latitude = models.FloatField()
     longitude = models.FloatField()
     fact = models.TextField()
+    venue = models.ForeignKey(Venue, null=True, blank=True, on_delete=models.SET_NULL)
 
     def __str__(self):
         return f"{self.name} - {self.fact}"
     
-class Films(models.Model):
+class Films(PlaceDetailsFields):
     name =  models.CharField(max_length=255)
     latitude = models.FloatField()
     longitude = models.FloatField()
     fact = models.TextField()
+    venue = models.ForeignKey(Venue, null=True, blank=True, on_delete=models.SET_NULL)
+
+    def __str__(self):
+        return f"{self.name} - {self.fact}"
+
+class CachedResponse(models.Model):
+    """Persisted Google Maps response, keyed by endpoint, mode and quantized coordinates."""
+    key = models.CharField(max_length=255, unique=True)
+    endpoint = models.CharField(max_length=32)
+    payload = models.JSONField()
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return self.key
+
+class CatalogVersion(models.Model):
+    """
+    Single row counting catalog writes (see locations.catalog.get_catalog_version).
+
+    Every process compares it with the version its derived state (spatial
+    index, clusters, snapshot) was built from, so a write in one process
+    invalidates that state in all of them.
+    """
+    version = models.PositiveBigIntegerField(default=1)
+
+    def __str__(self):
+        return f"catalog version {self.version}"
+
+class GoogleMapsUsage(models.Model):
+    """Google Maps calls made per endpoint per (Pacific) day, shared by every process (see locations.quota)."""
+    endpoint = models.CharField(max_length=32)
+    day = models.DateField()
+    used = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['endpoint', 'day'], name='unique_google_maps_usage_day'),
+        ]
 
     def __str__(self):
-        return f"{self.name} - {self.fact}"
\ No newline at end of file
+        return f"{self.endpoint} {self.day}: {self.used}"
@@ -0,0 +1,208 @@
+import logging
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import api
+from .catalog import CATEGORY_MODELS
+from .models import Venue
+
+
+# Opening hours are in the places' local time
+DEFAULT_PLACE_TIME_ZONE = 'America/Chicago'
+PLACE_DETAILS_FIELDS = ('place_id', 'formatted_address', 'rating', 'opening_periods', 'opening_weekday_text')
+MINUTES_PER_WEEK = 7 * 24 * 60
+
+
+def logger():
+    return logging.getLogger(__name__)
+
+
+def place_time_zone():
+    return ZoneInfo(getattr(settings, 'PLACE_TIME_ZONE', DEFAULT_PLACE_TIME_ZONE))
+
+
+def _minute_of_week(day, hhmm):
+    """Minutes since Sunday 00:00 for a Places (day, 'HHMM') pair; day 0 is Sunday."""
+    return day * 24 * 60 + int(hhmm[:2]) * 60 + int(hhmm[2:])
+
+
+def is_open_at(periods, when=None):
+    """
+    Work out from a stored weekly schedule whether a place is open.
+
+    Args:
+        periods (list): Places 'opening_hours.periods' ([{'open': {'day', 'time'}, 'close': {...}}])
+        when (datetime, optional): Moment to check (defaults to now)
+
+    Returns:
+        bool: Whether the place is open, or None when there is no schedule
+    """
+    if not periods:
+        return None
+    when = (when or timezone.now()).astimezone(place_time_zone())
+    # Python weeks start on Monday, Places weeks on Sunday
+    now = _minute_of_week((when.weekday() + 1) % 7, f"{when.hour:02d}{when.minute:02d}")
+    for period in periods:
+        if 'close' not in period:
+            # A period without a close time means open around the clock
+            return True
+        start = _minute_of_week(period['open']['day'], period['open']['time'])
+        end = _minute_of_week(period['close']['day'], period['close']['time'])
+        if end <= start:
+            end += MINUTES_PER_WEEK
+        if start <= now < end or start <= now + MINUTES_PER_WEEK < end:
+            return True
+    return False
+
+
+def format_place_details(row, when=None):
+    """
+    Build the place details response from a location's stored fields.
+
+    Args:
+        row: Location instance or values() dict carrying PLACE_DETAILS_FIELDS
+        when (datetime, optional): Moment is_open is evaluated for
+
+    Returns:
+        dict: Place details, {} if the location has not been matched to a place yet
+    """
+    get = row.get if isinstance(row, dict) else lambda name: getattr(row, name)
+    if not get('place_id'):
+        return {}
+    periods = get('opening_periods')
+    return {
+        'place_id': get('place_id'),
+        'opening_hours': {'periods': periods, 'weekday_text': get('opening_weekday_text')} if periods else None,
+        'is_open': is_open_at(periods, when),
+        'rating': get('rating'),
+        'formatted_address': get('formatted_address'),
+    }
+
+
+def get_stored_place_details(locations, when=None):
+    """
+    Look up stored place details for many locations with one query per type.
+
+    Args:
+        locations (list): (location_type, id) pairs
+
+    Returns:
+        dict: (location_type, id) -> place details dict ({} when not matched yet)
+    """
+    by_type = {}
+    for location_type, location_id in locations:
+        by_type.setdefault(location_type, set()).add(location_id)
+    details = {}
+    for location_type, ids in by_type.items():
+        rows = CATEGORY_MODELS[location_type].objects.filter(id__in=ids).values('id', *PLACE_DETAILS_FIELDS)
+        for row in rows:
+            details[(location_type, row['id'])] = format_place_details(row, when)
+    return {location: details.get(location, {}) for location in locations}
+
+
+def _refresh_details_params(place_id, api_key):
+    return {
+        'place_id': place_id,
+        'fields': 'place_id,opening_hours,rating,formatted_address',
+        'key': api_key
+    }
+
+
+def fetch_place_fields(location, api_key):
+    """
+    Fetch current Places data for one location.
+
+    A stored place_id is reused; the Nearby Search is only run when there
+    is none yet or Google no longer recognises it.
+
+    Returns:
+        dict: Values for PLACE_DETAILS_FIELDS ('' / None when no place matches),
+              or None if a request failed
+    """
+    place_id = location.place_id
+    data = None
+    if place_id:
+        data = api._google_get('place/details', _refresh_details_params(place_id, api_key))
+        if data and data['status'] in ('NOT_FOUND', 'INVALID_REQUEST'):
+            data = None
+            place_id = ''
+    if not place_id:
+        params = api._nearby_search_params(location.latitude, location.longitude, api_key)
+        params['keyword'] = location.name
+        place_id = api._parse_nearby_search(api._google_get('place/nearbysearch', params))
+        if place_id is None:
+            return None
+        if not place_id:
+            return {'place_id': '', 'formatted_address': '', 'rating': None,
+                    'opening_periods': None, 'opening_weekday_text': None}
+        data = api._google_get('place/details', _refresh_details_params(place_id, api_key))
+    if not data or data['status'] != 'OK':
+        return None
+    result = data.get('result', {})
+    opening_hours = result.get('opening_hours') or {}
+    return {
+        'place_id': result.get('place_id') or place_id,
+        'formatted_address': (result.get('formatted_address') or '')[:512],
+        'rating': result.get('rating'),
+        'opening_periods': opening_hours.get('periods'),
+        'opening_weekday_text': opening_hours.get('weekday_text'),
+    }
+
+
+def refresh_place_details(location_type, location, api_key):
+    """
+    Refresh and store one location's place details.
+
+    The row is written with a queryset update so the refresh does not count
+    as a catalog change (no signals, no spatial index work).
+
+    Returns:
+        bool: Whether the location was refreshed
+    """
+    try:
+        fields = fetch_place_fields(location, api_key)
+    except Exception as e:
+        logger().error(f"Error refreshing place details for {location_type} {location.id}: {str(e)}")
+        return False
+    if fields is None:
+        return False
+    CATEGORY_MODELS[location_type].objects.filter(id=location.id).update(
+        place_details_refreshed_at=timezone.now(), **fields
+    )
+    return True
+
+
+def store_venue_place_details(venue_id, **fields):
+    """Write place details onto a venue and every catalog entry linked to it."""
+    Venue.objects.filter(id=venue_id).update(**fields)
+    for model in CATEGORY_MODELS.values():
+        model.objects.filter(venue_id=venue_id).update(**fields)
+
+
+def refresh_venue_details(venue, api_key):
+    """
+    Refresh one venue's place details with a single lookup shared by its entries.
+
+    Returns:
+        bool: Whether the venue was refreshed
+    """
+    try:
+        fields = fetch_place_fields(venue, api_key)
+    except Exception as e:
+        logger().error(f"Error refreshing place details for venue {venue.id}: {str(e)}")
+        return False
+    if fields is None:
+        return False
+    store_venue_place_details(venue.id, place_details_refreshed_at=timezone.now(), **fields)
+    return True
+
+
+def nearest_stored_place_details(index, latitude, longitude, max_distance_km=0.05):
+    """Stored place details of the indexed location at (latitude, longitude), {} if there is none."""
+    nearest = index.nearest(latitude, longitude, k=1, max_distance_km=max_distance_km)
+    if not nearest:
+        return {}
+    location = (nearest[0].location_type, nearest[0].id)
+    return get_stored_place_details([location])[location]
@@ -0,0 +1,72 @@
+from django.conf import settings
+
+from .catalog import CATEGORY_MODELS
+from .routers import catalog_connection
+from .spatial import IndexedLocation
+
+
+ORIGIN_SQL = "ST_SetSRID(ST_MakePoint(%s, %s), 4326)::geography"
+
+
+def postgis_enabled():
+    """True when running against the PostGIS database (see USE_POSTGIS in settings)."""
+    return getattr(settings, 'USE_POSTGIS', False) and catalog_connection().vendor == 'postgresql'
+
+
+def _tables(location_type):
+    models = CATEGORY_MODELS.items()
+    if location_type is not None:
+        models = [(location_type, CATEGORY_MODELS[location_type])]
+    return [(name, model._meta.db_table) for name, model in models]
+
+
+def _run(sql, params):
+    with catalog_connection().cursor() as cursor:
+        cursor.execute(sql, params)
+        return [
+            IndexedLocation(location_type, location_id, name, latitude, longitude, distance_m / 1000, venue_id)
+            for location_type, location_id, name, latitude, longitude, distance_m, venue_id in cursor.fetchall()
+        ]
+
+
+def nearest_locations(latitude, longitude, limit=10, location_type=None, max_distance_km=None):
+    """
+    Find the nearest locations with a KNN (<->) scan of each table's GiST index.
+
+    Returns:
+        list: IndexedLocation tuples, nearest first
+    """
+    subqueries = []
+    params = []
+    for name, table in _tables(location_type):
+        where = ''
+        subquery_params = [name, longitude, latitude]
+        if max_distance_km is not None:
+            where = f"WHERE ST_DWithin(geog, {ORIGIN_SQL}, %s)"
+            subquery_params += [longitude, latitude, max_distance_km * 1000]
+        subqueries.append(
+            f"(SELECT %s, id, name, latitude, longitude, ST_Distance(geog, {ORIGIN_SQL}) AS distance_m, venue_id "
+            f"FROM {table} {where} ORDER BY geog <-> {ORIGIN_SQL} LIMIT %s)"
+        )
+        params += subquery_params + [longitude, latitude, limit]
+    sql = f"SELECT * FROM ({' UNION ALL '.join(subqueries)}) AS nearest ORDER BY distance_m LIMIT %s"
+    return _run(sql, params + [limit])
+
+
+def locations_within_radius(latitude, longitude, radius_km, location_type=None):
+    """
+    Find every location within radius_km using ST_DWithin on the geography columns.
+
+    Returns:
+        list: IndexedLocation tuples, nearest first
+    """
+    subqueries = []
+    params = []
+    for name, table in _tables(location_type):
+        subqueries.append(
+            f"(SELECT %s, id, name, latitude, longitude, ST_Distance(geog, {ORIGIN_SQL}) AS distance_m, venue_id "
+            f"FROM {table} WHERE ST_DWithin(geog, {ORIGIN_SQL}, %s))"
+        )
+        params += [name, longitude, latitude, longitude, latitude, radius_km * 1000]
+    sql = f"SELECT * FROM ({' UNION ALL '.join(subqueries)}) AS within ORDER BY distance_m"
+    return _run(sql, params)
@@ -0,0 +1,193 @@
+"""
+WebSocket push channel for nearby locations.
+
+Clients open ws://<host>/ws/nearby/ and send their position as JSON
+({"latitude": .., "longitude": .., "type": .., "radius_km": .., "limit": ..})
+whenever it changes. The server answers only when something changed:
+
+    {"event": "nearby", "results": [...]}   ranked nearby list changed
+    {"event": "near", "location": {...}}    the user just came within NEAR_RADIUS_KM of a location
+    {"event": "error", "error": "..."}      the last message was invalid
+
+Per-connection state is a single pending position (newer ones overwrite
+it) plus the keys last sent, so memory stays bounded however fast a
+client sends and however many connections a process holds.
+"""
+import asyncio
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .catalog import CATEGORY_MODELS
+from .feed import FEED_DEFAULT_LIMIT, FEED_DEFAULT_RADIUS_KM, MOVEMENT_THRESHOLD_KM, _item
+from .geo import haversine_km
+from .spatial import get_spatial_index
+
+
+NEARBY_SOCKET_PATH = '/ws/nearby/'
+DEFAULT_MAX_PUSH_CONNECTIONS = 5000
+# "You are near X" fires when a location comes within this distance
+NEAR_RADIUS_KM = 0.05
+MAX_PUSH_LIMIT = 25
+MAX_PUSH_RADIUS_KM = 10
+# Messages larger than this are rejected without being parsed
+MAX_MESSAGE_BYTES = 1024
+# Idle connections re-check the catalog this often (seconds)
+CATALOG_CHECK_INTERVAL = 30
+
+_connections = 0
+
+
+def logger():
+    return logging.getLogger(__name__)
+
+
+def _parse_position(text):
+    """Validate one client message into (latitude, longitude, location_type, radius_km, limit)."""
+    if text is None or len(text) > MAX_MESSAGE_BYTES:
+        raise ValueError("Message must be a JSON object of at most 1 KB")
+    try:
+        message = json.loads(text)
+        latitude = float(message['latitude'])
+        longitude = float(message['longitude'])
+        radius_km = min(float(message.get('radius_km') or FEED_DEFAULT_RADIUS_KM), MAX_PUSH_RADIUS_KM)
+        limit = min(int(message.get('limit') or FEED_DEFAULT_LIMIT), MAX_PUSH_LIMIT)
+    except (KeyError, TypeError, ValueError, AttributeError):
+        raise ValueError("latitude and longitude must be numbers")
+    location_type = message.get('type') or None
+    if location_type is not None and location_type not in CATEGORY_MODELS:
+        raise ValueError(f"Unknown location type: {location_type}")
+    if limit < 1 or radius_km <= 0:
+        raise ValueError("limit and radius_km must be positive")
+    return latitude, longitude, location_type, radius_km, limit
+
+
+class NearbySession:
+    """State of one push connection: the pending position and what was last sent."""
+
+    def __init__(self, send):
+        self._send = send
+        self._pending = None
+        self._wakeup = asyncio.Event()
+        self.closed = False
+        self.position = None       # last (latitude, longitude) that was ranked
+        self.query = None          # (location_type, radius_km, limit) of the last ranking
+        self.version = None        # catalog version of the last ranking
+        self.keys = ()             # ordered keys last pushed in a 'nearby' event
+        self.near = frozenset()    # keys the user was last near
+
+    def offer(self, position):
+        """Replace any position not yet processed with a newer one."""
+        self._pending = position
+        self._wakeup.set()
+
+    def close(self):
+        self.closed = True
+        self._wakeup.set()
+
+    async def next_position(self, timeout):
+        """Wait for the next position; None on timeout or close."""
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        self._wakeup.clear()
+        position, self._pending = self._pending, None
+        return position
+
+    async def send_json(self, payload):
+        await self._send({'type': 'websocket.send', 'text': json.dumps(payload)})
+
+    async def update(self, latitude, longitude, location_type, radius_km, limit):
+        """Re-rank around the position and push whatever changed."""
+        index = await sync_to_async(get_spatial_index, thread_sensitive=False)()
+        query = (location_type, radius_km, limit)
+        if (self.position is not None and self.query == query and self.version == index.version
+                and haversine_km(*self.position, latitude, longitude) < MOVEMENT_THRESHOLD_KM):
+            return
+        self.position, self.query, self.version = (latitude, longitude), query, index.version
+
+        nearest = index.nearest(
+            latitude, longitude, k=limit,
+            location_types=None if location_type is None else [location_type],
+            max_distance_km=radius_km,
+        )
+        items = [_item(location) for location in nearest]
+        keys = tuple(item['key'] for item in items)
+        if keys != self.keys:
+            self.keys = keys
+            await self.send_json({'event': 'nearby', 'results': items})
+
+        near = frozenset(item['key'] for item in items if item['distance_km'] <= NEAR_RADIUS_KM)
+        for item in items:
+            if item['key'] in near and item['key'] not in self.near:
+                await self.send_json({'event': 'near', 'location': item})
+        self.near = near
+
+
+async def _receive_positions(receive, session):
+    """Read client messages until disconnect, handing the latest position to the session."""
+    try:
+        while True:
+            message = await receive()
+            if message['type'] == 'websocket.disconnect':
+                break
+            if message['type'] != 'websocket.receive':
+                continue
+            text = message.get('text')
+            if text is None and message.get('bytes') is not None and len(message['bytes']) <= MAX_MESSAGE_BYTES:
+                text = message['bytes'].decode('utf-8', errors='replace')
+            try:
+                session.offer(_parse_position(text))
+            except ValueError as e:
+                await session.send_json({'event': 'error', 'error': str(e)})
+    finally:
+        session.close()
+
+
+async def nearby_socket(scope, receive, send):
+    """ASGI WebSocket handler for the nearby push channel."""
+    global _connections
+    message = await receive()
+    if message['type'] != 'websocket.connect':
+        return
+    if _connections >= getattr(settings, 'MAX_PUSH_CONNECTIONS', DEFAULT_MAX_PUSH_CONNECTIONS):
+        # 1013: try again later
+        await send({'type': 'websocket.close', 'code': 1013})
+        return
+
+    _connections += 1
+    await send({'type': 'websocket.accept'})
+    session = NearbySession(send)
+    reader = asyncio.create_task(_receive_positions(receive, session))
+    last = None
+    try:
+        while not session.closed:
+            position = await session.next_position(CATALOG_CHECK_INTERVAL)
+            if position is None:
+                # Idle: re-rank the last position in case the catalog changed
+                position = last
+            if position is None or session.closed:
+                continue
+            last = position
+            await session.update(*position)
+    except Exception as e:
+        logger().error(f"Error in nearby push connection: {str(e)}")
+    finally:
+        _connections -= 1
+        reader.cancel()
+        try:
+            await send({'type': 'websocket.close', 'code': 1000})
+        except Exception:
+            pass
+
+
+async def websocket_application(scope, receive, send):
+    """Route WebSocket connections by path; anything unknown is rejected."""
+    if scope['path'] == NEARBY_SOCKET_PATH:
+        await nearby_socket(scope, receive, send)
+        return
+    await receive()
+    await send({'type': 'websocket.close', 'code': 1000})
@@ -0,0 +1,319 @@
+"""
+Request budget for the Google Maps web services.
+
+Every upstream call first takes tokens from its endpoint's bucket, which
+enforces a per-process QPS limit and a daily budget (optionally shared by
+all processes through the GoogleMapsUsage table). A call costs one unit,
+except Distance Matrix calls, which Google limits and bills per element
+(origins x destinations) and which are charged that many units. Calls run with a
+priority: interactive requests may use the whole bucket, while background
+work (enrichment, matrix builds) keeps clear of a reserve and of the last
+part of the daily budget. When a call cannot be served in time it is shed
+with QuotaExceeded instead of piling up into an error storm.
+"""
+import asyncio
+import contextvars
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DatabaseError, transaction
+from django.db.models import F
+
+from .metrics import QUOTA_SHED, QUOTA_WAIT
+from .models import GoogleMapsUsage
+
+
+INTERACTIVE = 'interactive'
+BACKGROUND = 'background'
+
+DEFAULT_QUOTA_SETTINGS = {
+    'SHARED': False,                  # coordinate daily budgets through the database
+    'LEASE_SIZE': 20,                 # daily units a process reserves from the database at a time
+    'BACKGROUND_RESERVE': 0.25,       # share of each bucket background calls must leave untouched
+    'BACKGROUND_DAILY_SHARE': 0.8,    # share of the daily budget background calls may use
+    'INTERACTIVE_MAX_WAIT': 2,        # seconds an interactive call may wait for a token
+    'BACKGROUND_MAX_WAIT': 30,
+    'MAX_BACKOFF': 60,                # seconds, cap for OVER_QUERY_LIMIT backoff
+    'LIMITS': {
+        'DEFAULT': {'QPS': 10, 'DAILY': None},
+    },
+}
+# Google's daily quotas reset at midnight Pacific Time
+QUOTA_TIME_ZONE = ZoneInfo('America/Los_Angeles')
+
+_priority = contextvars.ContextVar('google_maps_priority', default=INTERACTIVE)
+
+
+def logger():
+    return logging.getLogger(__name__)
+
+
+class QuotaExceeded(Exception):
+    """A Google Maps call was shed because of the QPS limit, daily budget or backoff."""
+
+
+def current_priority():
+    return _priority.get()
+
+
+@contextmanager
+def request_priority(priority):
+    """Run the enclosed Google calls at the given priority (INTERACTIVE or BACKGROUND)."""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def quota_day():
+    return datetime.now(QUOTA_TIME_ZONE).date()
+
+
+class DailyBudget:
+    """
+    Units used today for one endpoint.
+
+    With shared=True units are leased from the GoogleMapsUsage row in blocks
+    of lease_size, so processes never exceed the budget between them by
+    more than their unused leases. The budget has its own lock, so a lease
+    waiting on the database does not hold up the endpoint's token bucket.
+    """
+
+    def __init__(self, endpoint, limit, shared=False, lease_size=20):
+        self.endpoint = endpoint
+        self.limit = limit
+        self.shared = shared
+        self.lease_size = lease_size
+        self.day = None
+        self.used = 0        # units used today (all processes when shared, as of the last lease)
+        self.leased = 0      # unspent units this process holds (shared mode)
+        self.lock = threading.Lock()
+
+    def _roll_over(self):
+        today = quota_day()
+        if today != self.day:
+            self.day, self.used, self.leased = today, 0, 0
+
+    def try_take(self, ceiling, units=1):
+        """Take units if usage stays within ceiling; returns whether they were taken."""
+        with self.lock:
+            self._roll_over()
+            if not self.shared:
+                if self.used + units > ceiling:
+                    return False
+                self.used += units
+                return True
+            if self.leased < units and not self._lease(ceiling, units - self.leased):
+                return False
+            self.leased -= units
+            return True
+
+    def _lease(self, ceiling, needed=1):
+        try:
+            # Create-or-ignore, so processes starting the day together do not race on the insert
+            GoogleMapsUsage.objects.bulk_create(
+                [GoogleMapsUsage(endpoint=self.endpoint, day=self.day)], ignore_conflicts=True
+            )
+            with transaction.atomic():
+                usage = GoogleMapsUsage.objects.select_for_update().get(endpoint=self.endpoint, day=self.day)
+                size = min(max(self.lease_size, needed), int(ceiling) - usage.used)
+                if size < needed:
+                    self.used = usage.used
+                    return False
+                GoogleMapsUsage.objects.filter(pk=usage.pk).update(used=F('used') + size)
+                self.used = usage.used + size
+                self.leased += size
+                return True
+        except DatabaseError as e:
+            logger().error(f"Error leasing Google Maps quota for {self.endpoint}: {str(e)}")
+            return False
+
+
+class EndpointQuota:
+    """Token bucket, daily budget and backoff state for one endpoint."""
+
+    def __init__(self, endpoint, qps, daily, options):
+        if not qps or qps <= 0:
+            raise ImproperlyConfigured(f"GOOGLE_MAPS_QUOTA QPS for {endpoint} must be positive")
+        self.endpoint = endpoint
+        self.rate = qps
+        self.capacity = max(1.0, float(qps))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.reserve = self.capacity * options['BACKGROUND_RESERVE']
+        self.daily = DailyBudget(endpoint, daily, options['SHARED'], options['LEASE_SIZE']) if daily else None
+        self.background_ceiling = daily * options['BACKGROUND_DAILY_SHARE'] if daily else None
+        self.max_backoff = options['MAX_BACKOFF']
+        self.backoff = 0.0
+        self.blocked_until = 0.0
+        self.interactive_waiting = 0
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve_token(self, priority, now, units=1):
+        """
+        Try to take units tokens.
+
+        A call costing more than the bucket holds goes out once the bucket is
+        full and leaves it in debt, which later calls wait out.
+
+        Returns:
+            float: 0 when granted, otherwise seconds to wait before retrying
+
+        Raises:
+            QuotaExceeded: The daily budget (or this priority's share of it) is used up
+        """
+        with self.lock:
+            if now < self.blocked_until:
+                return self.blocked_until - now
+            self._refill(now)
+            needed = float(units)
+            if priority == BACKGROUND:
+                if self.interactive_waiting:
+                    return 1.0 / self.rate
+                needed += self.reserve
+            # A full bucket always lets a call out, however much it costs
+            needed = min(needed, self.capacity)
+            if self.tokens < needed:
+                return (needed - self.tokens) / self.rate
+            self.tokens -= units
+        if self.daily is not None:
+            # Outside the bucket lock: taking daily units may lease from the database
+            ceiling = self.background_ceiling if priority == BACKGROUND else self.daily.limit
+            if not self.daily.try_take(ceiling, units):
+                with self.lock:
+                    self.tokens = min(self.capacity, self.tokens + units)
+                raise QuotaExceeded(f"Daily {priority} budget for {self.endpoint} is used up")
+        return 0.0
+
+    def report(self, status):
+        """Back off exponentially after OVER_QUERY_LIMIT / HTTP 429 and reset on success."""
+        with self.lock:
+            if status in ('OVER_QUERY_LIMIT', 'HTTP 429'):
+                self.backoff = min(self.max_backoff, self.backoff * 2 if self.backoff else 1.0)
+                self.blocked_until = time.monotonic() + self.backoff
+                self.tokens = 0.0
+                logger().warning(f"Google Maps {self.endpoint} over query limit; backing off {self.backoff:.0f}s")
+            elif status != 'timeout':
+                self.backoff = 0.0
+
+
+class GoogleMapsQuota:
+    """Per-endpoint quotas built from settings.GOOGLE_MAPS_QUOTA."""
+
+    def __init__(self, options):
+        self.options = options
+        self._endpoints = {}
+        self._lock = threading.Lock()
+
+    def _endpoint(self, endpoint):
+        quota = self._endpoints.get(endpoint)
+        if quota is None:
+            with self._lock:
+                quota = self._endpoints.get(endpoint)
+                if quota is None:
+                    limits = self.options['LIMITS']
+                    limit = {**limits.get('DEFAULT', {}), **limits.get(endpoint, {})}
+                    quota = EndpointQuota(endpoint, limit.get('QPS', 10), limit.get('DAILY'), self.options)
+                    self._endpoints[endpoint] = quota
+        return quota
+
+    def _max_wait(self, priority):
+        return self.options['BACKGROUND_MAX_WAIT' if priority == BACKGROUND else 'INTERACTIVE_MAX_WAIT']
+
+    def _shed(self, quota, priority, reason):
+        QUOTA_SHED.inc(quota.endpoint, priority, reason)
+        return QuotaExceeded(f"Shed {priority} {quota.endpoint} call ({reason})")
+
+    def _next_wait(self, quota, priority, started, deadline, units):
+        """Seconds to wait before the next attempt (0 once tokens are granted), or raise QuotaExceeded."""
+        now = time.monotonic()
+        try:
+            wait = quota.reserve_token(priority, now, units)
+        except QuotaExceeded:
+            raise self._shed(quota, priority, 'daily')
+        if not wait:
+            QUOTA_WAIT.observe(now - started, quota.endpoint, priority)
+        elif now + wait > deadline:
+            raise self._shed(quota, priority, 'backoff' if now < quota.blocked_until else 'rate')
+        return wait
+
+    def _set_waiting(self, quota, priority, delta):
+        # Background calls hold back while an interactive call is queued
+        if priority == INTERACTIVE:
+            with quota.lock:
+                quota.interactive_waiting += delta
+
+    def acquire(self, endpoint, units=1):
+        """Block until a call to endpoint costing units may go out, or raise QuotaExceeded."""
+        quota = self._endpoint(endpoint)
+        priority = current_priority()
+        started = time.monotonic()
+        deadline = started + self._max_wait(priority)
+        wait = self._next_wait(quota, priority, started, deadline, units)
+        if not wait:
+            return
+        self._set_waiting(quota, priority, 1)
+        try:
+            while wait:
+                time.sleep(wait)
+                wait = self._next_wait(quota, priority, started, deadline, units)
+        finally:
+            self._set_waiting(quota, priority, -1)
+
+    async def aacquire(self, endpoint, units=1):
+        """Async variant of acquire; waits without blocking the event loop."""
+        quota = self._endpoint(endpoint)
+        priority = current_priority()
+        started = time.monotonic()
+        deadline = started + self._max_wait(priority)
+        # Leasing from a shared daily budget touches the database
+        shared = quota.daily is not None and quota.daily.shared
+
+        async def attempt():
+            if shared:
+                return await sync_to_async(self._next_wait, thread_sensitive=False)(
+                    quota, priority, started, deadline, units
+                )
+            return self._next_wait(quota, priority, started, deadline, units)
+
+        wait = await attempt()
+        if not wait:
+            return
+        self._set_waiting(quota, priority, 1)
+        try:
+            while wait:
+                await asyncio.sleep(wait)
+                wait = await attempt()
+        finally:
+            self._set_waiting(quota, priority, -1)
+
+    def report(self, endpoint, status):
+        self._endpoint(endpoint).report(status)
+
+
+_quota = None
+_quota_lock = threading.Lock()
+
+
+def get_google_maps_quota():
+    """Return the process-wide GoogleMapsQuota configured from settings.GOOGLE_MAPS_QUOTA."""
+    global _quota
+    if _quota is None:
+        with _quota_lock:
+            if _quota is None:
+                options = {**DEFAULT_QUOTA_SETTINGS, **getattr(settings, 'GOOGLE_MAPS_QUOTA', {})}
+                options['LIMITS'] = {**DEFAULT_QUOTA_SETTINGS['LIMITS'], **options['LIMITS']}
+                _quota = GoogleMapsQuota(options)
+    return _quota
@@ -0,0 +1,69 @@
+"""
+Database routing for read replicas.
+
+Catalog reads (the location and venue models) go to a random replica from
+settings.DATABASE_REPLICAS; writes, migrations and everything else stay on
+the primary. Reads fall back to the primary inside a transaction on it or
+within use_primary(), for code that must see its own writes or must not
+bake replica lag into long-lived derived state.
+"""
+import contextvars
+import random
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, router
+
+from .models import Architecture
+
+
+REPLICATED_MODELS = {
+    'locations.Architecture',
+    'locations.Films',
+    'locations.History',
+    'locations.Music',
+    'locations.Venue',
+}
+
+_use_primary = contextvars.ContextVar('database_use_primary', default=False)
+
+
+def replica_aliases():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+@contextmanager
+def use_primary():
+    """Send the enclosed catalog reads to the primary database."""
+    token = _use_primary.set(True)
+    try:
+        yield
+    finally:
+        _use_primary.reset(token)
+
+
+def catalog_connection():
+    """Connection raw catalog SQL should run on, following the router."""
+    return connections[router.db_for_read(Architecture)]
+
+
+class ReadReplicaRouter:
+    """Route catalog reads to replicas and keep writes on the primary."""
+
+    def db_for_read(self, model, **hints):
+        replicas = replica_aliases()
+        if not replicas or model._meta.label not in REPLICATED_MODELS:
+            return DEFAULT_DB_ALIAS
+        if _use_primary.get() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *replica_aliases()}
+        return obj1._state.db in databases and obj2._state.db in databases
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,258 @@
+"""
+Visiting-order solver for multi-stop routes.
+
+Routes start at node 0 (the user's position), visit every other node once
+and do not return. Costs come from a full (possibly asymmetric) travel-time
+matrix, so transit legs can differ by direction.
+"""
+import random
+import time
+
+# Sets up to this many stops are solved exactly with Held-Karp (O(2^n * n^2))
+EXACT_STOP_LIMIT = 8
+# The orienteering search stops after this many perturbations without improvement
+ORIENTEERING_STALE_ROUNDS = 200
+# Most stops a perturbation removes from the best tour
+ORIENTEERING_MAX_REMOVED = 3
+
+
+def route_cost(matrix, order):
+    """Total cost of visiting `order` starting from node 0."""
+    cost = 0
+    previous = 0
+    for node in order:
+        cost += matrix[previous][node]
+        previous = node
+    return cost
+
+
+def solve_exact(matrix):
+    """
+    Find the optimal open path from node 0 through every other node (Held-Karp).
+
+    Returns:
+        list: Visiting order of nodes 1..n-1
+    """
+    n = len(matrix) - 1
+    if n <= 0:
+        return []
+    full = (1 << n) - 1
+    # best[mask][last] = cheapest cost of visiting `mask` and ending at stop `last`
+    best = [[float('inf')] * n for _ in range(full + 1)]
+    parent = [[-1] * n for _ in range(full + 1)]
+    for stop in range(n):
+        best[1 << stop][stop] = matrix[0][stop + 1]
+
+    for mask in range(1, full + 1):
+        row = best[mask]
+        for last in range(n):
+            cost = row[last]
+            if cost == float('inf') or not mask & (1 << last):
+                continue
+            from_row = matrix[last + 1]
+            for nxt in range(n):
+                bit = 1 << nxt
+                if mask & bit:
+                    continue
+                candidate = cost + from_row[nxt + 1]
+                if candidate < best[mask | bit][nxt]:
+                    best[mask | bit][nxt] = candidate
+                    parent[mask | bit][nxt] = last
+
+    last = min(range(n), key=lambda stop: best[full][stop])
+    order = []
+    mask = full
+    while last != -1:
+        order.append(last + 1)
+        previous = parent[mask][last]
+        mask &= ~(1 << last)
+        last = previous
+    order.reverse()
+    return order
+
+
+def nearest_neighbour(matrix):
+    """Greedy visiting order: always go to the closest unvisited stop."""
+    unvisited = set(range(1, len(matrix)))
+    order = []
+    current = 0
+    while unvisited:
+        current = min(unvisited, key=lambda node: matrix[current][node])
+        unvisited.remove(current)
+        order.append(current)
+    return order
+
+
+def _expired(deadline):
+    return deadline is not None and time.monotonic() >= deadline
+
+
+def two_opt(matrix, order, deadline=None):
+    """Improve an order by reversing segments while that shortens the route (or until deadline)."""
+    best_cost = route_cost(matrix, order)
+    improved = True
+    while improved:
+        improved = False
+        for i in range(len(order) - 1):
+            if _expired(deadline):
+                return order
+            for j in range(i + 1, len(order)):
+                candidate = order[:i] + order[i:j + 1][::-1] + order[j + 1:]
+                cost = route_cost(matrix, candidate)
+                if cost < best_cost:
+                    order, best_cost, improved = candidate, cost, True
+    return order
+
+
+def or_opt(matrix, order, max_segment=3):
+    """Improve an order by moving runs of up to max_segment stops elsewhere in the route."""
+    best_cost = route_cost(matrix, order)
+    improved = True
+    while improved:
+        improved = False
+        for length in range(1, max_segment + 1):
+            for start in range(len(order) - length + 1):
+                segment = order[start:start + length]
+                rest = order[:start] + order[start + length:]
+                for position in range(len(rest) + 1):
+                    if position == start:
+                        continue
+                    candidate = rest[:position] + segment + rest[position:]
+                    cost = route_cost(matrix, candidate)
+                    if cost < best_cost:
+                        order, best_cost, improved = candidate, cost, True
+                        break
+    return order
+
+
+def solve_route(matrix):
+    """
+    Choose a visiting order for the stops in a travel-time matrix.
+
+    Small sets are solved exactly; larger ones start from nearest neighbour
+    and are improved with 2-opt and Or-opt until neither helps.
+
+    Args:
+        matrix (list): (n+1) x (n+1) costs where node 0 is the starting point
+
+    Returns:
+        tuple: (order of nodes 1..n, whether the order is provably optimal)
+    """
+    if len(matrix) - 1 <= EXACT_STOP_LIMIT:
+        return solve_exact(matrix), True
+    order = nearest_neighbour(matrix)
+    while True:
+        cost = route_cost(matrix, order)
+        order = or_opt(matrix, two_opt(matrix, order))
+        if route_cost(matrix, order) >= cost:
+            return order, False
+
+
+def _cheapest_insertion(matrix, order, node):
+    """Return (added travel time, position) of the cheapest place to insert node into order."""
+    best_added = float('inf')
+    best_position = 0
+    previous = 0
+    for position in range(len(order) + 1):
+        added = matrix[previous][node]
+        if position < len(order):
+            following = order[position]
+            added += matrix[node][following] - matrix[previous][following]
+            previous = following
+        if added < best_added:
+            best_added, best_position = added, position
+    return best_added, best_position
+
+
+def _fill_tour(matrix, values, service, budget, order, candidates, deadline=None):
+    """
+    Greedily insert candidates while the tour stays within budget (or until deadline).
+
+    Each step inserts the node with the best value per added minute (travel
+    plus time spent at the stop) at its cheapest position.
+
+    Returns:
+        tuple: (order, total minutes)
+    """
+    order = list(order)
+    cost = route_cost(matrix, order) + sum(service[node] for node in order)
+    remaining = [node for node in candidates if node not in order]
+    while remaining and not _expired(deadline):
+        best = None
+        for node in remaining:
+            added, position = _cheapest_insertion(matrix, order, node)
+            added += service[node]
+            if cost + added > budget:
+                continue
+            ratio = values[node] / max(added, 1e-6)
+            if best is None or ratio > best[0]:
+                best = (ratio, node, position, added)
+        if best is None:
+            break
+        _, node, position, added = best
+        order.insert(position, node)
+        cost += added
+        remaining.remove(node)
+    return order, cost
+
+
+def solve_orienteering(matrix, values, service, budget, deadline=None, seed=0):
+    """
+    Choose the most valuable set of nodes that can be visited within a time budget, and their order.
+
+    A greedy value-per-minute insertion builds a first tour, 2-opt shortens
+    it to make room for more stops, and then the best tour is repeatedly
+    perturbed (a few stops dropped, the route re-optimised and refilled)
+    until ORIENTEERING_STALE_ROUNDS perturbations in a row bring nothing
+    or the deadline passes. Every step checks the deadline, except the
+    first greedy fill, so there is always a tour to return and the result
+    degrades gracefully under a tight deadline.
+
+    Args:
+        matrix (list): (n+1) x (n+1) travel minutes where node 0 is the starting point
+        values (list): Value of visiting each node (values[0] is ignored)
+        service (list): Minutes spent at each node (service[0] is ignored)
+        budget (float): Most minutes the tour may take, travel and stops included
+        deadline (float, optional): time.monotonic() value to stop searching at
+        seed (int): Seed for the perturbations, so results are reproducible
+
+    Returns:
+        tuple: (order of visited nodes, total value, total minutes, whether the
+               search converged before the deadline)
+    """
+    candidates = [
+        node for node in range(1, len(matrix))
+        if values[node] > 0 and matrix[0][node] + service[node] <= budget
+    ]
+
+    def improve(order):
+        order, _ = _fill_tour(matrix, values, service, budget, order, candidates, deadline)
+        order = two_opt(matrix, order, deadline)
+        return _fill_tour(matrix, values, service, budget, order, candidates, deadline)
+
+    def score(order, cost):
+        return sum(values[node] for node in order), -cost
+
+    best_order, _ = _fill_tour(matrix, values, service, budget, [], candidates)
+    best_order, best_cost = improve(best_order)
+    best_score = score(best_order, best_cost)
+    rng = random.Random(seed)
+    stale = 0
+    converged = not _expired(deadline)
+    while converged and best_order and stale < ORIENTEERING_STALE_ROUNDS:
+        if _expired(deadline):
+            converged = False
+            break
+        removed = set(rng.sample(best_order, rng.randint(1, min(ORIENTEERING_MAX_REMOVED, len(best_order)))))
+        kept = [node for node in best_order if node not in removed]
+        # Refill without the removed stops first so the search moves somewhere new
+        order, _ = _fill_tour(matrix, values, service, budget, kept,
+                              [node for node in candidates if node not in removed], deadline)
+        order, cost = improve(order)
+        candidate_score = score(order, cost)
+        if candidate_score > best_score:
+            best_order, best_cost, best_score = order, cost, candidate_score
+            stale = 0
+        else:
+            stale += 1
+    return best_order, best_score[0], best_cost, converged
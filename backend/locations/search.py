@@ -0,0 +1,252 @@
+"""
+Full-text and typeahead search over location names and facts.
+
+PostgreSQL uses the GIN-indexed 'search' tsvector column of each location
+table and SQLite the locations_search FTS5 table (both created by migration
+0007). Other databases, or SQLite without FTS5, fall back to LIKE queries.
+The last word of a query matches as a prefix, so results follow the user
+while they type.
+
+The FTS5 table is kept in sync by triggers on the location tables, and
+SQLite drops those when a migration rebuilds a table. The
+locations.W001 check reports missing triggers; the rebuild_search_index
+command recreates them and reindexes every location.
+"""
+import heapq
+import logging
+import math
+import re
+
+from django.db import transaction
+from django.db.models import Q
+
+from .catalog import CATEGORY_MODELS
+from .geo import haversine_km
+from .metrics import CATALOG_LATENCY, timed
+from .routers import catalog_connection
+
+
+SEARCH_DEFAULT_LIMIT = 10
+# Radius of a "near me" search when none is given
+SEARCH_NEAR_RADIUS_KM = 2.0
+# Longer queries are cut to this many words
+MAX_SEARCH_TERMS = 8
+SQLITE_SEARCH_TABLE = 'locations_search'
+# rowid = id * len(SEARCH_TYPE_CODES) + code in the FTS5 table
+SEARCH_TYPE_CODES = {'Architecture': 0, 'Films': 1, 'History': 2, 'Music': 3}
+# FTS5 bm25 column weights: a match in the name counts ten times one in the fact
+SQLITE_BM25_WEIGHTS = (10.0, 1.0)
+KM_PER_DEGREE = 111.32
+
+_fts_tables = {}
+
+
+def logger():
+    return logging.getLogger(__name__)
+
+
+def search_terms(query):
+    """Split a query into lowercase words, at most MAX_SEARCH_TERMS of them."""
+    return re.findall(r'\w+', query.lower())[:MAX_SEARCH_TERMS]
+
+
+def _tsquery(terms):
+    return ' & '.join(terms[:-1] + [f"{terms[-1]}:*"])
+
+
+def _fts5_query(terms):
+    return ' '.join([f'"{term}"' for term in terms[:-1]] + [f'"{terms[-1]}"*'])
+
+
+def _sqlite_fts_enabled(connection):
+    alias = connection.alias
+    if alias not in _fts_tables:
+        _fts_tables[alias] = SQLITE_SEARCH_TABLE in connection.introspection.table_names()
+    return _fts_tables[alias]
+
+
+def _sqlite_triggers():
+    """Map trigger name -> CREATE TRIGGER statement for the triggers syncing the FTS5 table."""
+    triggers = {}
+    count = len(SEARCH_TYPE_CODES)
+    for name, code in SEARCH_TYPE_CODES.items():
+        table = CATEGORY_MODELS[name]._meta.db_table
+        row = f"NEW.id * {count} + {code}, NEW.name, NEW.fact"
+        triggers[f"{table}_search_insert"] = (
+            f"CREATE TRIGGER {table}_search_insert AFTER INSERT ON {table} BEGIN "
+            f"INSERT INTO {SQLITE_SEARCH_TABLE}(rowid, name, fact) VALUES ({row}); END"
+        )
+        triggers[f"{table}_search_update"] = (
+            f"CREATE TRIGGER {table}_search_update AFTER UPDATE OF id, name, fact ON {table} BEGIN "
+            f"DELETE FROM {SQLITE_SEARCH_TABLE} WHERE rowid = OLD.id * {count} + {code}; "
+            f"INSERT INTO {SQLITE_SEARCH_TABLE}(rowid, name, fact) VALUES ({row}); END"
+        )
+        triggers[f"{table}_search_delete"] = (
+            f"CREATE TRIGGER {table}_search_delete AFTER DELETE ON {table} BEGIN "
+            f"DELETE FROM {SQLITE_SEARCH_TABLE} WHERE rowid = OLD.id * {count} + {code}; END"
+        )
+    return triggers
+
+
+def missing_sqlite_search_triggers(connection):
+    """Names of the FTS5 sync triggers missing on a SQLite connection ([] without an FTS5 table)."""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT type, name FROM sqlite_master WHERE type IN ('table', 'trigger')")
+        existing = {(kind, name) for kind, name in cursor.fetchall()}
+    if ('table', SQLITE_SEARCH_TABLE) not in existing:
+        return []
+    return [name for name in _sqlite_triggers() if ('trigger', name) not in existing]
+
+
+def rebuild_sqlite_search_index(connection):
+    """
+    Recreate the FTS5 table's sync triggers and reindex every location.
+
+    Returns:
+        int: Number of locations indexed
+    """
+    count = len(SEARCH_TYPE_CODES)
+    indexed = 0
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_SEARCH_TABLE} USING fts5("
+            f"name, fact, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+        for name, statement in _sqlite_triggers().items():
+            cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+            cursor.execute(statement)
+        cursor.execute(f"DELETE FROM {SQLITE_SEARCH_TABLE}")
+        for name, code in SEARCH_TYPE_CODES.items():
+            table = CATEGORY_MODELS[name]._meta.db_table
+            cursor.execute(
+                f"INSERT INTO {SQLITE_SEARCH_TABLE}(rowid, name, fact) "
+                f"SELECT id * {count} + {code}, name, fact FROM {table}"
+            )
+            indexed += cursor.rowcount
+    _fts_tables[connection.alias] = True
+    return indexed
+
+
+def _bounding_box(latitude, longitude, radius_km):
+    lat_delta = radius_km / KM_PER_DEGREE
+    lon_delta = radius_km / (KM_PER_DEGREE * max(0.01, math.cos(math.radians(latitude))))
+    return latitude - lat_delta, latitude + lat_delta, longitude - lon_delta, longitude + lon_delta
+
+
+def _types(location_type):
+    if location_type is not None:
+        return [(location_type, CATEGORY_MODELS[location_type])]
+    return list(CATEGORY_MODELS.items())
+
+
+def _run(connection, sql, params, include_fact):
+    columns = ['location_type', 'id', 'name', 'latitude', 'longitude']
+    columns += (['fact'] if include_fact else []) + ['score']
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def _indexed_search(connection, terms, location_type, include_fact, box, limit):
+    """Run the per-table index queries as one UNION ALL, best score first."""
+    postgres = connection.vendor == 'postgresql'
+    subqueries = []
+    params = []
+    for name, model in _types(location_type):
+        table = model._meta.db_table
+        fact = ', t.fact' if include_fact else ''
+        where = ''
+        where_params = []
+        if box is not None:
+            where = "AND t.latitude BETWEEN %s AND %s AND t.longitude BETWEEN %s AND %s"
+            where_params = list(box)
+        if postgres:
+            subqueries.append(
+                f"(SELECT %s, t.id, t.name, t.latitude, t.longitude{fact}, ts_rank(t.search, q.query) AS score "
+                f"FROM {table} t, to_tsquery('simple', %s) AS q(query) WHERE t.search @@ q.query {where})"
+            )
+            params += [name, _tsquery(terms)] + where_params
+        else:
+            weights = ', '.join(str(weight) for weight in SQLITE_BM25_WEIGHTS)
+            subqueries.append(
+                f"SELECT %s, t.id, t.name, t.latitude, t.longitude{fact}, "
+                f"-bm25({SQLITE_SEARCH_TABLE}, {weights}) AS score "
+                f"FROM {SQLITE_SEARCH_TABLE} JOIN {table} t ON t.id = {SQLITE_SEARCH_TABLE}.rowid / %s "
+                f"WHERE {SQLITE_SEARCH_TABLE} MATCH %s AND {SQLITE_SEARCH_TABLE}.rowid %% %s = %s {where}"
+            )
+            params += [name, len(SEARCH_TYPE_CODES), _fts5_query(terms),
+                       len(SEARCH_TYPE_CODES), SEARCH_TYPE_CODES[name]] + where_params
+    sql = f"SELECT * FROM ({' UNION ALL '.join(subqueries)}) AS matches ORDER BY score DESC, name"
+    if limit is not None:
+        sql += " LIMIT %s"
+        params.append(limit)
+    return _run(connection, sql, params, include_fact)
+
+
+def _fallback_search(connection, terms, location_type, include_fact, box, limit):
+    """LIKE-based search for databases without a full-text index; name matches outrank fact matches."""
+    fields = ['id', 'name', 'latitude', 'longitude'] + (['fact'] if include_fact else [])
+    results = []
+    for name, model in _types(location_type):
+        queryset = model.objects.all()
+        for term in terms:
+            queryset = queryset.filter(Q(name__icontains=term) | Q(fact__icontains=term))
+        if box is not None:
+            queryset = queryset.filter(latitude__range=box[:2], longitude__range=box[2:])
+        for row in queryset.values(*fields):
+            words = search_terms(row['name'])
+            in_name = sum(any(word.startswith(term) for word in words) for term in terms)
+            results.append({'location_type': name, **row, 'score': 1.0 + in_name})
+    results.sort(key=lambda row: (-row['score'], row['name']))
+    return results if limit is None else results[:limit]
+
+
+def search_locations(query, location_type=None, limit=SEARCH_DEFAULT_LIMIT, include_fact=False,
+                     latitude=None, longitude=None, radius_km=None):
+    """
+    Search location names and facts.
+
+    Every word must match (the last one as a prefix). Without a position
+    results are ranked by text relevance; with one they are limited to
+    radius_km around it and ordered by distance.
+
+    Args:
+        query (str): What the user typed
+        location_type (str, optional): Restrict to one location type
+        limit (int): Most results to return
+        include_fact (bool): Also return the fact text
+        latitude (float, optional): User's latitude for a "near me" search
+        longitude (float, optional): User's longitude for a "near me" search
+        radius_km (float, optional): Radius of the "near me" search (default 2 km)
+
+    Returns:
+        list: Dicts with 'location_type', 'id', 'name', 'latitude', 'longitude',
+              'score' (higher is better), plus 'fact' and 'distance_km' when requested
+    """
+    terms = search_terms(query)
+    if not terms:
+        return []
+    near = latitude is not None and longitude is not None
+    if near:
+        radius_km = SEARCH_NEAR_RADIUS_KM if radius_km is None else radius_km
+    box = _bounding_box(latitude, longitude, radius_km) if near else None
+
+    connection = catalog_connection()
+    if connection.vendor == 'postgresql' or (connection.vendor == 'sqlite' and _sqlite_fts_enabled(connection)):
+        search = _indexed_search
+    else:
+        search = _fallback_search
+    try:
+        with timed(CATALOG_LATENCY, 'search'):
+            # Distance ordering needs every match in the box, not just the best-scoring ones
+            results = search(connection, terms, location_type, include_fact, box, None if near else limit)
+    except Exception as e:
+        logger().error(f"Error searching locations for {query!r}: {str(e)}")
+        return []
+
+    if not near:
+        return results
+    for row in results:
+        row['distance_km'] = round(haversine_km(latitude, longitude, row['latitude'], row['longitude']), 3)
+    within = (row for row in results if row['distance_km'] <= radius_km)
+    return heapq.nsmallest(limit, within, key=lambda row: (row['distance_km'], -row['score']))
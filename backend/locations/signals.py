@@ -0,0 +1,49 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .catalog import bump_catalog_version
+from .models import Architecture, Films, History, Music
+from .spatial import get_loaded_spatial_index
+
+
+LOCATION_MODELS = (Architecture, Films, History, Music)
+
+
+def catalog_changed():
+    """
+    Invalidate derived catalog state after writes that bypass model signals.
+
+    bulk_create/bulk_update/queryset deletes do not send post_save or
+    post_delete, so bulk writers call this instead. Bumping the catalog
+    version makes every process rebuild its spatial index on next use.
+    """
+    bump_catalog_version()
+
+
+def _apply_to_index(update):
+    """Bump the catalog version and apply the change to this process's index in place."""
+    version = bump_catalog_version()
+    index = get_loaded_spatial_index()
+    if index is not None:
+        update(index)
+        index.advance(version)
+
+
+@receiver(post_save)
+def location_saved(sender, instance, **kwargs):
+    """Keep the in-process spatial index in step with saved locations."""
+    if sender not in LOCATION_MODELS:
+        return
+    transaction.on_commit(lambda: _apply_to_index(lambda index: index.upsert(
+        sender.__name__, instance.id, instance.name, instance.latitude, instance.longitude, instance.venue_id
+    )))
+
+
+@receiver(post_delete)
+def location_deleted(sender, instance, **kwargs):
+    """Drop deleted locations from the in-process spatial index."""
+    if sender not in LOCATION_MODELS:
+        return
+    location_id = instance.id
+    transaction.on_commit(lambda: _apply_to_index(lambda index: index.remove(sender.__name__, location_id)))
@@ -0,0 +1,120 @@
+"""
+Precomputed, versioned snapshot of the whole location catalog.
+
+The snapshot is serialized and compressed once per catalog version (the
+version is bumped by the post_save/post_delete handlers in
+locations.signals) and shared between workers through Django's cache (see
+CACHES in settings), so serving it costs a cache lookup and clients
+revalidate it with a 304.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import threading
+from collections import namedtuple
+
+from django.core.cache import cache
+
+from .catalog import get_catalog_version, iter_catalog
+from .metrics import CATALOG_LATENCY, timed
+from .routers import use_primary
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# Shared snapshots outlive any reasonable gap between catalog writes (seconds)
+SNAPSHOT_CACHE_TIMEOUT = 24 * 60 * 60
+
+CatalogSnapshot = namedtuple('CatalogSnapshot', ['version', 'etag', 'bodies'])
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+
+def logger():
+    return logging.getLogger(__name__)
+
+
+def _cache_key(version):
+    return f"locations:catalog-snapshot:{version}"
+
+
+def build_catalog_snapshot(version):
+    """
+    Serialize every location and precompress the result.
+
+    Returns:
+        CatalogSnapshot: version, unquoted entity tag of the JSON, and the body
+                         for each content coding ('identity', 'gzip' and, when
+                         the brotli package is installed, 'br')
+    """
+    # Read the primary: the snapshot is kept for the whole version, so replica lag must not leak into it
+    with timed(CATALOG_LATENCY, 'snapshot'), use_primary():
+        body = json.dumps(
+            {'version': version, 'locations': list(iter_catalog(include_fact=True))},
+            separators=(',', ':'),
+        ).encode('utf-8')
+        bodies = {'identity': body, 'gzip': gzip.compress(body, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            bodies['br'] = brotli.compress(body, quality=11)
+    etag = f"{version}-{hashlib.sha256(body).hexdigest()[:20]}"
+    logger().info(f"Built catalog snapshot v{version}: {len(body)} bytes, {len(bodies['gzip'])} gzipped")
+    return CatalogSnapshot(version, etag, bodies)
+
+
+def get_catalog_snapshot():
+    """
+    Return the snapshot for the current catalog version.
+
+    Each process keeps the latest snapshot in memory; a missing one is
+    taken from the shared cache or, failing that, built and published there.
+    """
+    global _snapshot
+    version = get_catalog_version()
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.version == version:
+        return snapshot
+    with _snapshot_lock:
+        if _snapshot is not None and _snapshot.version == version:
+            return _snapshot
+        snapshot = cache.get(_cache_key(version))
+        if snapshot is None:
+            snapshot = build_catalog_snapshot(version)
+            cache.set(_cache_key(version), snapshot, SNAPSHOT_CACHE_TIMEOUT)
+        # A version bumped during the build leaves this snapshot stale, so the next call rebuilds
+        _snapshot = snapshot
+        return snapshot
+
+
+def choose_encoding(accept_encoding, available):
+    """
+    Pick the best content coding from an Accept-Encoding header.
+
+    Args:
+        accept_encoding (str): The request's Accept-Encoding header
+        available (iterable): Codings a body exists for
+
+    Returns:
+        str: 'br', 'gzip' or 'identity'
+    """
+    accepted = {}
+    for part in (accept_encoding or '').split(','):
+        coding, _, params = part.strip().lower().partition(';')
+        if not coding:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding] = quality
+    for coding in ('br', 'gzip'):
+        if coding in available and accepted.get(coding, accepted.get('*', 0)) > 0:
+            return coding
+    return 'identity'
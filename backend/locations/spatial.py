@@ -0,0 +1,333 @@
+import heapq
+import logging
+import math
+import threading
+from array import array
+from collections import namedtuple
+
+from .catalog import CATEGORY_MODELS, get_catalog_version, iter_catalog
+from .geo import EARTH_RADIUS_KM, CoordinateArrays
+from .models import Venue
+from .routers import use_primary
+
+
+CATEGORIES = list(CATEGORY_MODELS)
+
+# Grid cell edge in degrees (~550 m north-south in Chicago)
+DEFAULT_CELL_SIZE = 0.005
+
+# venue_id is the shared Venue the location belongs to (see locations.venues), None if unlinked
+IndexedLocation = namedtuple(
+    'IndexedLocation', ['location_type', 'id', 'name', 'latitude', 'longitude', 'distance_km', 'venue_id'],
+    defaults=(None,),
+)
+
+
+def logger():
+    return logging.getLogger(__name__)
+
+
+class SpatialIndex:
+    """
+    Uniform-grid index over every location model.
+
+    Coordinates live in parallel arrays (one slot per location) and each grid
+    cell holds the slots that fall inside it, so nearest, radius and
+    bounding-box lookups only look at a handful of cells. Slots freed by
+    deletes are reused by later inserts.
+    """
+
+    def __init__(self, cell_size=DEFAULT_CELL_SIZE, version=None):
+        self.cell_size = cell_size
+        self.version = version         # catalog version the index reflects
+        self.coordinates = CoordinateArrays()
+        self.ids = array('q')
+        self.categories = array('b')   # index into CATEGORIES, -1 for a free slot
+        self.names = []
+        self.venues = array('q')       # venue id, 0 for an unlinked location
+        self.venue_points = {}         # venue id -> (latitude, longitude)
+        self._cells = {}
+        self._bounds = None            # (min_x, max_x, min_y, max_y) of occupied cells, None to recompute
+        self._slots = {}               # (location_type, id) -> slot
+        self._free = []
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._slots)
+
+    @classmethod
+    def build(cls, cell_size=DEFAULT_CELL_SIZE):
+        """Build an index from every row of the location models."""
+        # Read the version first so a write during the build leaves the index stale
+        index = cls(cell_size, version=get_catalog_version())
+        # Built once per version from the primary, so replica lag cannot hide the write that bumped it
+        with use_primary():
+            index.venue_points = {
+                venue_id: (latitude, longitude)
+                for venue_id, latitude, longitude in Venue.objects.values_list('id', 'latitude', 'longitude')
+            }
+            for row in iter_catalog():
+                index.upsert(row['location_type'], row['id'], row['name'], row['latitude'], row['longitude'],
+                             row['venue_id'])
+        logger().info(f"Built spatial index with {len(index)} locations")
+        return index
+
+    def upsert(self, location_type, location_id, name, latitude, longitude, venue_id=None):
+        """Insert a location, or move/rename/relink it if it is already indexed."""
+        key = (location_type, location_id)
+        cell = self._cell(latitude, longitude)
+        with self._lock:
+            slot = self._slots.get(key)
+            if slot is not None:
+                old_cell = self._cell(self.coordinates.latitudes[slot], self.coordinates.longitudes[slot])
+                if old_cell != cell:
+                    self._remove_from_cell(old_cell, slot)
+                    self._add_to_cell(cell, slot)
+                self.coordinates.latitudes[slot] = latitude
+                self.coordinates.longitudes[slot] = longitude
+                self.names[slot] = name
+                self.venues[slot] = venue_id or 0
+                return
+
+            if self._free:
+                slot = self._free.pop()
+                self.coordinates.latitudes[slot] = latitude
+                self.coordinates.longitudes[slot] = longitude
+                self.ids[slot] = location_id
+                self.categories[slot] = CATEGORIES.index(location_type)
+                self.names[slot] = name
+                self.venues[slot] = venue_id or 0
+            else:
+                slot = len(self.ids)
+                self.coordinates.latitudes.append(latitude)
+                self.coordinates.longitudes.append(longitude)
+                self.ids.append(location_id)
+                self.categories.append(CATEGORIES.index(location_type))
+                self.names.append(name)
+                self.venues.append(venue_id or 0)
+            self._slots[key] = slot
+            self._add_to_cell(cell, slot)
+
+    def remove(self, location_type, location_id):
+        """Drop a location from the index (no-op if it is not indexed)."""
+        with self._lock:
+            slot = self._slots.pop((location_type, location_id), None)
+            if slot is None:
+                return
+            self._remove_from_cell(
+                self._cell(self.coordinates.latitudes[slot], self.coordinates.longitudes[slot]), slot
+            )
+            self.categories[slot] = -1
+            self.names[slot] = None
+            self.venues[slot] = 0
+            self._free.append(slot)
+
+    def advance(self, version):
+        """
+        Record that a change for catalog `version` has been applied in place.
+
+        If another process bumped the version in between, the index is left
+        behind and will be rebuilt on the next get_spatial_index() call.
+        """
+        with self._lock:
+            if self.version is not None and self.version == version - 1:
+                self.version = version
+
+    def get(self, location_type, location_id):
+        """Return the IndexedLocation for a location, or None if it is not indexed."""
+        with self._lock:
+            slot = self._slots.get((location_type, location_id))
+            return None if slot is None else self._entry(slot, None)
+
+    def routing_point(self, location):
+        """
+        Point routes to an IndexedLocation are computed for.
+
+        Entries linked to a venue share the venue's point, so their Distance
+        Matrix cache keys (and travel matrix slots) are shared too.
+        """
+        point = self.venue_points.get(location.venue_id) if location.venue_id else None
+        return point or (location.latitude, location.longitude)
+
+    def nearest(self, latitude, longitude, k=10, location_types=None, max_distance_km=None):
+        """
+        Return the k nearest locations, nearest first.
+
+        Searches outwards ring by ring and stops once no unvisited cell can
+        hold anything closer than the current k-th result.
+        """
+        allowed = self._allowed(location_types)
+        cell_km = self._cell_km(latitude)
+        cx, cy = self._cell(latitude, longitude)
+        heap = []  # max-heap of (-distance, slot) holding the best k so far
+
+        with self._lock:
+            if not self._cells:
+                return []
+            max_ring = self._max_ring(cx, cy)
+            for ring in range(max_ring + 1):
+                for cell in self._ring(cx, cy, ring):
+                    for slot in self._cells.get(cell, ()):
+                        if self.categories[slot] not in allowed:
+                            continue
+                        distance = self._distance(slot, latitude, longitude)
+                        if max_distance_km is not None and distance > max_distance_km:
+                            continue
+                        if len(heap) < k:
+                            heapq.heappush(heap, (-distance, slot))
+                        elif distance < -heap[0][0]:
+                            heapq.heapreplace(heap, (-distance, slot))
+                # Anything in ring + 1 or beyond is at least ring * cell_km away
+                reach = ring * cell_km
+                if len(heap) == k and -heap[0][0] <= reach:
+                    break
+                if max_distance_km is not None and reach > max_distance_km:
+                    break
+            return [self._entry(slot, -neg) for neg, slot in sorted(heap, reverse=True)]
+
+    def within_radius(self, latitude, longitude, radius_km, location_types=None):
+        """Return every location within radius_km, nearest first."""
+        lat_delta = math.degrees(radius_km / EARTH_RADIUS_KM)
+        lon_delta = lat_delta / max(math.cos(math.radians(latitude)), 1e-6)
+        allowed = self._allowed(location_types)
+        results = []
+        with self._lock:
+            for slot in self._slots_in_bbox(latitude - lat_delta, longitude - lon_delta,
+                                            latitude + lat_delta, longitude + lon_delta):
+                if self.categories[slot] not in allowed:
+                    continue
+                distance = self._distance(slot, latitude, longitude)
+                if distance <= radius_km:
+                    results.append(self._entry(slot, distance))
+        results.sort(key=lambda entry: entry.distance_km)
+        return results
+
+    def within_bbox(self, south, west, north, east, location_types=None):
+        """Return every location inside a bounding box (distance_km is None)."""
+        allowed = self._allowed(location_types)
+        lats = self.coordinates.latitudes
+        lons = self.coordinates.longitudes
+        with self._lock:
+            return [
+                self._entry(slot, None)
+                for slot in self._slots_in_bbox(south, west, north, east)
+                if self.categories[slot] in allowed
+                and south <= lats[slot] <= north and west <= lons[slot] <= east
+            ]
+
+    def rank(self, latitude, longitude, location_types=None):
+        """Return every indexed location ordered by distance (one pass over the arrays)."""
+        allowed = self._allowed(location_types)
+        with self._lock:
+            distances = self.coordinates.distances_km(latitude, longitude)
+            slots = [slot for slot in self._slots.values() if self.categories[slot] in allowed]
+            slots.sort(key=distances.__getitem__)
+            return [self._entry(slot, distances[slot]) for slot in slots]
+
+    def _cell(self, latitude, longitude):
+        return (math.floor(longitude / self.cell_size), math.floor(latitude / self.cell_size))
+
+    def _cell_km(self, latitude):
+        # The narrower (east-west) edge bounds how far a ring reaches
+        return math.radians(self.cell_size) * EARTH_RADIUS_KM * math.cos(math.radians(latitude))
+
+    def _add_to_cell(self, cell, slot):
+        self._cells.setdefault(cell, []).append(slot)
+        if self._bounds is not None:
+            x, y = cell
+            min_x, max_x, min_y, max_y = self._bounds
+            self._bounds = (min(min_x, x), max(max_x, x), min(min_y, y), max(max_y, y))
+        elif len(self._cells) == 1:
+            self._bounds = (cell[0], cell[0], cell[1], cell[1])
+
+    def _remove_from_cell(self, cell, slot):
+        self._cells[cell].remove(slot)
+        if self._cells[cell]:
+            return
+        del self._cells[cell]
+        # Only emptying a cell on the edge of the occupied area can shrink the bounds
+        if self._bounds is not None:
+            x, y = cell
+            min_x, max_x, min_y, max_y = self._bounds
+            if x in (min_x, max_x) or y in (min_y, max_y):
+                self._bounds = None
+
+    def _max_ring(self, cx, cy):
+        if self._bounds is None:
+            xs = [x for x, _ in self._cells]
+            ys = [y for _, y in self._cells]
+            self._bounds = (min(xs), max(xs), min(ys), max(ys))
+        min_x, max_x, min_y, max_y = self._bounds
+        return max(abs(cx - min_x), abs(cx - max_x), abs(cy - min_y), abs(cy - max_y))
+
+    @staticmethod
+    def _ring(cx, cy, ring):
+        if ring == 0:
+            yield (cx, cy)
+            return
+        for x in range(cx - ring, cx + ring + 1):
+            yield (x, cy - ring)
+            yield (x, cy + ring)
+        for y in range(cy - ring + 1, cy + ring):
+            yield (cx - ring, y)
+            yield (cx + ring, y)
+
+    def _slots_in_bbox(self, south, west, north, east):
+        min_x, min_y = self._cell(south, west)
+        max_x, max_y = self._cell(north, east)
+        if (max_x - min_x + 1) * (max_y - min_y + 1) > len(self._cells):
+            # Box covers more cells than exist; walk the occupied cells instead
+            for (x, y), slots in self._cells.items():
+                if min_x <= x <= max_x and min_y <= y <= max_y:
+                    yield from slots
+            return
+        for x in range(min_x, max_x + 1):
+            for y in range(min_y, max_y + 1):
+                yield from self._cells.get((x, y), ())
+
+    def _distance(self, slot, latitude, longitude):
+        to_rad = math.pi / 180
+        lat = self.coordinates.latitudes[slot]
+        lon = self.coordinates.longitudes[slot]
+        x = (lon - longitude) * math.cos(latitude * to_rad)
+        y = lat - latitude
+        return EARTH_RADIUS_KM * to_rad * math.sqrt(x * x + y * y)
+
+    def _entry(self, slot, distance):
+        return IndexedLocation(
+            CATEGORIES[self.categories[slot]],
+            self.ids[slot],
+            self.names[slot],
+            self.coordinates.latitudes[slot],
+            self.coordinates.longitudes[slot],
+            distance,
+            self.venues[slot] or None,
+        )
+
+    @staticmethod
+    def _allowed(location_types):
+        if location_types is None:
+            return set(range(len(CATEGORIES)))
+        if isinstance(location_types, str):
+            location_types = [location_types]
+        return {CATEGORIES.index(location_type) for location_type in location_types}
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_spatial_index():
+    """Return the process-wide spatial index, (re)building it when the catalog version moves on."""
+    global _index
+    version = get_catalog_version()
+    if _index is None or _index.version != version:
+        with _index_lock:
+            if _index is None or _index.version != version:
+                _index = SpatialIndex.build()
+    return _index
+
+
+def get_loaded_spatial_index():
+    """Return the spatial index if it has been built in this process, else None."""
+    return _index
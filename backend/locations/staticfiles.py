@@ -0,0 +1,227 @@
+"""
+Production serving of the React build without a separate web server.
+
+collectstatic writes .gz and .br (when the brotli package is installed)
+siblings next to every compressible file, and serve_static picks the
+variant the client accepts. Files with a content hash in their name (the
+React build hashes its bundles) are cached by browsers for good;
+index.html is kept in memory and revalidated after a short max-age.
+Enabled with settings.SERVE_STATIC (see config/urls.py).
+"""
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+import re
+import threading
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import StaticFilesStorage
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_etags
+from django.views.decorators.http import require_safe
+from django.views.static import was_modified_since
+
+from .snapshot import choose_encoding
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+COMPRESSIBLE_EXTENSIONS = (
+    '.css', '.js', '.mjs', '.map', '.json', '.svg', '.html', '.txt', '.xml', '.ico', '.ttf', '.otf', '.eot', '.wasm',
+)
+# Smaller files are not worth a compressed variant
+MIN_COMPRESS_SIZE = 256
+ENCODING_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+# Names like main.3f2a9c1b.js carry a content hash and never change
+HASHED_NAME = re.compile(r'\.[0-9a-f]{8,}\.')
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+# Unhashed static files (seconds)
+STATIC_MAX_AGE = 60 * 60
+DEFAULT_INDEX_MAX_AGE = 60
+
+
+def logger():
+    return logging.getLogger(__name__)
+
+
+def available_codings():
+    """Content codings compressed variants can be written in."""
+    return ['gzip', 'br'] if brotli is not None else ['gzip']
+
+
+def compress_bytes(data, codings=None):
+    """Return {'gzip': .., 'br': ..} for the given codings (default: every available one)."""
+    compressed = {}
+    for coding in codings or available_codings():
+        if coding == 'gzip':
+            compressed[coding] = gzip.compress(data, compresslevel=9, mtime=0)
+        elif coding == 'br':
+            compressed[coding] = brotli.compress(data, quality=11)
+    return compressed
+
+
+class CompressedFilesMixin:
+    """Write precompressed variants of collected files during post-processing."""
+
+    def post_process(self, paths, dry_run=False, **options):
+        parent = getattr(super(), 'post_process', None)
+        if parent is not None:
+            yield from parent(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name in sorted(paths):
+            if not name.endswith(COMPRESSIBLE_EXTENSIONS):
+                continue
+            try:
+                for compressed_name in self._compress(name):
+                    yield name, compressed_name, True
+            except OSError as e:
+                yield name, None, e
+
+    def _compress(self, name):
+        path = Path(self.path(name))
+        stat = path.stat()
+        if stat.st_size < MIN_COMPRESS_SIZE:
+            return []
+        # Re-running collectstatic only compresses files that changed since their variants were written
+        missing = [
+            coding for coding in available_codings()
+            if not self._up_to_date(path.with_name(path.name + ENCODING_SUFFIXES[coding]), stat)
+        ]
+        if not missing:
+            return []
+        data = path.read_bytes()
+        written = []
+        for coding, body in compress_bytes(data, missing).items():
+            if len(body) >= len(data) * 0.95:
+                continue
+            path.with_name(path.name + ENCODING_SUFFIXES[coding]).write_bytes(body)
+            written.append(name + ENCODING_SUFFIXES[coding])
+        return written
+
+    @staticmethod
+    def _up_to_date(target, stat):
+        try:
+            return target.stat().st_mtime >= stat.st_mtime
+        except FileNotFoundError:
+            return False
+
+
+class CompressedStaticFilesStorage(CompressedFilesMixin, StaticFilesStorage):
+    pass
+
+
+@lru_cache(maxsize=4096)
+def _static_file(path):
+    """
+    Locate a collected file and its compressed variants.
+
+    Collected files do not change while the process runs, so lookups are
+    cached (misses included).
+
+    Returns:
+        tuple: ({coding: (path, size)}, modified time), or None if there is no such file
+    """
+    try:
+        full_path = Path(safe_join(settings.STATIC_ROOT, path))
+    except (SuspiciousFileOperation, ValueError):
+        return None
+    if not full_path.is_file():
+        return None
+    stat = full_path.stat()
+    variants = {'identity': (full_path, stat.st_size)}
+    for coding, suffix in ENCODING_SUFFIXES.items():
+        candidate = full_path.with_name(full_path.name + suffix)
+        if candidate.is_file():
+            variants[coding] = (candidate, candidate.stat().st_size)
+    return variants, stat.st_mtime
+
+
+@require_safe
+def serve_static(request, path):
+    """Serve a collected static file, precompressed when the client accepts it."""
+    found = _static_file(path)
+    if found is None:
+        raise Http404(f"{path} not found")
+    variants, modified = found
+    if not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'), modified):
+        response = HttpResponseNotModified()
+    else:
+        coding = choose_encoding(request.headers.get('Accept-Encoding'), variants)
+        file_path, size = variants[coding]
+        content_type, _ = mimetypes.guess_type(path)
+        response = FileResponse(open(file_path, 'rb'), content_type=content_type or 'application/octet-stream')
+        response['Content-Length'] = size
+        if coding != 'identity':
+            response['Content-Encoding'] = coding
+    response['Last-Modified'] = http_date(modified)
+    response['Vary'] = 'Accept-Encoding'
+    if HASHED_NAME.search(os.path.basename(path)):
+        response['Cache-Control'] = f"public, max-age={IMMUTABLE_MAX_AGE}, immutable"
+    else:
+        response['Cache-Control'] = f"public, max-age={STATIC_MAX_AGE}"
+    return response
+
+
+class IndexPage:
+    """index.html held in memory with its compressed variants; reloaded when the file changes."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.modified = None
+        self.etag = None
+        self.bodies = {}
+        self._lock = threading.Lock()
+
+    def load(self):
+        modified = self.path.stat().st_mtime_ns
+        if modified != self.modified:
+            with self._lock:
+                if modified != self.modified:
+                    body = self.path.read_bytes()
+                    self.bodies = {'identity': body, **compress_bytes(body)}
+                    self.etag = hashlib.sha256(body).hexdigest()[:20]
+                    self.modified = modified
+                    logger().info(f"Loaded {self.path} ({len(body)} bytes)")
+        return self
+
+
+_index_pages = {}
+
+
+@require_safe
+def spa_index(request):
+    """Serve the React app's index.html from memory with a short revalidation window."""
+    path = getattr(settings, 'STATIC_INDEX_FILE', Path(settings.BASE_DIR) / 'reactapp' / 'build' / 'index.html')
+    page = _index_pages.get(path)
+    if page is None:
+        page = _index_pages.setdefault(path, IndexPage(path))
+    try:
+        page.load()
+    except FileNotFoundError:
+        raise Http404("The React app has not been built")
+
+    coding = choose_encoding(request.headers.get('Accept-Encoding'), page.bodies)
+    etag = page.etag if coding == 'identity' else f"{page.etag}-{coding}"
+    current = {f'"{page.etag}"'} | {f'"{page.etag}-{name}"' for name in page.bodies}
+    requested = parse_etags(request.headers.get('If-None-Match', ''))
+    if '*' in requested or current.intersection(requested):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(page.bodies[coding], content_type='text/html; charset=utf-8')
+        if coding != 'identity':
+            response['Content-Encoding'] = coding
+    response['ETag'] = f'"{etag}"'
+    response['Vary'] = 'Accept-Encoding'
+    max_age = getattr(settings, 'STATIC_INDEX_MAX_AGE', DEFAULT_INDEX_MAX_AGE)
+    response['Cache-Control'] = f"public, max-age={max_age}, must-revalidate"
+    return response
@@ -0,0 +1,126 @@
+import functools
+import threading
+from unittest import mock
+
+import httpx
+from django.test import TestCase, override_settings
+
+from locations import async_api, cache, catalog, spatial
+from locations.api import COMMUTE_MODES
+from locations.models import Architecture, Films
+from locations.quota import DEFAULT_QUOTA_SETTINGS, GoogleMapsQuota
+
+
+class FakeGoogle:
+    """httpx transport handler answering Distance Matrix and Directions calls and recording them."""
+
+    def __init__(self, status_code=200):
+        self.status_code = status_code
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def __call__(self, request):
+        endpoint = request.url.path.split('/')[-2]
+        params = request.url.params
+        with self.lock:
+            self.calls.append((endpoint, params['mode']))
+        if self.status_code != 200:
+            return httpx.Response(self.status_code)
+        if endpoint == 'distancematrix':
+            destinations = params['destinations'].split('|')
+            return httpx.Response(200, json={
+                'status': 'OK',
+                'rows': [
+                    {'elements': [self._element(params['mode']) for _ in destinations]}
+                    for _ in params['origins'].split('|')
+                ],
+            })
+        return httpx.Response(200, json={'status': 'OK', 'routes': [{
+            'legs': [{**self._element(params['mode']), 'steps': [{}, {}]}],
+            'overview_polyline': {'points': '_p~iF~ps|U'},
+        }]})
+
+    @staticmethod
+    def _element(mode):
+        return {
+            'status': 'OK',
+            'distance': {'value': 1500, 'text': '1.5 km'},
+            'duration': {'value': 600 if mode == 'transit' else 1200, 'text': '10 mins'},
+        }
+
+    def count(self, endpoint):
+        return sum(1 for called, _ in self.calls if called == endpoint)
+
+
+@override_settings(CATALOG_VERSION_POLL_SECONDS=0, TRANSIT_BACKEND='google')
+@mock.patch.dict('os.environ', {'GOOGLE_MAPS_API_KEY': 'test-key'})
+class AsyncViewTests(TestCase):
+
+    def setUp(self):
+        catalog._version = None
+        spatial._index = None
+        cache._cache = None
+        self.google = FakeGoogle()
+        quota = GoogleMapsQuota({**DEFAULT_QUOTA_SETTINGS, 'LIMITS': {'DEFAULT': {'QPS': 1000, 'DAILY': None}}})
+        transport = httpx.MockTransport(self.google)
+        for patcher in (
+            mock.patch.object(async_api, 'get_google_maps_quota', return_value=quota),
+            mock.patch.object(async_api.httpx, 'AsyncClient',
+                              functools.partial(httpx.AsyncClient, transport=transport)),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        Architecture.objects.create(name='Rookery', latitude=41.8791, longitude=-87.6319, fact='')
+        Films.objects.create(name='Blues Brothers', latitude=41.8800, longitude=-87.6300, fact='')
+        Films.objects.create(name='Ferris Bueller', latitude=41.9500, longitude=-87.6500, fact='')
+
+    def tearDown(self):
+        catalog._version = None
+        spatial._index = None
+        cache._cache = None
+
+    def test_nearby_adds_travel_times_for_the_nearest(self):
+        response = self.client.get('/api/nearby/', {'lat': 41.8800, 'lon': -87.6300, 'limit': 2})
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual([result['location_name'] for result in results],
+                         ['Blues Brothers', 'Rookery', 'Ferris Bueller'])
+        self.assertEqual([result.get('travel_mode') for result in results], ['transit', 'transit', None])
+        # One request per mode covers both candidates
+        self.assertEqual(sorted(self.google.calls), [('distancematrix', 'transit'), ('distancematrix', 'walking')])
+
+        again = self.client.get('/api/nearby/', {'lat': 41.8800, 'lon': -87.6300, 'limit': 2})
+        self.assertEqual(again.json(), response.json())
+        self.assertEqual(len(self.google.calls), 2)
+
+    def test_nearby_type_and_radius(self):
+        results = self.client.get('/api/nearby/', {
+            'lat': 41.8800, 'lon': -87.6300, 'type': 'Films', 'radius_km': 1,
+        }).json()['results']
+        self.assertEqual([(result['location_name'], 'travel_mode' in result) for result in results],
+                         [('Blues Brothers', True), ('Ferris Bueller', False)])
+
+    def test_commute_picks_the_fastest_mode(self):
+        response = self.client.get('/api/commute/', {
+            'origin_lat': 41.88, 'origin_lon': -87.63, 'destination_lat': 41.95, 'destination_lon': -87.65,
+        })
+        payload = response.json()
+        self.assertEqual(payload['best_commute_mode'], 'transit')
+        self.assertEqual(payload['best_commute']['steps'], 2)
+        self.assertEqual(set(payload['all_options']), set(COMMUTE_MODES))
+        self.assertEqual(self.google.count('directions'), len(COMMUTE_MODES))
+
+    def test_upstream_errors_leave_estimates_only(self):
+        self.google.status_code = 500
+        results = self.client.get('/api/nearby/', {'lat': 41.8800, 'lon': -87.6300}).json()['results']
+        self.assertEqual(len(results), 3)
+        self.assertFalse(any('travel_mode' in result for result in results))
+        commute = self.client.get('/api/commute/', {
+            'origin_lat': 41.88, 'origin_lon': -87.63, 'destination_lat': 41.95, 'destination_lon': -87.65,
+        })
+        self.assertEqual(commute.json(), {})
+
+    def test_bad_parameters(self):
+        for params in ({'lat': 41.88}, {'lat': 41.88, 'lon': -87.63, 'limit': 0},
+                       {'lat': 'nan', 'lon': -87.63}):
+            self.assertEqual(self.client.get('/api/nearby/', params).status_code, 400, params)
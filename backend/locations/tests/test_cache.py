@@ -0,0 +1,120 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+
+from locations import cache as cache_module
+from locations.cache import GoogleMapsCache
+from locations.models import CachedResponse
+
+
+class Upstream:
+    """Counts calls and answers each with a fresh value."""
+
+    def __init__(self):
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def __call__(self):
+        with self.lock:
+            self.calls += 1
+            return {'call': self.calls}
+
+
+class MemoryCacheTests(SimpleTestCase):
+
+    def test_keys_are_quantized(self):
+        cache = GoogleMapsCache(precision=3, persist=False)
+        self.assertEqual(
+            cache.make_key('directions', (41.88012, -87.63004), (41.8, -87.6), mode='walking'),
+            'directions:walking:41.88,-87.63:41.8,-87.6',
+        )
+        self.assertEqual(cache.make_key('directions', (41.88012, -87.63004)),
+                         cache.make_key('directions', (41.8804, -87.6296)))
+
+    def test_concurrent_misses_make_one_upstream_call(self):
+        cache = GoogleMapsCache(persist=False)
+        upstream = Upstream()
+        release = threading.Event()
+
+        def slow_fetch():
+            release.wait(5)
+            return upstream()
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(cache.get_or_fetch('directions', 'key', slow_fetch)))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.1)
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(upstream.calls, 1)
+        self.assertEqual(results, [{'call': 1}] * 5)
+
+    def test_expired_entries_are_refetched(self):
+        cache = GoogleMapsCache(persist=False, ttls={'directions': 0, 'distancematrix': 60})
+        upstream = Upstream()
+        cache.get_or_fetch('directions', 'short', upstream)
+        self.assertEqual(cache.get_or_fetch('directions', 'short', upstream), {'call': 2})
+        cache.get_or_fetch('distancematrix', 'long', upstream)
+        self.assertEqual(cache.get_or_fetch('distancematrix', 'long', upstream), {'call': 3})
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = GoogleMapsCache(persist=False, max_entries=2)
+        upstream = Upstream()
+        cache.get_or_fetch('directions', 'a', upstream)
+        cache.get_or_fetch('directions', 'b', upstream)
+        cache.get_or_fetch('directions', 'a', upstream)
+        cache.get_or_fetch('directions', 'c', upstream)
+        self.assertEqual(cache.get_or_fetch('directions', 'a', upstream), {'call': 1})
+        self.assertEqual(cache.get_or_fetch('directions', 'b', upstream), {'call': 4})
+
+    def test_failures_are_not_cached_and_release_waiters(self):
+        cache = GoogleMapsCache(persist=False)
+        self.assertIsNone(cache.get_or_fetch('directions', 'key', lambda: None))
+        with self.assertRaises(RuntimeError):
+            cache.get_or_fetch('directions', 'key', mock.Mock(side_effect=RuntimeError))
+        self.assertEqual(cache._inflight, {})
+        self.assertEqual(cache.get_or_fetch('directions', 'key', Upstream()), {'call': 1})
+
+    def test_many_keys_fetch_only_the_misses(self):
+        cache = GoogleMapsCache(persist=False)
+        cache.get_or_fetch('distancematrix', 'a', Upstream())
+        requested = []
+
+        def fetch_missing(missing):
+            requested.append(list(missing))
+            return {key: key.upper() for key in missing}
+
+        results = cache.get_many_or_fetch('distancematrix', ['a', 'b', 'c', 'b'], fetch_missing)
+        self.assertEqual(requested, [['b', 'c']])
+        self.assertEqual(results, {'a': {'call': 1}, 'b': 'B', 'c': 'C'})
+
+
+class PersistedCacheTests(TestCase):
+
+    def test_entries_survive_a_new_process(self):
+        upstream = Upstream()
+        GoogleMapsCache().get_or_fetch('directions', 'key', upstream)
+        self.assertEqual(GoogleMapsCache().get_or_fetch('directions', 'key', upstream), {'call': 1})
+        self.assertEqual(upstream.calls, 1)
+
+    def test_expired_rows_are_refetched_and_overwritten(self):
+        upstream = Upstream()
+        GoogleMapsCache().get_or_fetch('directions', 'key', upstream)
+        CachedResponse.objects.update(expires_at=datetime.now(timezone.utc) - timedelta(seconds=1))
+        self.assertEqual(GoogleMapsCache().get_or_fetch('directions', 'key', upstream), {'call': 2})
+        self.assertEqual(list(CachedResponse.objects.values_list('key', 'payload')), [('key', {'call': 2})])
+
+    def test_expired_rows_are_purged(self):
+        CachedResponse.objects.create(key='old', endpoint='directions', payload={},
+                                      expires_at=datetime.now(timezone.utc) - timedelta(days=1))
+        with mock.patch.object(cache_module, 'PURGE_EVERY', 1):
+            GoogleMapsCache().get_or_fetch('directions', 'new', Upstream())
+        self.assertEqual(list(CachedResponse.objects.values_list('key', flat=True)), ['new'])
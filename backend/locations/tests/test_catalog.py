@@ -0,0 +1,101 @@
+import threading
+
+from django.db import connection
+from django.db.models import F
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from locations import catalog, spatial
+from locations.api import get_all_locations
+from locations.catalog import bump_catalog_version, get_catalog_page, get_catalog_version, iter_catalog
+from locations.models import Architecture, CatalogVersion, Films, Music
+
+
+def bump_elsewhere():
+    """Bump the shared version the way another process would, bypassing this process's last read."""
+    CatalogVersion.objects.filter(pk=catalog.CATALOG_VERSION_ROW).update(version=F('version') + 1)
+
+
+def in_other_thread(function):
+    """Run function on its own database connection, as another worker process would."""
+    def run():
+        try:
+            function()
+        finally:
+            connection.close()
+    thread = threading.Thread(target=run)
+    thread.start()
+    thread.join()
+
+
+class CatalogQueryTests(TestCase):
+
+    def setUp(self):
+        Films.objects.create(name='Blues Brothers', latitude=41.88, longitude=-87.63, fact='long fact')
+        Architecture.objects.create(name='Rookery', latitude=41.879, longitude=-87.632, fact='fact')
+        Music.objects.create(name='Green Mill', latitude=41.969, longitude=-87.66, fact='fact')
+
+    def test_pages_follow_type_and_id_order_without_fact(self):
+        rows, after = get_catalog_page(limit=2)
+        self.assertEqual([row['location_type'] for row in rows], ['Architecture', 'Films'])
+        self.assertNotIn('fact', rows[0])
+        rest, after = get_catalog_page(after=after, limit=2)
+        self.assertEqual([row['name'] for row in rest], ['Green Mill'])
+        self.assertIsNone(after)
+
+    def test_iter_catalog_includes_fact_on_request(self):
+        rows = list(iter_catalog('Films', include_fact=True, page_size=1))
+        self.assertEqual([(row['name'], row['fact']) for row in rows], [('Blues Brothers', 'long fact')])
+
+    def test_get_all_locations_returns_instances_without_fact(self):
+        locations = get_all_locations()
+        self.assertEqual([type(location).__name__ for location in locations], ['Architecture', 'Films', 'Music'])
+        self.assertEqual(locations[0].get_deferred_fields(), {'fact'})
+        [film] = get_all_locations('Films', include_fact=True)
+        self.assertEqual(film.get_deferred_fields(), set())
+
+
+@override_settings(CATALOG_VERSION_POLL_SECONDS=0)
+class CatalogVersionTests(TransactionTestCase):
+
+    def setUp(self):
+        catalog._version = None
+        spatial._index = None
+        CatalogVersion.objects.get_or_create(pk=catalog.CATALOG_VERSION_ROW)
+
+    def tearDown(self):
+        catalog._version = None
+        spatial._index = None
+
+    def test_bump_increments_the_shared_row(self):
+        version = get_catalog_version()
+        self.assertEqual(bump_catalog_version(), version + 1)
+        self.assertEqual(CatalogVersion.objects.get(pk=catalog.CATALOG_VERSION_ROW).version, version + 1)
+
+    def test_missing_row_is_recreated(self):
+        CatalogVersion.objects.all().delete()
+        self.assertEqual(get_catalog_version(), 1)
+        self.assertEqual(bump_catalog_version(), 2)
+
+    def test_bump_from_another_connection_rebuilds_the_index(self):
+        Films.objects.create(name='Blues Brothers', latitude=41.88, longitude=-87.63, fact='')
+        index = spatial.get_spatial_index()
+        self.assertEqual(len(index), 1)
+
+        def other_worker():
+            # Bulk writes send no signals, so only the shared version tells this process
+            Films.objects.bulk_create([Films(name='Ferris Bueller', latitude=41.879, longitude=-87.624, fact='')])
+            bump_elsewhere()
+        in_other_thread(other_worker)
+
+        rebuilt = spatial.get_spatial_index()
+        self.assertIsNot(rebuilt, index)
+        self.assertEqual(len(rebuilt), 2)
+        self.assertEqual(rebuilt.version, index.version + 1)
+
+    @override_settings(CATALOG_VERSION_POLL_SECONDS=3600)
+    def test_version_is_reread_after_the_poll_interval(self):
+        version = get_catalog_version()
+        in_other_thread(bump_elsewhere)
+        self.assertEqual(get_catalog_version(), version)
+        with override_settings(CATALOG_VERSION_POLL_SECONDS=0):
+            self.assertEqual(get_catalog_version(), version + 1)
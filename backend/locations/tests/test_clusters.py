@@ -0,0 +1,86 @@
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from locations import catalog, clusters, spatial
+from locations.clusters import MAX_CLUSTER_ZOOM, ClusterIndex
+from locations.models import Architecture, Films
+from locations.spatial import IndexedLocation
+
+
+def location(location_type, location_id, latitude, longitude):
+    return IndexedLocation(location_type, location_id, f"{location_type} {location_id}", latitude, longitude, None)
+
+
+# Three close together in the Loop, one at Wrigley Field, two either side of the antimeridian
+LOCATIONS = [
+    location('Architecture', 1, 41.8800, -87.6300),
+    location('Architecture', 2, 41.8801, -87.6301),
+    location('Films', 1, 41.8802, -87.6299),
+    location('Music', 1, 41.9484, -87.6553),
+    location('History', 1, -17.00, 179.90),
+    location('History', 2, -17.00, -179.90),
+]
+
+
+class ClusterIndexTests(SimpleTestCase):
+
+    def setUp(self):
+        self.index = ClusterIndex(LOCATIONS, version=3)
+
+    def test_every_level_counts_every_location(self):
+        self.assertEqual(len(self.index), 6)
+        for zoom, level in self.index.levels.items():
+            self.assertEqual(sum(cluster.count for cluster in level.values()), 6, zoom)
+
+    def test_neighbours_merge_as_the_map_zooms_out(self):
+        [chicago] = self.index.query(41.5, -88.0, 42.5, -87.0, 3)
+        self.assertEqual(chicago['count'], 4)
+        self.assertEqual(chicago['types'], {'Architecture': 2, 'Films': 1, 'Music': 1})
+        self.assertGreater(chicago['expansion_zoom'], 3)
+
+        loop = self.index.query(41.5, -88.0, 42.5, -87.0, 12)
+        self.assertEqual([cluster['count'] for cluster in loop], [3, 1])
+        self.assertEqual(loop[1]['expansion_zoom'], None)
+        self.assertEqual(loop[0]['location']['location_type'], 'Architecture')
+
+    def test_antimeridian_viewports_cover_both_sides(self):
+        crossing = self.index.query(-20, 179, -15, -179, 8)
+        self.assertEqual(sorted(cluster['location']['location_id'] for cluster in crossing), [1, 2])
+        # The same bounds read west to east leave out both sides of the antimeridian
+        self.assertEqual(self.index.query(-20, -179, -15, 179, 8), [])
+
+
+@override_settings(CATALOG_VERSION_POLL_SECONDS=0)
+class MapClusterViewTests(TestCase):
+
+    def setUp(self):
+        catalog._version = None
+        spatial._index = None
+        clusters._clusters.clear()
+        Architecture.objects.create(name='Rookery', latitude=41.8791, longitude=-87.6319, fact='')
+        Films.objects.create(name='Blues Brothers', latitude=41.8800, longitude=-87.6300, fact='')
+
+    def tearDown(self):
+        catalog._version = None
+        spatial._index = None
+        clusters._clusters.clear()
+
+    def get(self, headers=None, **params):
+        query = {'south': 41.8, 'west': -87.7, 'north': 41.9, 'east': -87.6, 'zoom': 10, **params}
+        return self.client.get('/api/clusters/', query, headers=headers)
+
+    def test_clusters_and_revalidation(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([cluster['count'] for cluster in response.json()['clusters']], [2])
+        again = self.get(headers={'If-None-Match': response['ETag']})
+        self.assertEqual(again.status_code, 304)
+
+    def test_past_the_deepest_level_locations_come_back_alone(self):
+        payload = self.get(zoom=MAX_CLUSTER_ZOOM + 1).json()
+        self.assertFalse(payload['clustered'])
+        self.assertEqual(sorted(cluster['location']['location_name'] for cluster in payload['clusters']),
+                         ['Blues Brothers', 'Rookery'])
+
+    def test_non_finite_parameters_are_rejected(self):
+        for params in ({'zoom': 'inf'}, {'zoom': '-inf'}, {'south': 'nan'}):
+            self.assertEqual(self.get(**params).status_code, 400, params)
@@ -0,0 +1,178 @@
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+
+from locations import api, cache
+from locations.api import (
+    NEARBY_DEFAULT_LIMIT, _plan_distance_matrix_batches, get_all_locations, get_distance_matrix, nearby_candidates,
+)
+from locations.models import Architecture, Films
+from locations.quota import DEFAULT_QUOTA_SETTINGS, GoogleMapsQuota
+from locations.spatial import IndexedLocation
+
+
+ORIGIN = (41.8800, -87.6300)
+# Destinations this stand-in has no transit route to
+NO_TRANSIT = {'41.9,-87.7'}
+
+
+class FakeDistanceMatrix:
+    """Stand-in for requests.get that answers Distance Matrix calls and records them."""
+
+    def __init__(self, status_code=200):
+        self.status_code = status_code
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def __call__(self, url, params, timeout):
+        origins = params['origins'].split('|')
+        destinations = params['destinations'].split('|')
+        with self.lock:
+            self.calls.append((params['mode'], origins, destinations))
+        response = mock.Mock(status_code=self.status_code)
+        response.json.return_value = {
+            'status': 'OK',
+            'rows': [
+                {'elements': [self._element(params['mode'], destination) for destination in destinations]}
+                for _ in origins
+            ],
+        }
+        return response
+
+    @staticmethod
+    def _element(mode, destination):
+        if mode == 'transit' and destination in NO_TRANSIT:
+            return {'status': 'ZERO_RESULTS'}
+        return {
+            'status': 'OK',
+            'distance': {'value': 1500, 'text': '1.5 km'},
+            'duration': {'value': 600 if mode == 'transit' else 1200, 'text': '10 mins'},
+        }
+
+    def elements(self, mode=None):
+        return sum(len(origins) * len(destinations)
+                   for call_mode, origins, destinations in self.calls if mode in (None, call_mode))
+
+
+def destinations(count, start=0):
+    return [(41.8 + number * 0.001, -87.6) for number in range(start, start + count)]
+
+
+class BatchPlanTests(SimpleTestCase):
+
+    def test_destinations_are_split_at_25(self):
+        rows = {('walking', 'o'): [f"d{number}" for number in range(30)]}
+        batches = _plan_distance_matrix_batches(rows)
+        self.assertEqual([len(batch[2]) for batch in batches], [25, 5])
+
+    def test_origins_share_requests_within_100_elements(self):
+        shared = [f"d{number}" for number in range(25)]
+        rows = {('walking', f"o{number}"): shared for number in range(5)}
+        rows[('walking', 'other')] = ['d0']
+        batches = _plan_distance_matrix_batches(rows)
+        self.assertEqual(sorted((len(origins), len(dests)) for _, origins, dests in batches), [(1, 1), (1, 25), (4, 25)])
+        for _, origins, dests in batches:
+            self.assertLessEqual(len(origins) * len(dests), 100)
+
+
+class NearbyCandidateTests(SimpleTestCase):
+
+    def setUp(self):
+        self.ranked = [
+            IndexedLocation('Films', number, f"film {number}", 41.88, -87.63, number * 0.5, 7 if number < 3 else None)
+            for number in range(NEARBY_DEFAULT_LIMIT + 5)
+        ]
+
+    def test_limit_counts_venues(self):
+        # Films 0-2 share venue 7, so they take up one place
+        self.assertEqual([location.id for location in nearby_candidates(self.ranked, 2, None)], [0, 1, 2, 3])
+        self.assertEqual([location.id for location in nearby_candidates(self.ranked, 5, 1.5)], [0, 1, 2, 3])
+        self.assertEqual(nearby_candidates(self.ranked, 0, None), [])
+
+    def test_no_limit_means_the_default(self):
+        self.assertEqual(nearby_candidates(self.ranked, None, None),
+                         nearby_candidates(self.ranked, NEARBY_DEFAULT_LIMIT, None))
+
+
+@mock.patch.dict('os.environ', {'GOOGLE_MAPS_API_KEY': 'test-key'})
+class DistanceMatrixTests(TestCase):
+
+    def setUp(self):
+        cache._cache = None
+        quota = GoogleMapsQuota({**DEFAULT_QUOTA_SETTINGS, 'LIMITS': {'DEFAULT': {'QPS': 1000, 'DAILY': None}}})
+        patcher = mock.patch.object(api, 'get_google_maps_quota', return_value=quota)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        cache._cache = None
+
+    def test_requests_are_batched_per_mode(self):
+        google = FakeDistanceMatrix()
+        with mock.patch.object(api.requests, 'get', google):
+            results = get_distance_matrix(*ORIGIN, destinations(30))
+        self.assertEqual(len(results), 30)
+        self.assertEqual(sorted((mode, len(dests)) for mode, _, dests in google.calls),
+                         [('transit', 5), ('transit', 25), ('walking', 5), ('walking', 25)])
+        self.assertEqual({result['travel_mode'] for result in results}, {'transit'})
+
+    def test_quota_is_charged_per_element(self):
+        google = FakeDistanceMatrix()
+        quota = api.get_google_maps_quota()
+        with mock.patch.object(api.requests, 'get', google), \
+                mock.patch.object(quota, 'acquire', wraps=quota.acquire) as acquire:
+            get_distance_matrix(*ORIGIN, destinations(30))
+        self.assertEqual(sorted(call.args for call in acquire.call_args_list), [
+            ('distancematrix', 5), ('distancematrix', 5), ('distancematrix', 25), ('distancematrix', 25),
+        ])
+        self.assertEqual(sum(call.args[1] for call in acquire.call_args_list), google.elements())
+
+    def test_cached_elements_are_not_fetched_again(self):
+        google = FakeDistanceMatrix()
+        with mock.patch.object(api.requests, 'get', google):
+            first = get_distance_matrix(*ORIGIN, destinations(10))
+            self.assertEqual(len(google.calls), 2)
+            self.assertEqual(get_distance_matrix(*ORIGIN, destinations(10)), first)
+            self.assertEqual(len(google.calls), 2)
+
+            get_distance_matrix(*ORIGIN, destinations(11))
+        # Only the new destination went upstream, once per mode
+        self.assertEqual(sorted(google.calls[2:]), [
+            ('transit', ['41.88,-87.63'], ['41.81,-87.6']),
+            ('walking', ['41.88,-87.63'], ['41.81,-87.6']),
+        ])
+
+    def test_persisted_elements_survive_a_restart(self):
+        google = FakeDistanceMatrix()
+        with mock.patch.object(api.requests, 'get', google):
+            get_distance_matrix(*ORIGIN, destinations(3))
+            cache._cache = None
+            get_distance_matrix(*ORIGIN, destinations(3))
+        self.assertEqual(google.elements(), 6)
+
+    def test_no_route_falls_back_to_walking_and_is_cached(self):
+        google = FakeDistanceMatrix()
+        with mock.patch.object(api.requests, 'get', google):
+            [result] = get_distance_matrix(*ORIGIN, [(41.9, -87.7)])
+            get_distance_matrix(*ORIGIN, [(41.9, -87.7)])
+        self.assertEqual(result['travel_mode'], 'walking')
+        self.assertEqual(result['travel_time_min'], 20)
+        self.assertEqual(google.elements(), 2)
+
+    def test_failed_requests_are_not_cached(self):
+        failing = FakeDistanceMatrix(status_code=500)
+        with mock.patch.object(api.requests, 'get', failing):
+            self.assertEqual(get_distance_matrix(*ORIGIN, destinations(2)), [])
+        google = FakeDistanceMatrix()
+        with mock.patch.object(api.requests, 'get', google):
+            self.assertEqual(len(get_distance_matrix(*ORIGIN, destinations(2))), 2)
+        self.assertEqual(google.elements(), 4)
+
+    def test_catalog_listing_can_be_routed(self):
+        Architecture.objects.create(name='Rookery', latitude=41.8791, longitude=-87.6319, fact='')
+        Films.objects.create(name='Blues Brothers', latitude=41.8800, longitude=-87.6300, fact='')
+        with mock.patch.object(api.requests, 'get', FakeDistanceMatrix()):
+            results = get_distance_matrix(*ORIGIN, get_all_locations())
+        self.assertEqual([(result['location_type'], result['location_name']) for result in results],
+                         [('Architecture', 'Rookery'), ('Films', 'Blues Brothers')])
@@ -0,0 +1,64 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from locations import catalog, spatial
+from locations.feed import get_nearby_feed
+from locations.models import Architecture, Films, Music
+
+
+@override_settings(CATALOG_VERSION_POLL_SECONDS=0)
+class NearbyFeedTests(TestCase):
+
+    def setUp(self):
+        catalog._version = None
+        spatial._index = None
+        cache.clear()
+        Films.objects.create(name='Blues Brothers', latitude=41.8800, longitude=-87.6300, fact='')
+        Architecture.objects.create(name='Rookery', latitude=41.8791, longitude=-87.6319, fact='')
+        Music.objects.create(name='Jazz Showcase', latitude=41.8730, longitude=-87.6260, fact='')
+
+    def tearDown(self):
+        catalog._version = None
+        spatial._index = None
+        cache.clear()
+
+    def test_first_poll_is_full(self):
+        payload, etag = get_nearby_feed('phone', 41.8800, -87.6300, radius_km=0.5)
+        self.assertTrue(payload['full'])
+        self.assertEqual([item['location_name'] for item in payload['results']], ['Blues Brothers', 'Rookery'])
+        self.assertEqual(payload['etag'], etag)
+
+    def test_small_moves_reuse_the_result(self):
+        _, etag = get_nearby_feed('phone', 41.8800, -87.6300, radius_km=0.5)
+        payload, again = get_nearby_feed('phone', 41.8801, -87.6300, radius_km=0.5, if_none_match=etag)
+        self.assertIsNone(payload)
+        self.assertEqual(again, etag)
+
+    def test_delta_reports_entered_and_left(self):
+        _, etag = get_nearby_feed('phone', 41.8800, -87.6300, radius_km=0.5)
+        payload, new_etag = get_nearby_feed('phone', 41.8740, -87.6270, radius_km=0.5, if_none_match=etag)
+        self.assertFalse(payload['full'])
+        self.assertNotEqual(new_etag, etag)
+        self.assertEqual([item['location_name'] for item in payload['entered']], ['Jazz Showcase'])
+        self.assertEqual(payload['left'], [f"Films:{Films.objects.get().id}",
+                                           f"Architecture:{Architecture.objects.get().id}"])
+        self.assertEqual(payload['order'], [f"Music:{Music.objects.get().id}"])
+
+    def test_reordering_sends_the_new_order(self):
+        _, etag = get_nearby_feed('phone', 41.8800, -87.6300, radius_km=0.5)
+        payload, _ = get_nearby_feed('phone', 41.8791, -87.6319, radius_km=0.5, if_none_match=etag)
+        self.assertEqual((payload['entered'], payload['left']), ([], []))
+        self.assertEqual(payload['order'], [f"Architecture:{Architecture.objects.get().id}",
+                                            f"Films:{Films.objects.get().id}"])
+
+    def test_client_without_the_last_result_gets_everything(self):
+        get_nearby_feed('phone', 41.8800, -87.6300, radius_km=0.5)
+        payload, _ = get_nearby_feed('phone', 41.8740, -87.6270, radius_km=0.5, if_none_match='"stale"')
+        self.assertTrue(payload['full'])
+
+    def test_catalog_changes_are_not_hidden_by_small_moves(self):
+        _, etag = get_nearby_feed('phone', 41.8800, -87.6300, radius_km=0.5)
+        Films.objects.create(name='Ferris Bueller', latitude=41.8799, longitude=-87.6301, fact='')
+        catalog.bump_catalog_version()
+        payload, _ = get_nearby_feed('phone', 41.8800, -87.6300, radius_km=0.5, if_none_match=etag)
+        self.assertEqual([item['location_name'] for item in payload['entered']], ['Ferris Bueller'])
@@ -0,0 +1,94 @@
+import struct
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from locations.geometry import (
+    RouteGeometry, decode_polyline, douglas_peucker_significance, encode_deltas, encode_polyline,
+)
+
+
+# Example from Google's encoded polyline documentation
+GOOGLE_EXAMPLE = '_p~iF~ps|U_ulLnnqC_mqNvxq`@'
+GOOGLE_POINTS = [(38.5, -120.2), (40.7, -120.95), (43.252, -126.453)]
+
+
+def zigzag(count=50, wiggle=0.00002):
+    """A line heading north with a small east-west wiggle at every other vertex."""
+    latitudes = [41.88 + number * 0.001 for number in range(count)]
+    longitudes = [-87.63 + (wiggle if number % 2 else 0) for number in range(count)]
+    return latitudes, longitudes
+
+
+class PolylineTests(SimpleTestCase):
+
+    def test_decodes_the_documented_example(self):
+        latitudes, longitudes = decode_polyline(GOOGLE_EXAMPLE)
+        self.assertEqual(list(zip(latitudes, longitudes)), GOOGLE_POINTS)
+
+    def test_round_trip(self):
+        latitudes, longitudes = zip(*GOOGLE_POINTS)
+        self.assertEqual(encode_polyline(latitudes, longitudes), GOOGLE_EXAMPLE)
+        latitudes, longitudes = zigzag()
+        decoded = decode_polyline(encode_polyline(latitudes, longitudes))
+        for original, back in zip(latitudes + longitudes, list(decoded[0]) + list(decoded[1])):
+            self.assertAlmostEqual(original, back, places=5)
+
+    def test_deltas_are_little_endian_int32_after_an_absolute_first_point(self):
+        latitudes, longitudes = zip(*GOOGLE_POINTS)
+        values = struct.unpack('<6i', encode_deltas(latitudes, longitudes))
+        self.assertEqual(values, (3850000, -12020000, 220000, -75000, 255200, -550300))
+
+
+class SimplificationTests(SimpleTestCase):
+
+    def test_endpoints_always_survive(self):
+        significance = douglas_peucker_significance(*zigzag())
+        self.assertEqual((significance[0], significance[-1]), (float('inf'), float('inf')))
+
+    def test_wiggles_are_dropped_when_zoomed_out(self):
+        geometry = RouteGeometry(*zigzag())
+        self.assertEqual(list(geometry.indices(10)), [0, 49])
+        self.assertEqual(len(geometry.indices(21)), 50)
+        # Zooming in never drops vertices
+        previous = 0
+        for zoom in range(0, 22):
+            kept = len(geometry.indices(zoom))
+            self.assertGreaterEqual(kept, previous)
+            previous = kept
+
+    def test_corners_survive_at_street_zooms(self):
+        geometry = RouteGeometry([41.88, 41.90, 41.90], [-87.63, -87.63, -87.60])
+        self.assertEqual(list(geometry.indices(10)), [0, 1, 2])
+        self.assertEqual(geometry.polyline(10), geometry.polyline(21))
+        # At zoom 0 a pixel covers more than the whole route
+        self.assertEqual(list(geometry.indices(0)), [0, 2])
+
+    def test_empty_route(self):
+        geometry = RouteGeometry(*decode_polyline(''))
+        self.assertEqual(len(geometry.indices(12)), 0)
+        self.assertEqual(geometry.polyline(12), '')
+
+
+@mock.patch('locations.views.get_route')
+class RouteGeometryViewTests(SimpleTestCase):
+
+    def get(self, **params):
+        query = {'origin_lat': 41.88, 'origin_lon': -87.63, 'destination_lat': 41.93, 'destination_lon': -87.63,
+                 **params}
+        return self.client.get('/api/commute/geometry/', query)
+
+    def test_polyline_for_a_zoom(self, get_route):
+        latitudes, longitudes = zigzag()
+        get_route.return_value = {'polyline': encode_polyline(latitudes, longitudes)}
+        payload = self.get(zoom=10).json()
+        self.assertEqual((payload['zoom'], payload['points']), (10, 2))
+        response = self.get(zoom=21, format='binary')
+        self.assertEqual(response['X-Point-Count'], '50')
+        self.assertEqual(len(response.content), 50 * 8)
+
+    def test_bad_parameters(self, get_route):
+        get_route.return_value = {}
+        self.assertEqual(self.get().status_code, 404)
+        for params in ({'zoom': 'inf'}, {'zoom': 'nan'}, {'origin_lat': '-inf'}, {'format': 'svg'}):
+            self.assertEqual(self.get(**params).status_code, 400, params)
@@ -0,0 +1,116 @@
+import json
+import shutil
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from locations.models import Architecture, Films, History
+
+
+class ImportLocationsTests(TestCase):
+
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write(self, name, text):
+        path = self.directory / name
+        path.write_text(text, encoding='utf-8')
+        return path
+
+    def run_import(self, path, *args):
+        stdout, stderr = StringIO(), StringIO()
+        call_command('import_locations', str(path), *args, stdout=stdout, stderr=stderr)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_create_update_unchanged_and_delete(self):
+        Films.objects.create(name='Blues Brothers', latitude=41.88, longitude=-87.63, fact='old')
+        Films.objects.create(name='Ferris Bueller', latitude=41.879, longitude=-87.624, fact='same')
+        Films.objects.create(name='Gone', latitude=41.9, longitude=-87.6, fact='')
+        path = self.write('films.csv', (
+            "name,latitude,longitude,fact\n"
+            "blues brothers ,41.88,-87.63,new\n"
+            "Ferris Bueller,41.879,-87.624,same\n"
+            "The Dark Knight,41.886,-87.627,bats\n"
+        ))
+        output, _ = self.run_import(path, '--type', 'Films', '--delete-missing')
+        self.assertIn("1 created, 1 updated, 1 unchanged, 1 deleted", output)
+        self.assertEqual(
+            sorted(Films.objects.values_list('name', 'fact')),
+            [('Blues Brothers', 'new'), ('Ferris Bueller', 'same'), ('The Dark Knight', 'bats')],
+        )
+
+    def test_duplicates_and_invalid_rows_are_skipped(self):
+        path = self.write('mixed.csv', (
+            "name,latitude,longitude,fact,type\n"
+            "Rookery,41.8791,-87.6319,a,architecture\n"
+            "ROOKERY,41.879100001,-87.6319,b,Architecture\n"
+            "Rookery,41.8791,-87.6319,c,History\n"
+            ",41.0,-87.0,,Films\n"
+            "Nowhere,91,-87.0,,Films\n"
+            "Mystery,41.0,-87.0,,Opera\n"
+        ))
+        output, errors = self.run_import(path)
+        self.assertIn("2 created, 0 updated, 0 unchanged, 0 deleted, 1 duplicates skipped, 3 invalid rows", output)
+        self.assertEqual(Architecture.objects.get().fact, 'a')
+        self.assertEqual(History.objects.get().name, 'Rookery')
+        self.assertEqual(len(errors.splitlines()), 3)
+
+    def test_rows_of_another_type_are_rejected_with_type(self):
+        Architecture.objects.create(name='Rookery', latitude=41.8791, longitude=-87.6319, fact='')
+        path = self.write('films.csv', (
+            "name,latitude,longitude,fact,type\n"
+            "Blues Brothers,41.88,-87.63,,\n"
+            "Rookery,41.8791,-87.6319,,Architecture\n"
+        ))
+        output, errors = self.run_import(path, '--type', 'Films', '--delete-missing')
+        self.assertIn("1 created, 0 updated, 0 unchanged, 0 deleted, 0 duplicates skipped, 1 invalid rows", output)
+        self.assertIn("does not match --type Films", errors)
+        self.assertEqual(Architecture.objects.count(), 1)
+
+        # A second sync changes nothing
+        output, _ = self.run_import(path, '--type', 'Films', '--delete-missing')
+        self.assertIn("0 created, 0 updated, 1 unchanged, 0 deleted", output)
+
+    def test_delete_missing_only_touches_imported_types(self):
+        Architecture.objects.create(name='Rookery', latitude=41.8791, longitude=-87.6319, fact='')
+        Films.objects.create(name='Gone', latitude=41.9, longitude=-87.6, fact='')
+        path = self.write('films.csv', "name,latitude,longitude,fact,type\nBlues Brothers,41.88,-87.63,,Films\n")
+        output, _ = self.run_import(path, '--delete-missing')
+        self.assertIn("1 deleted", output)
+        self.assertEqual(Architecture.objects.count(), 1)
+        self.assertEqual(list(Films.objects.values_list('name', flat=True)), ['Blues Brothers'])
+
+    def test_dry_run_writes_nothing(self):
+        Films.objects.create(name='Blues Brothers', latitude=41.88, longitude=-87.63, fact='old')
+        path = self.write('films.csv', (
+            "name,latitude,longitude,fact\n"
+            "Blues Brothers,41.88,-87.63,new\n"
+            "The Dark Knight,41.886,-87.627,bats\n"
+        ))
+        output, _ = self.run_import(path, '--type', 'Films', '--dry-run')
+        self.assertTrue(output.startswith("[dry run] 1 created, 1 updated"))
+        self.assertEqual(list(Films.objects.values_list('name', 'fact')), [('Blues Brothers', 'old')])
+
+    def test_geojson_and_geojson_sequences(self):
+        feature = {
+            'type': 'Feature',
+            'geometry': {'type': 'Point', 'coordinates': [-87.6248, 41.8837]},
+            'properties': {'name': 'Chicago Cultural Center', 'fact': 'dome', 'category': 'History'},
+        }
+        collection = self.write('places.geojson', json.dumps({'type': 'FeatureCollection', 'features': [feature]}))
+        self.run_import(collection)
+        sequence = self.write('places.ndjson', '\x1e' + json.dumps(feature) + '\n\n')
+        output, _ = self.run_import(sequence)
+        self.assertIn("0 created, 0 updated, 1 unchanged", output)
+        self.assertEqual(History.objects.get().fact, 'dome')
+
+    def test_unknown_format_and_missing_file(self):
+        with self.assertRaises(CommandError):
+            self.run_import(self.write('places.txt', ''))
+        with self.assertRaises(CommandError):
+            self.run_import(self.directory / 'missing.csv')
@@ -0,0 +1,49 @@
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.test import SimpleTestCase, override_settings
+
+from locations import metrics
+
+
+class ServerTimingTests(SimpleTestCase):
+
+    def test_overlapping_intervals_count_once(self):
+        self.assertAlmostEqual(metrics._wall_clock([(0.0, 1.0), (0.5, 1.5), (3.0, 4.0)]), 2.5)
+        self.assertEqual(metrics._wall_clock([]), 0.0)
+
+    def test_concurrent_google_calls_report_wall_clock_time(self):
+        token = metrics._request_timings.set({})
+        try:
+            def call():
+                time.sleep(0.05)
+                metrics.record_google_call('distancematrix', 'walking', 'OK', 0.05)
+
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                for future in [executor.submit(contextvars.copy_context().run, call) for _ in range(4)]:
+                    future.result()
+            elapsed = time.perf_counter() - started
+            google = metrics._wall_clock(metrics._request_timings.get()['google'])
+        finally:
+            metrics._request_timings.reset(token)
+        self.assertLessEqual(google, elapsed)
+        self.assertGreaterEqual(google, 0.05)
+
+
+class MetricsViewTests(SimpleTestCase):
+
+    def test_local_clients_can_scrape(self):
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'http_request_seconds', response.content)
+
+    def test_other_clients_are_forbidden(self):
+        response = self.client.get('/metrics', REMOTE_ADDR='203.0.113.7')
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(METRICS_ALLOWED_IPS=['10.0.0.0/8'])
+    def test_allowed_networks(self):
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='10.1.2.3').status_code, 200)
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
@@ -0,0 +1,172 @@
+from datetime import datetime, timedelta
+from io import StringIO
+from unittest import mock
+from zoneinfo import ZoneInfo
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.utils import timezone
+
+from locations import api
+from locations.models import Architecture, Films, Venue
+from locations.places import get_stored_place_details, is_open_at, refresh_place_details, refresh_venue_details
+
+
+CHICAGO = ZoneInfo('America/Chicago')
+# Monday to Friday 09:00-17:00, and Saturday night into Sunday morning
+PERIODS = [
+    {'open': {'day': day, 'time': '0900'}, 'close': {'day': day, 'time': '1700'}} for day in range(1, 6)
+] + [{'open': {'day': 6, 'time': '2200'}, 'close': {'day': 0, 'time': '0200'}}]
+
+
+def chicago(day, hour, minute=0):
+    """A moment in the week of Sunday 2026-10-18, Chicago time."""
+    return datetime(2026, 10, 18 + day, hour, minute, tzinfo=CHICAGO)
+
+
+class IsOpenTests(SimpleTestCase):
+
+    def test_weekly_schedule(self):
+        self.assertTrue(is_open_at(PERIODS, chicago(1, 9)))
+        self.assertTrue(is_open_at(PERIODS, chicago(5, 16, 59)))
+        self.assertFalse(is_open_at(PERIODS, chicago(1, 17)))
+        self.assertFalse(is_open_at(PERIODS, chicago(0, 12)))
+
+    def test_periods_running_past_the_end_of_the_week(self):
+        self.assertTrue(is_open_at(PERIODS, chicago(6, 23)))
+        self.assertTrue(is_open_at(PERIODS, chicago(0, 1, 30)))
+        self.assertFalse(is_open_at(PERIODS, chicago(0, 2)))
+
+    def test_moments_are_read_in_the_places_time_zone(self):
+        # 15:30 UTC on Monday is 10:30 in Chicago
+        self.assertTrue(is_open_at(PERIODS, datetime(2026, 10, 19, 15, 30, tzinfo=ZoneInfo('UTC'))))
+        self.assertFalse(is_open_at(PERIODS, datetime(2026, 10, 19, 13, 30, tzinfo=ZoneInfo('UTC'))))
+
+    def test_always_open_and_unknown(self):
+        self.assertTrue(is_open_at([{'open': {'day': 0, 'time': '0000'}}], chicago(3, 3)))
+        self.assertIsNone(is_open_at(None))
+        self.assertIsNone(is_open_at([]))
+
+
+class FakePlaces:
+    """Stand-in for api._google_get answering Nearby Search and Place Details calls."""
+
+    def __init__(self, places=None, fail=False):
+        self.places = places if places is not None else {'ChIJrookery': 'Rookery Building'}
+        self.fail = fail
+        self.calls = []
+
+    def __call__(self, endpoint, params):
+        self.calls.append((endpoint, params.get('keyword') or params.get('place_id')))
+        if self.fail:
+            return None
+        if endpoint == 'place/nearbysearch':
+            return {'status': 'OK', 'results': [{'place_id': place_id} for place_id in self.places]}
+        if params['place_id'] not in self.places:
+            return {'status': 'NOT_FOUND'}
+        return {'status': 'OK', 'result': {
+            'place_id': params['place_id'],
+            'formatted_address': f"{self.places[params['place_id']]}, Chicago",
+            'rating': 4.7,
+            'opening_hours': {'periods': PERIODS, 'weekday_text': ['Monday: 9:00 AM - 5:00 PM']},
+        }}
+
+
+class RefreshPlaceDetailsTests(TestCase):
+
+    def setUp(self):
+        self.rookery = Architecture.objects.create(name='Rookery', latitude=41.8791, longitude=-87.6319, fact='')
+
+    def refresh(self, google, location=None):
+        with mock.patch.object(api, '_google_get', google):
+            return refresh_place_details('Architecture', location or self.rookery, 'test-key')
+
+    def test_new_locations_are_matched_then_detailed(self):
+        google = FakePlaces()
+        self.assertTrue(self.refresh(google))
+        self.assertEqual(google.calls, [('place/nearbysearch', 'Rookery'), ('place/details', 'ChIJrookery')])
+        self.rookery.refresh_from_db()
+        self.assertEqual((self.rookery.place_id, self.rookery.rating), ('ChIJrookery', 4.7))
+        self.assertIsNotNone(self.rookery.place_details_refreshed_at)
+
+        details = get_stored_place_details([('Architecture', self.rookery.id), ('Films', 99)], when=chicago(1, 10))
+        self.assertTrue(details[('Architecture', self.rookery.id)]['is_open'])
+        self.assertEqual(details[('Films', 99)], {})
+
+    def test_stored_place_ids_skip_the_search_until_google_drops_them(self):
+        self.rookery.place_id = 'ChIJrookery'
+        google = FakePlaces()
+        self.assertTrue(self.refresh(google, self.rookery))
+        self.assertEqual(google.calls, [('place/details', 'ChIJrookery')])
+
+        self.rookery.place_id = 'ChIJgone'
+        google = FakePlaces()
+        self.assertTrue(self.refresh(google, self.rookery))
+        self.assertEqual([endpoint for endpoint, _ in google.calls],
+                         ['place/details', 'place/nearbysearch', 'place/details'])
+
+    def test_no_match_is_stored_as_blank(self):
+        Architecture.objects.filter(id=self.rookery.id).update(place_id='ChIJold', rating=3.0)
+        self.rookery.refresh_from_db()
+        self.assertTrue(self.refresh(FakePlaces(places={})))
+        self.rookery.refresh_from_db()
+        self.assertEqual((self.rookery.place_id, self.rookery.rating), ('', None))
+
+    def test_failures_leave_the_row_alone(self):
+        self.assertFalse(self.refresh(FakePlaces(fail=True)))
+        self.assertFalse(self.refresh(mock.Mock(side_effect=ConnectionError('down'))))
+        self.rookery.refresh_from_db()
+        self.assertIsNone(self.rookery.place_details_refreshed_at)
+
+    def test_venues_share_one_lookup_with_their_entries(self):
+        venue = Venue.objects.create(name='Rookery', latitude=41.8791, longitude=-87.6319)
+        Architecture.objects.filter(id=self.rookery.id).update(venue=venue)
+        film = Films.objects.create(name='The Rookery', latitude=41.8791, longitude=-87.6319, fact='', venue=venue)
+        google = FakePlaces()
+        with mock.patch.object(api, '_google_get', google):
+            self.assertTrue(refresh_venue_details(venue, 'test-key'))
+        self.assertEqual(len(google.calls), 2)
+        for model, location_id in ((Venue, venue.id), (Architecture, self.rookery.id), (Films, film.id)):
+            self.assertEqual(model.objects.get(id=location_id).place_id, 'ChIJrookery')
+
+
+@mock.patch.dict('os.environ', {'GOOGLE_MAPS_API_KEY': 'test-key'})
+class RefreshPlaceDetailsCommandTests(TransactionTestCase):
+
+    def run_command(self, *args):
+        stdout = StringIO()
+        google = FakePlaces()
+        with mock.patch.object(api, '_google_get', google):
+            call_command('refresh_place_details', '--concurrency', '1', *args, stdout=stdout)
+        return stdout.getvalue(), google
+
+    def test_stale_locations_and_venues_are_refreshed_once(self):
+        venue = Venue.objects.create(name='Rookery', latitude=41.8791, longitude=-87.6319)
+        Architecture.objects.create(name='Rookery', latitude=41.8791, longitude=-87.6319, fact='', venue=venue)
+        Films.objects.create(name='Blues Brothers', latitude=41.88, longitude=-87.63, fact='')
+        Films.objects.create(name='Fresh', latitude=41.88, longitude=-87.63, fact='',
+                             place_details_refreshed_at=timezone.now() - timedelta(hours=1))
+
+        output, google = self.run_command()
+        self.assertIn("Refreshed 2 of 2 locations and venues (0 failed)", output)
+        self.assertEqual(sorted(keyword for endpoint, keyword in google.calls if endpoint == 'place/nearbysearch'),
+                         ['Blues Brothers', 'Rookery'])
+        self.assertEqual(Architecture.objects.get().place_id, 'ChIJrookery')
+
+        output, _ = self.run_command('--max-age', '0.5')
+        self.assertIn("Refreshed 1 of 1", output)
+
+    def test_type_and_limit(self):
+        Films.objects.create(name='Blues Brothers', latitude=41.88, longitude=-87.63, fact='')
+        Films.objects.create(name='Ferris Bueller', latitude=41.879, longitude=-87.624, fact='')
+        Architecture.objects.create(name='Rookery', latitude=41.8791, longitude=-87.6319, fact='')
+        output, _ = self.run_command('--type', 'Films', '--limit', '1')
+        self.assertIn("Refreshed 1 of 1", output)
+        self.assertEqual(Films.objects.exclude(place_id='').count(), 1)
+        self.assertEqual(Architecture.objects.exclude(place_id='').count(), 0)
+
+    @mock.patch.dict('os.environ', {'GOOGLE_MAPS_API_KEY': ''})
+    def test_requires_an_api_key(self):
+        with self.assertRaises(CommandError):
+            self.run_command()
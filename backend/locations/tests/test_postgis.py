@@ -0,0 +1,69 @@
+from unittest import skipUnless
+
+from django.conf import settings
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from locations import catalog, spatial
+from locations.api import find_locations_within_radius, find_nearest_locations
+from locations.models import Architecture, Films, Music
+from locations.postgis import locations_within_radius, nearest_locations, postgis_enabled
+from locations.spatial import SpatialIndex
+
+
+def names(locations):
+    return [location.name for location in locations]
+
+
+class PostgisSwitchTests(TestCase):
+
+    @override_settings(USE_POSTGIS=True)
+    def test_needs_a_postgresql_catalog_database(self):
+        self.assertEqual(postgis_enabled(), connection.vendor == 'postgresql')
+
+    @override_settings(USE_POSTGIS=False)
+    def test_off_unless_configured(self):
+        self.assertFalse(postgis_enabled())
+
+
+@skipUnless(getattr(settings, 'USE_POSTGIS', False) and connection.vendor == 'postgresql',
+            "needs the PostGIS database (USE_POSTGIS=1)")
+@override_settings(CATALOG_VERSION_POLL_SECONDS=0)
+class PostgisQueryTests(TestCase):
+
+    def setUp(self):
+        catalog._version = None
+        spatial._index = None
+        Films.objects.create(name='Blues Brothers', latitude=41.8800, longitude=-87.6300, fact='')
+        Architecture.objects.create(name='Rookery', latitude=41.8791, longitude=-87.6319, fact='')
+        Music.objects.create(name='Green Mill', latitude=41.9690, longitude=-87.6600, fact='')
+
+    def tearDown(self):
+        catalog._version = None
+        spatial._index = None
+
+    def test_nearest_orders_by_distance_and_filters(self):
+        self.assertEqual(names(nearest_locations(41.8800, -87.6300, limit=2)), ['Blues Brothers', 'Rookery'])
+        self.assertEqual(names(nearest_locations(41.8800, -87.6300, location_type='Music')), ['Green Mill'])
+        self.assertEqual(names(nearest_locations(41.8800, -87.6300, max_distance_km=1)), ['Blues Brothers', 'Rookery'])
+
+    def test_within_radius(self):
+        [rookery] = locations_within_radius(41.8791, -87.6319, 0.05)
+        self.assertEqual((rookery.location_type, rookery.name), ('Architecture', 'Rookery'))
+        self.assertAlmostEqual(rookery.distance_km, 0, places=3)
+        self.assertEqual(names(locations_within_radius(41.8800, -87.6300, 20)),
+                         ['Blues Brothers', 'Rookery', 'Green Mill'])
+
+    def test_updates_move_the_geography_column(self):
+        Music.objects.update(latitude=41.8801, longitude=-87.6301)
+        self.assertEqual(names(locations_within_radius(41.8800, -87.6300, 0.05)), ['Blues Brothers', 'Green Mill'])
+
+    def test_agrees_with_the_in_process_index(self):
+        index = SpatialIndex.build()
+        for origin in ((41.8800, -87.6300), (41.9500, -87.6500)):
+            self.assertEqual(names(find_nearest_locations(*origin, limit=3)), names(index.nearest(*origin, k=3)))
+            database = find_locations_within_radius(*origin, 5)
+            self.assertEqual(names(database), names(index.within_radius(*origin, 5)))
+            for found, indexed in zip(database, index.within_radius(*origin, 5)):
+                # Spheroid distances against the index's spherical approximation
+                self.assertAlmostEqual(found.distance_km, indexed.distance_km, delta=0.01 * indexed.distance_km + 0.001)
@@ -0,0 +1,132 @@
+import asyncio
+import json
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from locations import push
+from locations.push import NEARBY_SOCKET_PATH, websocket_application
+from locations.spatial import SpatialIndex
+
+
+def build_index(version=1, blues=(41.8800, -87.6300)):
+    index = SpatialIndex(version=version)
+    index.upsert('Films', 1, 'Blues Brothers', *blues)
+    index.upsert('Architecture', 1, 'Rookery', 41.8791, -87.6319)
+    index.upsert('Music', 1, 'Green Mill', 41.9690, -87.6600)
+    return index
+
+
+def position(latitude=41.8800, longitude=-87.6300, **options):
+    return {'type': 'websocket.receive', 'text': json.dumps({'latitude': latitude, 'longitude': longitude, **options})}
+
+
+class Socket:
+    """Drives the ASGI WebSocket application the way a server would."""
+
+    def __init__(self, path=NEARBY_SOCKET_PATH):
+        self.incoming = asyncio.Queue()
+        self.outgoing = asyncio.Queue()
+        self.task = asyncio.create_task(websocket_application(
+            {'type': 'websocket', 'path': path}, self.incoming.get, self.outgoing.put,
+        ))
+
+    async def send(self, message):
+        await self.incoming.put(message)
+
+    async def receive(self, timeout=1):
+        return await asyncio.wait_for(self.outgoing.get(), timeout)
+
+    async def event(self):
+        return json.loads((await self.receive())['text'])
+
+    async def assert_silent(self, testcase):
+        await asyncio.sleep(0.05)
+        testcase.assertTrue(self.outgoing.empty())
+
+    async def close(self):
+        await self.send({'type': 'websocket.disconnect', 'code': 1000})
+        await asyncio.wait_for(self.task, 1)
+
+
+class NearbySocketTests(SimpleTestCase):
+
+    def setUp(self):
+        self.index = build_index()
+        patcher = mock.patch.object(push, 'get_spatial_index', lambda: self.index)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def connect(self):
+        socket = Socket()
+        await socket.send({'type': 'websocket.connect'})
+        self.assertEqual(await socket.receive(), {'type': 'websocket.accept'})
+        return socket
+
+    async def test_changes_are_pushed_and_repeats_are_not(self):
+        socket = await self.connect()
+        await socket.send(position(radius_km=1))
+        nearby = await socket.event()
+        self.assertEqual([item['location_name'] for item in nearby['results']], ['Blues Brothers', 'Rookery'])
+        near = await socket.event()
+        self.assertEqual((near['event'], near['location']['key']), ('near', 'Films:1'))
+
+        # A step shorter than the movement threshold is not re-ranked
+        await socket.send(position(41.8801, radius_km=1))
+        await socket.assert_silent(self)
+        # Walking on past both keeps the same list but leaves 'near'
+        await socket.send(position(41.8830, radius_km=1))
+        await socket.assert_silent(self)
+        await socket.send(position(41.9600, -87.6600, type='Music', radius_km=2))
+        music = await socket.event()
+        self.assertEqual([item['key'] for item in music['results']], ['Music:1'])
+
+        await socket.close()
+        self.assertEqual(await socket.receive(), {'type': 'websocket.close', 'code': 1000})
+        self.assertEqual(push._connections, 0)
+
+    async def test_only_the_latest_pending_position_is_ranked(self):
+        socket = await self.connect()
+        for latitude in (41.80, 41.85, 41.9690):
+            await socket.send(position(latitude, -87.6600, radius_km=0.5))
+        nearby = await socket.event()
+        self.assertEqual([item['key'] for item in nearby['results']], ['Music:1'])
+        await socket.close()
+
+    async def test_invalid_messages_get_an_error(self):
+        socket = await self.connect()
+        for message in (
+            {'type': 'websocket.receive', 'text': 'not json'},
+            {'type': 'websocket.receive', 'text': 'x' * (push.MAX_MESSAGE_BYTES + 1)},
+            position(type='Opera'),
+            position(limit=-1),
+        ):
+            await socket.send(message)
+            self.assertEqual((await socket.event())['event'], 'error')
+        await socket.send({'type': 'websocket.receive', 'bytes': position()['text'].encode()})
+        self.assertEqual((await socket.event())['event'], 'nearby')
+        await socket.close()
+
+    async def test_idle_connections_pick_up_catalog_changes(self):
+        socket = await self.connect()
+        with mock.patch.object(push, 'CATALOG_CHECK_INTERVAL', 0.05):
+            await socket.send(position(radius_km=0.3))
+            self.assertEqual(len((await socket.event())['results']), 2)
+            await socket.event()  # near
+            self.index = build_index(version=2, blues=(41.9000, -87.6300))
+            nearby = await socket.event()
+        self.assertEqual([item['key'] for item in nearby['results']], ['Architecture:1'])
+        await socket.close()
+
+    @override_settings(MAX_PUSH_CONNECTIONS=0)
+    async def test_connections_over_the_limit_are_turned_away(self):
+        socket = Socket()
+        await socket.send({'type': 'websocket.connect'})
+        self.assertEqual(await socket.receive(), {'type': 'websocket.close', 'code': 1013})
+        await asyncio.wait_for(socket.task, 1)
+
+    async def test_unknown_paths_are_closed(self):
+        socket = Socket('/ws/other/')
+        await socket.send({'type': 'websocket.connect'})
+        self.assertEqual(await socket.receive(), {'type': 'websocket.close', 'code': 1000})
+        await asyncio.wait_for(socket.task, 1)
@@ -0,0 +1,131 @@
+import time
+from unittest import mock
+
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, TestCase
+
+from locations.models import GoogleMapsUsage
+from locations.quota import (
+    BACKGROUND, DEFAULT_QUOTA_SETTINGS, INTERACTIVE, DailyBudget, EndpointQuota, GoogleMapsQuota,
+    QuotaExceeded, quota_day, request_priority,
+)
+
+
+def quota_options(**overrides):
+    return {**DEFAULT_QUOTA_SETTINGS, **overrides}
+
+
+class EndpointQuotaTests(SimpleTestCase):
+
+    def test_zero_rate_is_rejected(self):
+        with self.assertRaises(ImproperlyConfigured):
+            EndpointQuota('distancematrix', 0, None, quota_options())
+
+    def test_bucket_runs_dry_and_asks_for_a_wait(self):
+        quota = EndpointQuota('distancematrix', 2, None, quota_options())
+        now = time.monotonic()
+        self.assertEqual(quota.reserve_token(INTERACTIVE, now), 0.0)
+        self.assertEqual(quota.reserve_token(INTERACTIVE, now), 0.0)
+        self.assertAlmostEqual(quota.reserve_token(INTERACTIVE, now), 0.5, places=2)
+
+    def test_background_calls_leave_the_reserve(self):
+        quota = EndpointQuota('distancematrix', 4, None, quota_options(BACKGROUND_RESERVE=0.5))
+        now = time.monotonic()
+        granted = 0
+        while quota.reserve_token(BACKGROUND, now) == 0.0:
+            granted += 1
+        self.assertEqual(granted, 2)
+        self.assertEqual(quota.reserve_token(INTERACTIVE, now), 0.0)
+
+    def test_daily_budget_is_enforced_and_refunds_the_token(self):
+        quota = EndpointQuota('place/details', 10, 3, quota_options())
+        now = time.monotonic()
+        for _ in range(3):
+            self.assertEqual(quota.reserve_token(INTERACTIVE, now), 0.0)
+        with self.assertRaises(QuotaExceeded):
+            quota.reserve_token(INTERACTIVE, now)
+        self.assertEqual(quota.tokens, 7.0)
+
+    def test_calls_are_charged_their_units(self):
+        quota = EndpointQuota('distancematrix', 100, 1000, quota_options())
+        now = time.monotonic()
+        self.assertEqual(quota.reserve_token(INTERACTIVE, now, 60), 0.0)
+        self.assertEqual((quota.tokens, quota.daily.used), (40.0, 60))
+        self.assertAlmostEqual(quota.reserve_token(INTERACTIVE, now, 50), 0.1, places=2)
+
+    def test_calls_larger_than_the_bucket_wait_for_it_to_fill(self):
+        quota = EndpointQuota('distancematrix', 10, None, quota_options())
+        now = time.monotonic()
+        self.assertEqual(quota.reserve_token(INTERACTIVE, now, 25), 0.0)
+        self.assertEqual(quota.tokens, -15.0)
+        self.assertAlmostEqual(quota.reserve_token(INTERACTIVE, now, 1), 1.6, places=2)
+        self.assertEqual(quota.reserve_token(BACKGROUND, now + 2.5, 25), 0.0)
+
+    def test_backoff_blocks_calls(self):
+        quota = EndpointQuota('directions', 10, None, quota_options())
+        quota.report('OVER_QUERY_LIMIT')
+        self.assertGreater(quota.reserve_token(INTERACTIVE, time.monotonic()), 0.9)
+
+    def test_shed_after_max_wait(self):
+        quotas = GoogleMapsQuota(quota_options(
+            LIMITS={'DEFAULT': {'QPS': 1, 'DAILY': None}}, INTERACTIVE_MAX_WAIT=0.1,
+        ))
+        quotas.acquire('distancematrix')
+        with self.assertRaises(QuotaExceeded):
+            quotas.acquire('distancematrix')
+
+
+class SharedDailyBudgetTests(TestCase):
+
+    def test_processes_lease_blocks_from_one_row(self):
+        first = DailyBudget('distancematrix', 50, shared=True, lease_size=20)
+        second = DailyBudget('distancematrix', 50, shared=True, lease_size=20)
+        self.assertTrue(first.try_take(50))
+        self.assertTrue(second.try_take(50))
+        self.assertEqual(GoogleMapsUsage.objects.get(endpoint='distancematrix', day=quota_day()).used, 40)
+        self.assertEqual((first.leased, second.leased), (19, 19))
+
+        third = DailyBudget('distancematrix', 50, shared=True, lease_size=20)
+        self.assertTrue(third.try_take(50))
+        self.assertEqual(third.leased, 9)
+        self.assertFalse(DailyBudget('distancematrix', 50, shared=True).try_take(50))
+
+    def test_large_calls_lease_what_they_need(self):
+        budget = DailyBudget('distancematrix', 100, shared=True, lease_size=20)
+        self.assertTrue(budget.try_take(100, 15))
+        self.assertTrue(budget.try_take(100, 50))
+        self.assertEqual((budget.leased, budget.used), (0, 65))
+        self.assertFalse(budget.try_take(100, 40))
+        self.assertEqual(GoogleMapsUsage.objects.get(endpoint='distancematrix', day=quota_day()).used, 65)
+
+    def test_row_created_by_another_process_is_reused(self):
+        GoogleMapsUsage.objects.create(endpoint='directions', day=quota_day(), used=45)
+        budget = DailyBudget('directions', 50, shared=True, lease_size=20)
+        self.assertTrue(budget.try_take(50))
+        self.assertEqual(budget.leased, 4)
+        self.assertEqual(GoogleMapsUsage.objects.filter(endpoint='directions').count(), 1)
+
+    def test_background_ceiling(self):
+        quotas = GoogleMapsQuota(quota_options(
+            SHARED=True, LEASE_SIZE=5, BACKGROUND_DAILY_SHARE=0.5,
+            LIMITS={'DEFAULT': {'QPS': 100, 'DAILY': 10}},
+        ))
+        with request_priority(BACKGROUND):
+            for _ in range(5):
+                quotas.acquire('place/details')
+            with self.assertRaises(QuotaExceeded):
+                quotas.acquire('place/details')
+        quotas.acquire('place/details')
+
+    def test_lease_runs_outside_the_bucket_lock(self):
+        quota = EndpointQuota('distancematrix', 10, 100, quota_options(SHARED=True))
+        held = []
+        original = DailyBudget._lease
+
+        def lease(budget, *args):
+            held.append(quota.lock.locked())
+            return original(budget, *args)
+
+        with mock.patch.object(DailyBudget, '_lease', lease):
+            self.assertEqual(quota.reserve_token(INTERACTIVE, time.monotonic()), 0.0)
+        self.assertEqual(held, [False])
@@ -0,0 +1,49 @@
+from unittest import mock
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import SimpleTestCase, override_settings
+
+from locations.models import CachedResponse, Films, Venue
+from locations.routers import ReadReplicaRouter, catalog_connection, use_primary
+
+
+REPLICAS = ['replica1', 'replica2']
+
+
+@override_settings(DATABASE_REPLICAS=REPLICAS)
+class ReadReplicaRouterTests(SimpleTestCase):
+
+    def setUp(self):
+        self.router = ReadReplicaRouter()
+
+    def test_catalog_reads_are_spread_over_the_replicas(self):
+        self.assertEqual({self.router.db_for_read(Films) for _ in range(50)}, set(REPLICAS))
+        self.assertIn(self.router.db_for_read(Venue), REPLICAS)
+        self.assertEqual(self.router.db_for_read(CachedResponse), DEFAULT_DB_ALIAS)
+
+    def test_writes_and_migrations_stay_on_the_primary(self):
+        self.assertEqual(self.router.db_for_write(Films), DEFAULT_DB_ALIAS)
+        self.assertTrue(self.router.allow_migrate(DEFAULT_DB_ALIAS, 'locations'))
+        self.assertFalse(self.router.allow_migrate('replica1', 'locations'))
+
+    def test_use_primary_nests_and_restores(self):
+        with use_primary():
+            with use_primary():
+                self.assertEqual(self.router.db_for_read(Films), DEFAULT_DB_ALIAS)
+            self.assertEqual(self.router.db_for_read(Films), DEFAULT_DB_ALIAS)
+        self.assertIn(self.router.db_for_read(Films), REPLICAS)
+
+    def test_reads_inside_a_primary_transaction_see_its_writes(self):
+        with mock.patch.object(connections[DEFAULT_DB_ALIAS], 'in_atomic_block', True):
+            self.assertEqual(self.router.db_for_read(Films), DEFAULT_DB_ALIAS)
+
+    def test_relations_within_known_databases(self):
+        film, venue, other = Films(), Venue(), Venue()
+        film._state.db, venue._state.db, other._state.db = 'replica1', DEFAULT_DB_ALIAS, 'archive'
+        self.assertTrue(self.router.allow_relation(film, venue))
+        self.assertFalse(self.router.allow_relation(film, other))
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas_everything_uses_the_primary(self):
+        self.assertEqual(self.router.db_for_read(Films), DEFAULT_DB_ALIAS)
+        self.assertIs(catalog_connection(), connections[DEFAULT_DB_ALIAS])
@@ -0,0 +1,103 @@
+import itertools
+import json
+import random
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from locations import catalog, spatial
+from locations.models import Architecture, Films
+from locations.routing import route_cost, solve_exact, solve_orienteering, solve_route, two_opt
+
+
+def random_matrix(size, seed=1):
+    rng = random.Random(seed)
+    points = [(rng.random() * 10, rng.random() * 10) for _ in range(size)]
+    return [[abs(a[0] - b[0]) + abs(a[1] - b[1]) for b in points] for a in points]
+
+
+class RouteSolverTests(SimpleTestCase):
+
+    def test_exact_solver_finds_the_best_order(self):
+        matrix = random_matrix(7)
+        best = min(route_cost(matrix, list(order)) for order in itertools.permutations(range(1, 7)))
+        self.assertAlmostEqual(route_cost(matrix, solve_exact(matrix)), best)
+
+    def test_large_sets_visit_every_stop(self):
+        order, optimal = solve_route(random_matrix(15))
+        self.assertFalse(optimal)
+        self.assertEqual(sorted(order), list(range(1, 15)))
+
+    def test_two_opt_stops_at_the_deadline(self):
+        matrix = random_matrix(30)
+        order = list(range(1, 30))
+        self.assertEqual(two_opt(matrix, order, deadline=time.monotonic() - 1), order)
+
+
+class OrienteeringTests(SimpleTestCase):
+
+    def test_tour_fits_the_budget(self):
+        matrix = random_matrix(25)
+        service = [0] + [1] * 24
+        order, value, total, converged = solve_orienteering(matrix, [0] + [1] * 24, service, 20)
+        self.assertTrue(converged)
+        self.assertLessEqual(total, 20)
+        self.assertAlmostEqual(total, route_cost(matrix, order) + len(order))
+        self.assertEqual(value, len(order))
+
+    def test_prefers_valuable_stops(self):
+        matrix = [[0, 1, 1], [1, 0, 2], [1, 2, 0]]
+        order, value, _, _ = solve_orienteering(matrix, [0, 1, 5], [0, 0, 0], 1.5)
+        self.assertEqual((order, value), ([2], 5))
+
+    def test_past_deadline_returns_the_greedy_tour_quickly(self):
+        matrix = random_matrix(41, seed=3)
+        started = time.perf_counter()
+        order, _, total, converged = solve_orienteering(
+            matrix, [0] + [1] * 40, [0] * 41, 40, deadline=time.monotonic() - 1,
+        )
+        self.assertLess(time.perf_counter() - started, 0.1)
+        self.assertFalse(converged)
+        self.assertTrue(order)
+        self.assertLessEqual(total, 40)
+
+
+@override_settings(CATALOG_VERSION_POLL_SECONDS=0)
+@mock.patch.dict('os.environ', {'GOOGLE_MAPS_API_KEY': ''})
+class RouteViewTests(TestCase):
+
+    def setUp(self):
+        catalog._version = None
+        spatial._index = None
+        self.far = Architecture.objects.create(name='Far', latitude=41.900, longitude=-87.630, fact='')
+        self.near = Films.objects.create(name='Near', latitude=41.881, longitude=-87.630, fact='')
+        self.middle = Architecture.objects.create(name='Middle', latitude=41.890, longitude=-87.630, fact='')
+
+    def tearDown(self):
+        catalog._version = None
+        spatial._index = None
+
+    def post(self, body):
+        return self.client.post('/api/route/', json.dumps(body), content_type='application/json')
+
+    def test_stops_are_visited_in_order_of_the_walk(self):
+        response = self.post({
+            'origin': {'latitude': 41.880, 'longitude': -87.630},
+            'stops': [{'location_type': 'Architecture', 'id': self.far.id},
+                      {'location_type': 'Films', 'id': self.near.id},
+                      {'location_type': 'Architecture', 'id': self.middle.id}],
+        })
+        self.assertEqual(response.status_code, 200)
+        plan = response.json()
+        self.assertEqual([stop['location_name'] for stop in plan['stops']], ['Near', 'Middle', 'Far'])
+        self.assertTrue(plan['optimal'])
+        self.assertEqual(plan['estimated_legs'], 12)
+
+    def test_unknown_stops_are_rejected(self):
+        response = self.post({
+            'origin': {'latitude': 41.880, 'longitude': -87.630},
+            'stops': [{'location_type': 'Films', 'id': 999}],
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.post({'origin': {'latitude': 41.88, 'longitude': -87.63}, 'stops': []}).status_code, 400)
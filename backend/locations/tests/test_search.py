@@ -0,0 +1,59 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+
+from locations.checks import check_search_triggers
+from locations.models import Films, History
+from locations.search import missing_sqlite_search_triggers, search_locations
+
+
+class SearchIndexTests(TestCase):
+
+    def setUp(self):
+        Films.objects.create(name='The Blues Brothers', latitude=41.88, longitude=-87.63, fact='Car chase')
+        History.objects.create(name='Haymarket Memorial', latitude=41.884, longitude=-87.644, fact='Labor history')
+
+    def names(self, query, **kwargs):
+        return [row['name'] for row in search_locations(query, **kwargs)]
+
+    def test_prefix_search_and_type_filter(self):
+        self.assertEqual(self.names('blu'), ['The Blues Brothers'])
+        self.assertEqual(self.names('hay', location_type='Films'), [])
+
+    def test_triggers_follow_inserts_updates_and_bulk_writes(self):
+        film = Films.objects.get()
+        film.name = 'Ferris Bueller'
+        film.save()
+        self.assertEqual(self.names('blues'), [])
+        self.assertEqual(self.names('ferris'), ['Ferris Bueller'])
+        Films.objects.bulk_create([Films(name='Wayne World', latitude=41.9, longitude=-87.6, fact='')])
+        self.assertEqual(self.names('wayne'), ['Wayne World'])
+        Films.objects.filter(name='Wayne World').delete()
+        self.assertEqual(self.names('wayne'), [])
+
+    def test_name_matches_outrank_fact_matches(self):
+        Films.objects.create(name='Labor Day', latitude=41.8, longitude=-87.6, fact='')
+        self.assertEqual(self.names('labor'), ['Labor Day', 'Haymarket Memorial'])
+
+    def test_near_me_search_orders_by_distance(self):
+        results = search_locations('b', latitude=41.88, longitude=-87.63, radius_km=5)
+        self.assertEqual([row['name'] for row in results], ['The Blues Brothers'])
+        self.assertEqual(results[0]['distance_km'], 0.0)
+
+    def test_missing_triggers_are_reported_and_rebuilt(self):
+        self.assertEqual(missing_sqlite_search_triggers(connection), [])
+        self.assertEqual(check_search_triggers(None, databases=['default']), [])
+        with connection.cursor() as cursor:
+            cursor.execute("DROP TRIGGER locations_films_search_insert")
+        Films.objects.create(name='Public Enemies', latitude=41.92, longitude=-87.65, fact='')
+        self.assertEqual(self.names('public'), [])
+        self.assertEqual([warning.id for warning in check_search_triggers(None, databases=['default'])],
+                         ['locations.W001'])
+
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(missing_sqlite_search_triggers(connection), [])
+        self.assertEqual(self.names('public'), ['Public Enemies'])
+        Films.objects.create(name='Road to Perdition', latitude=41.9, longitude=-87.6, fact='')
+        self.assertEqual(self.names('perdition'), ['Road to Perdition'])
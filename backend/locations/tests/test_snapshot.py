@@ -0,0 +1,91 @@
+import gzip
+import json
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from locations import catalog, snapshot
+from locations.models import Films, Music
+from locations.snapshot import choose_encoding, get_catalog_snapshot
+
+
+class ChooseEncodingTests(SimpleTestCase):
+
+    def test_preference_and_quality_values(self):
+        available = {'identity', 'gzip', 'br'}
+        self.assertEqual(choose_encoding('gzip, deflate, br', available), 'br')
+        self.assertEqual(choose_encoding('gzip, br;q=0', available), 'gzip')
+        self.assertEqual(choose_encoding('*', available), 'br')
+        self.assertEqual(choose_encoding('br', {'identity', 'gzip'}), 'identity')
+        self.assertEqual(choose_encoding('gzip;q=bogus', available), 'identity')
+        self.assertEqual(choose_encoding(None, available), 'identity')
+
+
+@override_settings(CATALOG_VERSION_POLL_SECONDS=0)
+class CatalogSnapshotViewTests(TestCase):
+
+    def setUp(self):
+        catalog._version = None
+        snapshot._snapshot = None
+        cache.clear()
+        Films.objects.create(name='Blues Brothers', latitude=41.88, longitude=-87.63, fact='long fact')
+
+    def tearDown(self):
+        catalog._version = None
+        snapshot._snapshot = None
+        cache.clear()
+
+    def get(self, params=None, **headers):
+        return self.client.get('/api/catalog/', params, headers=headers)
+
+    def test_codings_share_the_json_and_have_their_own_tags(self):
+        plain = self.get()
+        payload = json.loads(plain.content)
+        self.assertEqual([(row['name'], row['fact']) for row in payload['locations']], [('Blues Brothers', 'long fact')])
+        self.assertEqual(plain['X-Catalog-Version'], str(payload['version']))
+        self.assertEqual(plain['Cache-Control'], 'public, no-cache')
+
+        gzipped = self.get(accept_encoding='gzip')
+        self.assertEqual(gzipped['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(gzipped.content), plain.content)
+        self.assertEqual(gzipped['ETag'], plain['ETag'][:-1] + '-gzip"')
+        self.assertEqual(gzipped['Vary'], 'Accept-Encoding')
+
+    def test_brotli_variant_when_available(self):
+        fake_brotli = mock.Mock(compress=lambda body, quality: b'br:' + body)
+        with mock.patch.object(snapshot, 'brotli', fake_brotli):
+            response = self.get(accept_encoding='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertTrue(response.content.startswith(b'br:{'))
+        self.assertTrue(response['ETag'].endswith('-br"'))
+
+    def test_any_current_tag_revalidates(self):
+        etag = self.get()['ETag']
+        gzip_etag = self.get(accept_encoding='gzip')['ETag']
+        for header in (etag, gzip_etag, f"W/{etag}", f'"other", {gzip_etag}', '*'):
+            response = self.get(if_none_match=header, accept_encoding='gzip')
+            self.assertEqual(response.status_code, 304, header)
+            self.assertEqual(response['ETag'], gzip_etag)
+        self.assertEqual(self.get(if_none_match='"stale"').status_code, 200)
+
+    def test_writes_change_the_version_and_the_tag(self):
+        first = self.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            Music.objects.create(name='Green Mill', latitude=41.969, longitude=-87.66, fact='')
+        second = self.get(if_none_match=first['ETag'])
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(int(second['X-Catalog-Version']), int(first['X-Catalog-Version']) + 1)
+        self.assertEqual(len(json.loads(second.content)['locations']), 2)
+
+    def test_versioned_requests_are_cached_for_good(self):
+        version = self.get()['X-Catalog-Version']
+        self.assertIn('immutable', self.get({'v': version})['Cache-Control'])
+        self.assertEqual(self.get({'v': 'old'})['Cache-Control'], 'public, no-cache')
+
+    def test_other_workers_reuse_the_shared_snapshot(self):
+        built = get_catalog_snapshot()
+        snapshot._snapshot = None
+        with mock.patch.object(snapshot, 'build_catalog_snapshot') as build:
+            self.assertEqual(get_catalog_snapshot(), built)
+        build.assert_not_called()
@@ -0,0 +1,96 @@
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from locations import catalog, spatial
+from locations.models import Films, Music
+from locations.spatial import SpatialIndex
+
+
+def names(locations):
+    return [location.name for location in locations]
+
+
+class SpatialIndexTests(SimpleTestCase):
+
+    def setUp(self):
+        self.index = SpatialIndex()
+        self.index.upsert('Films', 1, 'Blues Brothers', 41.880, -87.630)
+        self.index.upsert('Architecture', 1, 'Rookery', 41.879, -87.632)
+        self.index.upsert('Music', 1, 'Green Mill', 41.969, -87.660)
+
+    def test_nearest_orders_by_distance_and_filters(self):
+        self.assertEqual(names(self.index.nearest(41.880, -87.630, k=2)), ['Blues Brothers', 'Rookery'])
+        self.assertEqual(names(self.index.nearest(41.880, -87.630, location_types=['Music'])), ['Green Mill'])
+        self.assertEqual(names(self.index.nearest(41.880, -87.630, max_distance_km=1)), ['Blues Brothers', 'Rookery'])
+
+    def test_upsert_moves_an_indexed_location(self):
+        self.index.upsert('Films', 1, 'Blues Brothers', 41.968, -87.659)
+        self.assertEqual(len(self.index), 3)
+        self.assertEqual(names(self.index.within_radius(41.969, -87.660, 0.5)), ['Green Mill', 'Blues Brothers'])
+        self.assertEqual(names(self.index.within_radius(41.880, -87.630, 0.5)), ['Rookery'])
+        self.assertEqual(self.index.get('Films', 1).latitude, 41.968)
+
+    def test_upsert_renames_and_relinks(self):
+        self.index.venue_points[7] = (41.8795, -87.631)
+        self.index.upsert('Films', 1, 'The Blues Brothers', 41.880, -87.630, venue_id=7)
+        location = self.index.get('Films', 1)
+        self.assertEqual((location.name, location.venue_id), ('The Blues Brothers', 7))
+        self.assertEqual(self.index.routing_point(location), (41.8795, -87.631))
+
+    def test_remove_frees_the_slot_for_reuse(self):
+        self.index.remove('Architecture', 1)
+        self.index.remove('Architecture', 1)
+        self.assertIsNone(self.index.get('Architecture', 1))
+        self.assertEqual(len(self.index), 2)
+        self.assertEqual(names(self.index.within_bbox(41.87, -87.64, 41.89, -87.62)), ['Blues Brothers'])
+
+        self.index.upsert('History', 3, 'Water Tower', 41.897, -87.624)
+        self.assertEqual(len(self.index.ids), 3)
+        self.assertEqual(names(self.index.nearest(41.897, -87.624, k=1)), ['Water Tower'])
+
+    def test_search_bounds_follow_inserts_moves_and_removes(self):
+        index = SpatialIndex(cell_size=1)
+        index.upsert('Films', 1, 'a', 0.5, 0.5)
+        index.upsert('Films', 2, 'b', 5.5, 0.5)
+        self.assertEqual(index._max_ring(0, 0), 5)
+        index.upsert('Films', 2, 'b', 2.5, 0.5)
+        self.assertEqual(index._max_ring(0, 0), 2)
+        index.upsert('Films', 3, 'c', 0.5, -3.5)
+        self.assertEqual(index._max_ring(0, 0), 4)
+        index.remove('Films', 3)
+        index.remove('Films', 1)
+        self.assertEqual(index._max_ring(0, 0), 2)
+        self.assertEqual(names(index.nearest(0.5, -3.5)), ['b'])
+        index.remove('Films', 2)
+        index.upsert('Films', 4, 'd', 0.5, 7.5)
+        self.assertEqual(index._max_ring(0, 0), 7)
+
+    def test_empty_index(self):
+        self.assertEqual(SpatialIndex().nearest(41.88, -87.63), [])
+
+
+@override_settings(CATALOG_VERSION_POLL_SECONDS=0)
+class SpatialIndexSignalTests(TestCase):
+
+    def setUp(self):
+        catalog._version = None
+        spatial._index = None
+        self.film = Films.objects.create(name='Blues Brothers', latitude=41.88, longitude=-87.63, fact='')
+
+    def tearDown(self):
+        catalog._version = None
+        spatial._index = None
+
+    def test_saves_and_deletes_update_the_loaded_index_in_place(self):
+        index = spatial.get_spatial_index()
+        with self.captureOnCommitCallbacks(execute=True):
+            music = Music.objects.create(name='Green Mill', latitude=41.969, longitude=-87.66, fact='')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.film.latitude = 41.97
+            self.film.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            music.delete()
+
+        self.assertIs(spatial.get_spatial_index(), index)
+        self.assertEqual(index.version, catalog.get_catalog_version())
+        self.assertEqual(len(index), 1)
+        self.assertEqual(index.get('Films', self.film.id).latitude, 41.97)
@@ -0,0 +1,148 @@
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.http import Http404
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.utils.http import http_date
+
+from locations import staticfiles
+from locations.staticfiles import (
+    ENCODING_SUFFIXES, IMMUTABLE_MAX_AGE, CompressedStaticFilesStorage, available_codings, serve_static, spa_index,
+)
+
+
+SCRIPT = b'function hello() { return "hello world"; }\n' * 50
+
+
+class CompressTests(SimpleTestCase):
+
+    def setUp(self):
+        self.root = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.root)
+        self.storage = CompressedStaticFilesStorage(location=str(self.root))
+        (self.root / 'app.js').write_bytes(SCRIPT)
+        (self.root / 'tiny.css').write_bytes(b'body{margin:0}')
+        (self.root / 'logo.png').write_bytes(SCRIPT)
+
+    def collect(self):
+        paths = {name: (self.storage, name) for name in ('app.js', 'tiny.css', 'logo.png')}
+        with mock.patch.object(staticfiles, 'compress_bytes', wraps=staticfiles.compress_bytes) as compress:
+            processed = [(name, compressed) for name, compressed, _ in self.storage.post_process(paths)]
+        return processed, [call.args[1] for call in compress.call_args_list]
+
+    def test_variants_are_written_for_compressible_files(self):
+        processed, _ = self.collect()
+        self.assertEqual(processed, [('app.js', f"app.js{ENCODING_SUFFIXES[coding]}") for coding in available_codings()])
+        self.assertEqual(sorted(path.name for path in self.root.iterdir()),
+                         sorted(['app.js', 'logo.png', 'tiny.css'] + [name for _, name in processed]))
+
+    def test_up_to_date_variants_are_not_compressed_again(self):
+        self.collect()
+        self.assertEqual(self.collect(), ([], []))
+
+        (self.root / 'app.js.gz').unlink()
+        processed, compressed = self.collect()
+        self.assertEqual((processed, compressed), ([('app.js', 'app.js.gz')], [['gzip']]))
+
+        # A changed source file gets every variant again
+        later = (self.root / 'app.js.gz').stat().st_mtime + 10
+        os.utime(self.root / 'app.js', (later, later))
+        _, compressed = self.collect()
+        self.assertEqual(compressed, [available_codings()])
+
+
+class ServeStaticTests(SimpleTestCase):
+
+    def setUp(self):
+        self.root = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.root)
+        (self.root / 'js').mkdir()
+        (self.root / 'js' / 'main.3f2a9c1b.js').write_bytes(SCRIPT)
+        (self.root / 'js' / 'main.3f2a9c1b.js.gz').write_bytes(b'gzip body')
+        (self.root / 'js' / 'main.3f2a9c1b.js.br').write_bytes(b'br body')
+        (self.root / 'robots.txt').write_bytes(b'User-agent: *\n')
+        settings = override_settings(STATIC_ROOT=str(self.root))
+        settings.enable()
+        self.addCleanup(settings.disable)
+        staticfiles._static_file.cache_clear()
+        self.addCleanup(staticfiles._static_file.cache_clear)
+
+    def get(self, path, **headers):
+        return serve_static(RequestFactory().get(f"/static/{path}", headers=headers), path)
+
+    def body(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_best_accepted_variant_is_served(self):
+        for accept, coding, body in (
+            ('gzip, deflate, br', 'br', b'br body'),
+            ('gzip, br;q=0', 'gzip', b'gzip body'),
+            ('', None, SCRIPT),
+        ):
+            response = self.get('js/main.3f2a9c1b.js', accept_encoding=accept)
+            self.assertEqual(response.get('Content-Encoding'), coding, accept)
+            self.assertEqual(self.body(response), body)
+            self.assertEqual(response['Content-Length'], str(len(body)))
+            self.assertIn('javascript', response['Content-Type'])
+            self.assertEqual(response['Vary'], 'Accept-Encoding')
+
+    def test_cache_lifetimes(self):
+        hashed = self.get('js/main.3f2a9c1b.js')
+        self.assertEqual(hashed['Cache-Control'], f"public, max-age={IMMUTABLE_MAX_AGE}, immutable")
+        plain = self.get('robots.txt', accept_encoding='gzip')
+        self.assertNotIn('Content-Encoding', plain)
+        self.assertEqual(plain['Cache-Control'], f"public, max-age={staticfiles.STATIC_MAX_AGE}")
+
+    def test_unmodified_files_revalidate(self):
+        modified = (self.root / 'robots.txt').stat().st_mtime
+        response = self.get('robots.txt', if_modified_since=http_date(modified + 1))
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['Last-Modified'], http_date(modified))
+
+    def test_missing_and_escaping_paths(self):
+        for path in ('missing.js', '../secrets.txt', 'js'):
+            with self.assertRaises(Http404):
+                self.get(path)
+
+
+class SpaIndexTests(SimpleTestCase):
+
+    def setUp(self):
+        root = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, root)
+        self.index = root / 'index.html'
+        self.index.write_bytes(b'<!doctype html><div id="root"></div>' * 20)
+        settings = override_settings(STATIC_INDEX_FILE=self.index)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.addCleanup(staticfiles._index_pages.clear)
+
+    def get(self, **headers):
+        return spa_index(RequestFactory().get('/', headers=headers))
+
+    def test_compressed_variants_have_their_own_etags(self):
+        plain = self.get()
+        gzipped = self.get(accept_encoding='gzip')
+        self.assertEqual(plain.content, self.index.read_bytes())
+        self.assertEqual(gzipped['Content-Encoding'], 'gzip')
+        self.assertEqual(gzipped['ETag'], plain['ETag'][:-1] + '-gzip"')
+        # Any variant's tag revalidates, whichever coding is asked for now
+        self.assertEqual(self.get(if_none_match=gzipped['ETag']).status_code, 304)
+        self.assertEqual(self.get(if_none_match='"stale"').status_code, 200)
+
+    def test_changes_are_picked_up(self):
+        etag = self.get()['ETag']
+        self.index.write_bytes(b'<!doctype html><p>new build</p>')
+        later = self.index.stat().st_mtime + 10
+        os.utime(self.index, (later, later))
+        response = self.get(if_none_match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b'<!doctype html><p>new build</p>')
+
+    def test_missing_build(self):
+        self.index.unlink()
+        with self.assertRaises(Http404):
+            self.get()
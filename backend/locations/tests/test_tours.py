@@ -0,0 +1,49 @@
+import time
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+from locations import catalog, spatial
+from locations.models import Architecture, Films, Music
+from locations.tours import recommend_tour
+
+
+def slow_travel_time_matrix(origins, destinations, mode='walking'):
+    time.sleep(1)
+    return [[1.0] * len(destinations)], [[0.1] * len(destinations)], 0
+
+
+@override_settings(CATALOG_VERSION_POLL_SECONDS=0)
+@mock.patch.dict('os.environ', {'GOOGLE_MAPS_API_KEY': ''})
+class TourTests(TestCase):
+
+    def setUp(self):
+        catalog._version = None
+        spatial._index = None
+        for number in range(12):
+            Architecture.objects.create(name=f"Building {number}", latitude=41.88 + number * 0.001,
+                                        longitude=-87.63, fact='')
+            Films.objects.create(name=f"Film {number}", latitude=41.88, longitude=-87.63 + number * 0.001, fact='')
+        Music.objects.create(name='Far away', latitude=42.5, longitude=-88.5, fact='')
+        catalog.bump_catalog_version()
+
+    def tearDown(self):
+        catalog._version = None
+        spatial._index = None
+
+    def test_tour_fits_the_time_and_preferences(self):
+        tour = recommend_tour(41.88, -87.63, 60, {'Architecture': 2, 'Films': 1}, time_budget_ms=1000)
+        self.assertTrue(tour['stops'])
+        self.assertLessEqual(tour['total_duration_min'], 60)
+        self.assertEqual({stop['location_type'] for stop in tour['stops']} - {'Architecture', 'Films'}, set())
+        for stop in tour['stops']:
+            self.assertLessEqual(stop['departure_min'], 60.05)
+
+    def test_slow_origin_legs_fall_back_to_estimates_within_budget(self):
+        with mock.patch('locations.tours.get_travel_time_matrix', slow_travel_time_matrix):
+            started = time.monotonic()
+            tour = recommend_tour(41.88, -87.63, 60, {'Architecture': 1}, time_budget_ms=200)
+            elapsed = time.monotonic() - started
+        self.assertLess(elapsed, 0.5)
+        self.assertTrue(tour['stops'])
+        self.assertGreaterEqual(tour['estimated_legs'], tour['candidates'])
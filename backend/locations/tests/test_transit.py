@@ -0,0 +1,193 @@
+import shutil
+import tempfile
+import zipfile
+from datetime import datetime
+from pathlib import Path
+from unittest import mock
+from zoneinfo import ZoneInfo
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from asgiref.sync import async_to_sync
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from locations import transit
+from locations.api import get_best_commute_options, get_distance_matrix, get_route
+from locations.async_api import aget_best_commute_options, aget_distance_matrix
+from locations.transit import (
+    TransitTimetable, compiled_timetable_path, get_transit_timetable, transit_elements, transit_route,
+)
+
+
+# Two lines crossing at C/D: Red (A-B-C, weekdays and weekends) and the 20 (D-E-F, weekdays)
+FEED = Path(__file__).parent / 'fixtures' / 'gtfs'
+CHICAGO = ZoneInfo('America/Chicago')
+
+ORIGIN = (41.8800, -87.6505)     # just west of A
+NEAR_C = (41.8801, -87.6301)
+NEAR_F = (41.9001, -87.6300)
+SYDNEY = (-33.8600, 151.2000)
+
+TUESDAY = datetime(2026, 10, 20, 7, 55, tzinfo=CHICAGO)
+# Weekday service is cancelled on this Monday in calendar_dates.txt
+CANCELLED_MONDAY = datetime(2026, 10, 19, 7, 55, tzinfo=CHICAGO)
+SATURDAY = datetime(2026, 10, 24, 8, 55, tzinfo=CHICAGO)
+
+
+class RaptorTests(SimpleTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.timetable = TransitTimetable.from_gtfs(FEED)
+
+    def test_station_entrances_are_not_stops(self):
+        self.assertEqual(sorted(self.timetable.stop_ids), ['A', 'B', 'C', 'D', 'E', 'F'])
+
+    def test_route_with_a_transfer(self):
+        search = self.timetable.search(*ORIGIN, TUESDAY)
+        seconds, km, via = search.arrival_at(*NEAR_F)
+        # Walk to A for the 08:00 Red, walk C to D for the 08:10 20, arrive at F 08:18
+        self.assertEqual([name for name, stops in search.legs(via)], ['walk', 'Red', 'walk', '20'])
+        self.assertLess(seconds, 24 * 60)
+        self.assertGreater(seconds, 23 * 60)
+
+    def test_blank_stop_times_are_interpolated(self):
+        search = self.timetable.search(*ORIGIN, TUESDAY)
+        stop = self.timetable.stop_ids.index('B')
+        latitude, longitude = self.timetable.stop_latitudes[stop], self.timetable.stop_longitudes[stop]
+        seconds, km, via = search.arrival_at(latitude, longitude)
+        # t1 leaves A at 08:00 and reaches C at 08:06, so B is timed 08:03
+        self.assertEqual(seconds, 8 * 60)
+
+    def test_walking_wins_when_service_is_removed(self):
+        [[transit_ride]] = transit_elements(self.timetable, [ORIGIN], [NEAR_F], TUESDAY)
+        [[walk]] = transit_elements(self.timetable, [ORIGIN], [NEAR_F], CANCELLED_MONDAY)
+        self.assertEqual(walk['status'], 'OK')
+        self.assertLess(transit_ride['duration']['value'], 24 * 60)
+        self.assertGreater(walk['duration']['value'], 40 * 60)
+        self.assertEqual(transit_route(self.timetable, ORIGIN, NEAR_F, CANCELLED_MONDAY)['steps'], 1)
+
+    def test_weekend_service(self):
+        search = self.timetable.search(*ORIGIN, SATURDAY)
+        seconds, km, via = search.arrival_at(*NEAR_C)
+        # Only t3 runs, leaving A at 09:00
+        self.assertEqual([name for name, stops in search.legs(via)][:2], ['walk', 'Red'])
+        self.assertLess(seconds, 12 * 60)
+
+    def test_trip_after_midnight_belongs_to_the_previous_service_day(self):
+        departure = datetime(2026, 10, 21, 0, 25, tzinfo=CHICAGO)
+        [[element]] = transit_elements(self.timetable, [ORIGIN], [NEAR_C], departure)
+        # The 24:30 trip of Tuesday's service
+        self.assertLess(element['duration']['value'], 12 * 60)
+        self.assertEqual(transit_route(self.timetable, ORIGIN, NEAR_C, departure)['steps'], 3)
+
+    def test_unreachable_destination(self):
+        [[reachable, unreachable]] = transit_elements(self.timetable, [ORIGIN], [NEAR_C, SYDNEY], TUESDAY)
+        self.assertEqual(reachable['status'], 'OK')
+        self.assertEqual(unreachable, {'status': 'ZERO_RESULTS'})
+        self.assertEqual(transit_route(self.timetable, ORIGIN, SYDNEY, TUESDAY), {})
+
+    def test_route_has_steps_and_polyline(self):
+        route = transit_route(self.timetable, ORIGIN, NEAR_F, TUESDAY)
+        self.assertEqual(route['steps'], 5)
+        self.assertTrue(route['polyline'])
+        self.assertAlmostEqual(route['duration_min'], 23.18, places=1)
+
+    def test_zipped_feed(self):
+        with tempfile.TemporaryDirectory() as directory:
+            archive = Path(directory) / 'feed.zip'
+            with zipfile.ZipFile(archive, 'w') as feed:
+                for path in FEED.iterdir():
+                    feed.write(path, path.name)
+            timetable = TransitTimetable.from_gtfs(archive)
+        self.assertEqual(
+            transit_elements(timetable, [ORIGIN], [NEAR_F], TUESDAY),
+            transit_elements(self.timetable, [ORIGIN], [NEAR_F], TUESDAY),
+        )
+
+    def test_saved_timetable_routes_the_same(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'feed.timetable'
+            self.timetable.save(path)
+            loaded = TransitTimetable.load(path)
+        self.assertEqual(
+            transit_elements(loaded, [ORIGIN], [NEAR_C, NEAR_F], TUESDAY),
+            transit_elements(self.timetable, [ORIGIN], [NEAR_C, NEAR_F], TUESDAY),
+        )
+
+
+class CompiledTimetableTests(SimpleTestCase):
+
+    def setUp(self):
+        transit._timetable = None
+        self.directory = tempfile.mkdtemp()
+        self.feed = Path(self.directory) / 'gtfs'
+        shutil.copytree(FEED, self.feed)
+
+    def tearDown(self):
+        transit._timetable = None
+        shutil.rmtree(self.directory)
+
+    def test_requests_only_load_the_compiled_timetable(self):
+        with override_settings(TRANSIT_BACKEND='gtfs', GTFS_FEED_PATH=str(self.feed)), \
+                mock.patch.object(transit, 'TIMETABLE_RELOAD_INTERVAL', 0), \
+                mock.patch.object(TransitTimetable, 'from_gtfs', wraps=TransitTimetable.from_gtfs) as from_gtfs:
+            self.assertIsNone(get_transit_timetable())
+            self.assertEqual(from_gtfs.call_count, 0)
+
+            call_command('build_transit_timetable', stdout=mock.MagicMock())
+            self.assertTrue(compiled_timetable_path(self.feed).exists())
+            self.assertEqual(from_gtfs.call_count, 1)
+
+            timetable = get_transit_timetable()
+            self.assertIsNotNone(timetable)
+            self.assertIs(get_transit_timetable(), timetable)
+            self.assertEqual(from_gtfs.call_count, 1)
+
+    def test_google_backend_loads_nothing(self):
+        call_command('build_transit_timetable', feed=str(self.feed), stdout=mock.MagicMock())
+        with override_settings(TRANSIT_BACKEND='google', GTFS_FEED_PATH=str(self.feed)):
+            self.assertIsNone(get_transit_timetable())
+
+    def test_missing_feed(self):
+        with self.assertRaises(CommandError):
+            call_command('build_transit_timetable', feed=str(self.feed / 'missing'))
+
+
+@mock.patch.dict('os.environ', {'GOOGLE_MAPS_API_KEY': ''})
+class OfflineTransitTests(TestCase):
+    """Without a Google key the local router still answers transit."""
+
+    def setUp(self):
+        transit._timetable = None
+        self.directory = tempfile.mkdtemp()
+        feed = Path(self.directory) / 'gtfs'
+        shutil.copytree(FEED, feed)
+        call_command('build_transit_timetable', feed=str(feed), stdout=mock.MagicMock())
+        self.settings = override_settings(TRANSIT_BACKEND='gtfs', GTFS_FEED_PATH=str(feed))
+        self.settings.enable()
+
+    def tearDown(self):
+        self.settings.disable()
+        transit._timetable = None
+        shutil.rmtree(self.directory)
+
+    def test_distance_matrix_serves_local_transit(self):
+        for results in (get_distance_matrix(*ORIGIN, [NEAR_C, SYDNEY]),
+                        async_to_sync(aget_distance_matrix)(*ORIGIN, [NEAR_C, SYDNEY])):
+            self.assertEqual([result['travel_mode'] for result in results], ['transit'])
+
+    def test_commute_serves_local_transit(self):
+        for options in (get_best_commute_options(*ORIGIN, *NEAR_C),
+                        async_to_sync(aget_best_commute_options)(*ORIGIN, *NEAR_C)):
+            self.assertEqual(options['best_commute_mode'], 'transit')
+            self.assertEqual(list(options['all_options']), ['transit'])
+        self.assertTrue(get_route(*ORIGIN, *NEAR_C, 'transit')['polyline'])
+        self.assertEqual(get_route(*ORIGIN, *NEAR_C, 'walking'), {})
+
+    def test_google_backend_without_a_key_answers_nothing(self):
+        with override_settings(TRANSIT_BACKEND='google'):
+            self.assertEqual(get_distance_matrix(*ORIGIN, [NEAR_C]), [])
+            self.assertEqual(get_best_commute_options(*ORIGIN, *NEAR_C), {})
+            self.assertEqual(async_to_sync(aget_best_commute_options)(*ORIGIN, *NEAR_C), {})
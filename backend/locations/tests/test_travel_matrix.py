@@ -0,0 +1,75 @@
+import math
+import sys
+import tempfile
+from pathlib import Path
+
+from django.test import SimpleTestCase
+
+from locations.travel_matrix import TravelMatrix, TravelMatrixBuilder, read_index, write_index
+
+
+def element(seconds, metres):
+    return {'duration': {'value': seconds}, 'distance': {'value': metres}}
+
+
+class TravelMatrixTests(SimpleTestCase):
+
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.directory = Path(self._directory.name)
+        self.points = {'Films:1': (41.88, -87.63), 'Music:2': (41.89, -87.62), 'venue:3': (41.87, -87.61)}
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def build(self, points):
+        builder = TravelMatrixBuilder(self.directory, points)
+        missing = builder.missing('walking')
+        for origin, destinations in missing.items():
+            builder.store('walking', [origin], destinations,
+                          [[element(600 * (origin + 1), 1000 * (origin + 1)) for _ in destinations]])
+        builder.save('walking', complete=True)
+        builder.close()
+        return builder, missing
+
+    def test_builds_only_missing_cells_and_serves_legs(self):
+        _, missing = self.build(self.points)
+        self.assertEqual(sum(len(row) for row in missing.values()), 6)
+        _, missing = self.build(self.points)
+        self.assertEqual(missing, {})
+
+        matrix = TravelMatrix(self.directory, 'walking')
+        minutes, km = matrix.legs(['Films:1', 'venue:3'], [self.points['Films:1'], self.points['venue:3']])
+        self.assertEqual(minutes, [[0.0, 10.0], [30.0, 0.0]])
+        self.assertEqual(km, [[0.0, 1.0], [3.0, 0.0]])
+        self.assertIsNone(matrix.legs(['Films:1', 'Music:9'], [self.points['Films:1'], (41.0, -87.0)]))
+
+    def test_new_pois_only_add_their_row_and_column(self):
+        self.build(self.points)
+        _, missing = self.build({**self.points, 'History:4': (41.86, -87.6)})
+        self.assertEqual(sum(len(row) for row in missing.values()), 6)
+
+    def test_moved_poi_is_missing_until_rebuilt(self):
+        self.build(self.points)
+        moved = {**self.points, 'Music:2': (41.90, -87.62)}
+        matrix = TravelMatrix(self.directory, 'walking')
+        self.assertTrue(matrix.covers('Films:1', self.points['Films:1']))
+        self.assertFalse(matrix.covers('Music:2', moved['Music:2']))
+        self.assertIsNone(matrix.legs(list(moved), list(moved.values())))
+
+        builder, missing = self.build(moved)
+        self.assertEqual(builder.moved, [builder.slots['Music:2']])
+        # The moved POI's row and its column in the other rows
+        self.assertEqual(sum(len(row) for row in missing.values()), 4)
+        matrix = TravelMatrix(self.directory, 'walking')
+        minutes, _ = matrix.legs(list(moved), list(moved.values()))
+        self.assertFalse(any(math.isnan(value) for row in minutes for value in row))
+
+    def test_other_byte_order_is_rejected(self):
+        self.build(self.points)
+        index = read_index(self.directory)
+        index['byteorder'] = 'big' if sys.byteorder == 'little' else 'little'
+        write_index(self.directory, index)
+        self.assertFalse(TravelMatrix(self.directory, 'walking').available)
+        with self.assertRaises(ValueError):
+            TravelMatrixBuilder(self.directory, self.points)
@@ -0,0 +1,106 @@
+import math
+
+from django.test import SimpleTestCase, TestCase
+
+from locations.models import Architecture, Films, History, Venue
+from locations.venues import METRES_PER_DEGREE, VENUE_MAX_DISTANCE_M, cluster_locations, link_venues, name_similarity
+
+
+def row(name, latitude, longitude):
+    return {'name': name, 'latitude': latitude, 'longitude': longitude}
+
+
+class NameSimilarityTests(SimpleTestCase):
+
+    def test_spelling_and_stopwords_do_not_matter(self):
+        self.assertGreaterEqual(name_similarity('Chicago Theatre', 'The Chicago Theater'), 0.6)
+        self.assertEqual(name_similarity('Pritzker Pavilion', 'Jay Pritzker Pavilion'), 1.0)
+        self.assertEqual(name_similarity('Café Brauer', 'Cafe Brauer'), 1.0)
+
+    def test_different_names(self):
+        self.assertLess(name_similarity('Rookery Building', 'Green Mill'), 0.6)
+        self.assertEqual(name_similarity('The', 'Chicago'), 0.0)
+
+
+class ClusterTests(SimpleTestCase):
+
+    def test_near_entries_with_similar_names_cluster(self):
+        rows = [
+            row('Chicago Cultural Center', 41.88370, -87.62480),
+            row('Cultural Center', 41.88375, -87.62470),
+            row('Chicago Cultural Center', 41.88360, -87.62490),
+            row('Rookery', 41.87910, -87.63190),
+        ]
+        clusters = sorted(cluster_locations(rows), key=len)
+        self.assertEqual([len(cluster) for cluster in clusters], [1, 3])
+        self.assertEqual(clusters[0][0]['name'], 'Rookery')
+
+    def test_same_spot_needs_only_a_shared_word(self):
+        rows = [row('Wrigley Field', 41.94840, -87.65560), row('Cubs at Wrigley', 41.94845, -87.65555)]
+        self.assertEqual(len(cluster_locations(rows)), 1)
+
+    def test_east_west_neighbours_are_compared_wherever_they_fall_on_the_grid(self):
+        # 70 m east-west at Chicago's latitude spans more than one longitude cell
+        apart = 70 / (METRES_PER_DEGREE * math.cos(math.radians(41.88)))
+        cell = VENUE_MAX_DISTANCE_M / METRES_PER_DEGREE
+        for step in range(20):
+            west = -87.63 + cell * step / 20
+            rows = [row('Water Tower', 41.88, west), row('Water Tower', 41.88, west + apart)]
+            self.assertEqual(len(cluster_locations(rows)), 1, west)
+
+    def test_far_entries_never_cluster(self):
+        rows = [row('Water Tower', 41.89710, -87.62430), row('Water Tower', 41.89810, -87.62430)]
+        self.assertEqual(len(cluster_locations(rows)), 2)
+
+    def test_unrelated_neighbours_stay_apart(self):
+        rows = [row('Art Institute', 41.87960, -87.62370), row('Buckingham Fountain', 41.87970, -87.62380)]
+        self.assertEqual(len(cluster_locations(rows)), 2)
+
+
+class LinkVenuesTests(TestCase):
+
+    def setUp(self):
+        self.building = Architecture.objects.create(
+            name='Chicago Cultural Center', latitude=41.8837, longitude=-87.6248, fact='')
+        self.film = Films.objects.create(
+            name='The Chicago Cultural Center', latitude=41.8838, longitude=-87.6247, fact='')
+        self.history = History.objects.create(
+            name='Cultural Center', latitude=41.8836, longitude=-87.6249, fact='')
+        self.alone = Films.objects.create(name='Rookery', latitude=41.8791, longitude=-87.6319, fact='')
+
+    def refresh(self):
+        for location in (self.building, self.film, self.history, self.alone):
+            location.refresh_from_db()
+
+    def test_shared_entries_are_linked_to_one_venue(self):
+        stats = link_venues()
+        self.refresh()
+        self.assertEqual((stats['venues'], stats['created'], stats['relinked']), (1, 1, 3))
+        venue = Venue.objects.get()
+        self.assertEqual(venue.name, 'Cultural Center')
+        self.assertEqual({self.building.venue_id, self.film.venue_id, self.history.venue_id}, {venue.id})
+        self.assertIsNone(self.alone.venue_id)
+
+    def test_reruns_keep_the_venue(self):
+        link_venues()
+        venue = Venue.objects.get()
+        stats = link_venues()
+        self.assertEqual((stats['created'], stats['relinked'], stats['deleted']), (0, 0, 0))
+        self.assertEqual(Venue.objects.get().id, venue.id)
+
+    def test_entries_that_move_away_are_unlinked(self):
+        link_venues()
+        History.objects.filter(id=self.history.id).update(latitude=41.90)
+        Films.objects.filter(id=self.film.id).update(latitude=41.91)
+        stats = link_venues()
+        self.refresh()
+        self.assertEqual((stats['venues'], stats['deleted']), (0, 1))
+        self.assertFalse(Venue.objects.exists())
+        self.assertIsNone(self.building.venue_id)
+
+    def test_dry_run_changes_nothing(self):
+        stats = link_venues(dry_run=True)
+        self.refresh()
+        self.assertEqual(stats['created'], 1)
+        self.assertFalse(Venue.objects.exists())
+        self.assertIsNone(self.building.venue_id)
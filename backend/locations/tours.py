@@ -0,0 +1,194 @@
+"""
+Tour recommendations: the most worthwhile stops that fit the time a user has.
+
+Candidates come from the in-process spatial index, legs between them from
+the precomputed travel matrix (see locations.travel_matrix) and only the
+legs from the user's position from the Distance Matrix API (cached). The
+choice and order of stops is an orienteering problem solved by
+locations.routing.solve_orienteering within a latency budget.
+"""
+import contextvars
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from django.conf import settings
+
+from .api import GOOGLE_MAPS_MAX_CONCURRENCY, _fill_unroutable, get_travel_time_matrix
+from .geo import WALKING_DETOUR_FACTOR, WALKING_SPEED_KMH, estimate_walking_minutes, haversine_km
+from .routing import solve_orienteering
+from .spatial import get_spatial_index
+from .travel_matrix import get_travel_matrix, location_key
+
+
+TOUR_MODES = ('walking', 'transit')
+DEFAULT_VISIT_MINUTES = 15
+MAX_TOUR_MINUTES = 12 * 60
+# Most locations the solver chooses from
+MAX_TOUR_CANDIDATES = 40
+# Straight-line speed used to bound how far a transit tour can reach (km/h)
+TRANSIT_REACH_SPEED_KMH = 20
+MAX_TOUR_RADIUS_KM = 15
+# Whole-request latency budget and the least time the solver always gets (milliseconds)
+DEFAULT_TOUR_TIME_BUDGET_MS = 300
+MIN_SOLVER_MS = 20
+
+# Fetches the legs from the user's position. A fetch that outlives its
+# request's budget keeps running here and fills the cache for the next one.
+_origin_legs_executor = ThreadPoolExecutor(max_workers=GOOGLE_MAPS_MAX_CONCURRENCY,
+                                           thread_name_prefix='tour-origin-legs')
+
+
+def logger():
+    return logging.getLogger(__name__)
+
+
+def _reach_km(minutes, mode):
+    """Straight-line distance a tour of this length could possibly cover."""
+    if mode == 'walking':
+        reach = minutes / 60 * WALKING_SPEED_KMH / WALKING_DETOUR_FACTOR
+    else:
+        reach = minutes / 60 * TRANSIT_REACH_SPEED_KMH
+    return min(reach, MAX_TOUR_RADIUS_KM)
+
+
+def _candidates(index, latitude, longitude, weights, radius_km, matrix):
+    """
+    Pick the locations the solver chooses from.
+
+    Each preferred type contributes its nearest locations within reach;
+    the pool is then cut to MAX_TOUR_CANDIDATES by weight discounted with
+    distance. When the travel matrix has been built, locations it does not
+    cover yet (or that moved since their cells were fetched) are left out so
+    no leg between stops has to be fetched.
+    """
+    pool = []
+    for location_type in weights:
+        pool.extend(index.nearest(
+            latitude, longitude, k=MAX_TOUR_CANDIDATES,
+            location_types=[location_type], max_distance_km=radius_km,
+        ))
+    if matrix.available:
+        pool = [
+            location for location in pool
+            if matrix.covers(location_key(location.location_type, location.id, location.venue_id),
+                             index.routing_point(location))
+        ]
+    pool.sort(key=lambda location: -weights[location.location_type] / (1 + location.distance_km))
+    return pool[:MAX_TOUR_CANDIDATES]
+
+
+def _estimated_legs(points):
+    distances = [[haversine_km(a[0], a[1], b[0], b[1]) for b in points] for a in points]
+    durations = [[estimate_walking_minutes(distance) for distance in row] for row in distances]
+    return durations, distances, len(points) * (len(points) - 1)
+
+
+def _origin_legs(origin, points, mode, deadline):
+    """
+    Legs from the user's position to every point, fetched within a deadline.
+
+    The Distance Matrix call (and any wait for quota) runs in a worker
+    thread; if it has not answered by the deadline the legs are estimated
+    from straight-line distance instead.
+    """
+    future = _origin_legs_executor.submit(
+        contextvars.copy_context().run, get_travel_time_matrix, [origin], points, mode
+    )
+    try:
+        return future.result(timeout=max(0.0, deadline - time.monotonic()))
+    except FutureTimeout:
+        logger().warning(f"Distance Matrix legs for a {mode} tour missed the latency budget; using estimates")
+    distances = [haversine_km(origin[0], origin[1], point[0], point[1]) for point in points]
+    return [[estimate_walking_minutes(distance) for distance in distances]], [distances], len(points)
+
+
+def recommend_tour(origin_lat, origin_lon, minutes, preferences, mode='walking',
+                   visit_minutes=DEFAULT_VISIT_MINUTES, time_budget_ms=None):
+    """
+    Recommend the stops worth the most that can be visited in the time available.
+
+    Args:
+        origin_lat (float): User's latitude
+        origin_lon (float): User's longitude
+        minutes (float): Time available, travel and visits included
+        preferences (dict): Location type -> weight (types with weight 0 are skipped)
+        mode (str): 'walking' or 'transit'
+        visit_minutes (float): Time spent at each stop
+        time_budget_ms (int, optional): Latency budget for the whole call
+                                        (default settings.TOUR_TIME_BUDGET_MS)
+
+    Returns:
+        dict: 'stops' in visiting order with per-leg, arrival and departure times,
+              'total_value', 'total_duration_min', 'total_distance_km',
+              'complete' (False when the search was cut short by the latency
+              budget), 'candidates' and 'estimated_legs'
+    """
+    started = time.monotonic()
+    if time_budget_ms is None:
+        time_budget_ms = getattr(settings, 'TOUR_TIME_BUDGET_MS', DEFAULT_TOUR_TIME_BUDGET_MS)
+    weights = {location_type: float(weight) for location_type, weight in preferences.items() if weight > 0}
+    matrix = get_travel_matrix(mode)
+    index = get_spatial_index()
+    locations = _candidates(index, origin_lat, origin_lon, weights, _reach_km(minutes, mode), matrix)
+
+    points = [index.routing_point(location) for location in locations]
+    # The solver always keeps MIN_SOLVER_MS of the budget
+    legs_deadline = started + max(time_budget_ms - MIN_SOLVER_MS, 0) / 1000
+    durations, distances, estimated = _origin_legs((origin_lat, origin_lon), points, mode, legs_deadline)
+    precomputed = matrix.legs([
+        location_key(location.location_type, location.id, location.venue_id) for location in locations
+    ], points)
+    if precomputed is None:
+        stop_durations, stop_distances, stop_estimated = _estimated_legs(points)
+    else:
+        stop_durations, stop_distances, stop_estimated = _fill_unroutable(*precomputed, points)
+    estimated += stop_estimated
+    durations += stop_durations
+    distances += stop_distances
+    # Column 0 (back to the origin) is never used by an open tour
+    costs = [[0] + row for row in durations]
+    values = [0] + [weights[location.location_type] for location in locations]
+    service = [0] + [visit_minutes] * len(locations)
+
+    remaining = time_budget_ms / 1000 - (time.monotonic() - started)
+    deadline = time.monotonic() + max(remaining, MIN_SOLVER_MS / 1000)
+    order, value, total, converged = solve_orienteering(costs, values, service, minutes, deadline=deadline)
+
+    stops = []
+    elapsed = 0
+    total_distance = 0
+    previous = 0
+    for node in order:
+        leg_duration = durations[previous][node - 1]
+        elapsed += leg_duration
+        total_distance += distances[previous][node - 1]
+        location = locations[node - 1]
+        stops.append({
+            'location_id': location.id,
+            'location_name': location.name,
+            'location_type': location.location_type,
+            'latitude': location.latitude,
+            'longitude': location.longitude,
+            'leg_duration_min': round(leg_duration, 1),
+            'leg_distance_km': round(distances[previous][node - 1], 3),
+            'arrival_min': round(elapsed, 1),
+            'departure_min': round(elapsed + visit_minutes, 1),
+        })
+        elapsed += visit_minutes
+        previous = node
+
+    logger().info(
+        f"Recommended {mode} tour with {len(stops)} of {len(locations)} candidates "
+        f"({total:.1f} of {minutes} min) in {(time.monotonic() - started) * 1000:.0f}ms"
+    )
+    return {
+        'travel_mode': mode,
+        'stops': stops,
+        'total_value': value,
+        'total_duration_min': round(total, 1),
+        'total_distance_km': round(total_distance, 3),
+        'complete': converged,
+        'candidates': len(locations),
+        'estimated_legs': estimated,
+    }
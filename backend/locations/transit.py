@@ -0,0 +1,773 @@
+"""
+Offline transit routing from a static GTFS feed.
+
+The feed (a directory or .zip with stops.txt, trips.txt, stop_times.txt and
+calendar.txt and/or calendar_dates.txt) is compiled into flat arrays:
+trips with the same stop sequence form a pattern, and each pattern keeps its
+stop times position-major so the trips leaving one stop are a sorted,
+bisectable run. Earliest-arrival queries run RAPTOR (round-based public
+transit routing) over those arrays with walking access, egress and
+transfers between nearby stops.
+
+Enabled with settings.TRANSIT_BACKEND = 'gtfs'; the feed path comes from
+settings.GTFS_FEED_PATH. The build_transit_timetable management command
+compiles the feed and pickles the timetable next to it. Web processes only
+load that file (and pick up a newer one within TIMETABLE_RELOAD_INTERVAL);
+until it exists transit goes to Google.
+"""
+import csv
+import io
+import logging
+import math
+import os
+import pickle
+import threading
+import time
+import zipfile
+from array import array
+from bisect import bisect_left
+from datetime import timedelta
+from pathlib import Path
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.utils import timezone
+
+from .geo import EARTH_RADIUS_KM, WALKING_DETOUR_FACTOR, WALKING_SPEED_KMH
+from .geometry import encode_polyline
+
+
+# Furthest a rider walks to the first stop or from the last one (metres)
+TRANSIT_MAX_ACCESS_M = 800
+# Furthest a rider walks between stops to change vehicles (metres)
+TRANSIT_MAX_TRANSFER_M = 300
+# Most vehicles in one journey
+TRANSIT_MAX_ROUNDS = 5
+# Journeys longer than this are not searched for (seconds)
+TRANSIT_MAX_DURATION = 4 * 60 * 60
+# Grid cell edge used to find stops near a point (degrees)
+STOP_GRID_CELL = 0.005
+SECONDS_PER_DAY = 24 * 60 * 60
+TIMETABLE_FORMAT = 1
+# Processes look for a recompiled timetable at most this often (seconds)
+TIMETABLE_RELOAD_INTERVAL = 60
+INFINITY = 2 ** 31 - 1
+
+
+def logger():
+    return logging.getLogger(__name__)
+
+
+def walking_seconds(metres):
+    """Walking time for a straight-line distance, with the same detour factor as geo.estimate_walking_minutes."""
+    return round(metres * WALKING_DETOUR_FACTOR / (WALKING_SPEED_KMH / 3.6))
+
+
+def _metres(lat1, lon1, lat2, lon2):
+    """Equirectangular distance; well within a metre of haversine at walking range."""
+    to_rad = math.pi / 180
+    x = (lon2 - lon1) * math.cos((lat1 + lat2) / 2 * to_rad)
+    y = lat2 - lat1
+    return EARTH_RADIUS_KM * 1000 * to_rad * math.sqrt(x * x + y * y)
+
+
+def _parse_time(value):
+    """Seconds since the start of the service day for a GTFS 'H:MM:SS' time (may exceed 24:00:00)."""
+    value = value.strip()
+    if not value:
+        return None
+    hours, minutes, seconds = value.split(':')
+    return int(hours) * 3600 + int(minutes) * 60 + int(seconds)
+
+
+def _parse_date(value):
+    return int(value.strip())
+
+
+class _Feed:
+    """Reads the text files of a GTFS directory or zip archive."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._zip = zipfile.ZipFile(self.path) if self.path.is_file() else None
+        self._handles = []
+
+    def rows(self, name):
+        """csv.DictReader over one file, or None if the feed does not have it."""
+        if self._zip is not None:
+            members = {Path(member).name: member for member in self._zip.namelist()}
+            if name not in members:
+                return None
+            handle = io.TextIOWrapper(self._zip.open(members[name]), encoding='utf-8-sig', newline='')
+        else:
+            if not (self.path / name).exists():
+                return None
+            handle = open(self.path / name, encoding='utf-8-sig', newline='')
+        self._handles.append(handle)
+        return csv.DictReader(handle)
+
+    def close(self):
+        for handle in self._handles:
+            handle.close()
+        if self._zip is not None:
+            self._zip.close()
+
+
+class TransitTimetable:
+    """
+    Compiled GTFS timetable and the RAPTOR search over it.
+
+    Stops, patterns, trips and footpaths are numbered densely and stored in
+    parallel arrays; *_start arrays hold each item's offset into the flat
+    array that follows it (CSR layout).
+    """
+
+    def __init__(self):
+        self.time_zone = settings.TIME_ZONE
+        self.stop_ids = []
+        self.stop_names = []
+        self.stop_latitudes = array('d')
+        self.stop_longitudes = array('d')
+        # Pattern p visits pattern_stops[pattern_stop_start[p]:pattern_stop_start[p + 1]]
+        self.pattern_stop_start = array('i', [0])
+        self.pattern_stops = array('i')
+        self.pattern_km = array('d')            # cumulative straight-line km along the pattern
+        self.pattern_route_names = []
+        # Pattern p runs trips pattern_trip_start[p]..pattern_trip_start[p + 1], earliest first
+        self.pattern_trip_start = array('i', [0])
+        self.trip_services = array('i')
+        # Times of trip t at position i: pattern_time_start[p] + i * trip count + t
+        self.pattern_time_start = array('i', [0])
+        self.arrivals = array('i')
+        self.departures = array('i')
+        self.stop_pattern_start = array('i', [0])
+        self.stop_patterns = array('i')
+        self.stop_positions = array('i')
+        self.footpath_start = array('i', [0])
+        self.footpath_stops = array('i')
+        self.footpath_seconds = array('i')
+        self.service_ids = []
+        self.service_weekdays = array('b')     # bit 0 is Monday
+        self.service_start = array('i')
+        self.service_end = array('i')
+        self.service_exceptions = {}           # (service, YYYYMMDD) -> running
+        self._grid = {}
+        self._active = {}
+
+    # Loading
+
+    @classmethod
+    def from_gtfs(cls, path):
+        """Compile a GTFS directory or zip archive."""
+        timetable = cls()
+        feed = _Feed(path)
+        try:
+            timetable._load_agency(feed)
+            timetable._load_stops(feed)
+            timetable._load_services(feed)
+            trips = timetable._load_trips(feed)
+            timetable._build_patterns(feed, trips)
+        finally:
+            feed.close()
+        timetable._index_stops()
+        timetable._build_footpaths()
+        logger().info(
+            f"Compiled GTFS feed {path}: {len(timetable.stop_ids)} stops, "
+            f"{len(timetable.pattern_stop_start) - 1} patterns, {len(timetable.trip_services)} trips"
+        )
+        return timetable
+
+    def _load_agency(self, feed):
+        rows = feed.rows('agency.txt')
+        for row in rows or ():
+            if row.get('agency_timezone'):
+                self.time_zone = row['agency_timezone'].strip()
+                break
+
+    def _load_stops(self, feed):
+        rows = feed.rows('stops.txt')
+        if rows is None:
+            raise ValueError("GTFS feed has no stops.txt")
+        for row in rows:
+            # Stations, entrances and nodes have no stop times of their own
+            if (row.get('location_type') or '0').strip() not in ('', '0'):
+                continue
+            self.stop_ids.append(row['stop_id'].strip())
+            self.stop_names.append((row.get('stop_name') or '').strip())
+            self.stop_latitudes.append(float(row['stop_lat']))
+            self.stop_longitudes.append(float(row['stop_lon']))
+
+    def _load_services(self, feed):
+        services = {}
+
+        def service(service_id):
+            if service_id not in services:
+                services[service_id] = len(self.service_ids)
+                self.service_ids.append(service_id)
+                self.service_weekdays.append(0)
+                self.service_start.append(0)
+                self.service_end.append(0)
+            return services[service_id]
+
+        days = ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday')
+        for row in feed.rows('calendar.txt') or ():
+            number = service(row['service_id'].strip())
+            self.service_weekdays[number] = sum(1 << day for day, name in enumerate(days) if row[name].strip() == '1')
+            self.service_start[number] = _parse_date(row['start_date'])
+            self.service_end[number] = _parse_date(row['end_date'])
+        for row in feed.rows('calendar_dates.txt') or ():
+            number = service(row['service_id'].strip())
+            self.service_exceptions[(number, _parse_date(row['date']))] = row['exception_type'].strip() == '1'
+        self._services = services
+
+    def _load_trips(self, feed):
+        """Map trip_id -> (service number, route name)."""
+        routes = {}
+        for row in feed.rows('routes.txt') or ():
+            routes[row['route_id'].strip()] = (row.get('route_short_name') or row.get('route_long_name') or '').strip()
+        rows = feed.rows('trips.txt')
+        if rows is None:
+            raise ValueError("GTFS feed has no trips.txt")
+        trips = {}
+        for row in rows:
+            service_id = row['service_id'].strip()
+            if service_id not in self._services:
+                continue
+            route_id = row['route_id'].strip()
+            trips[row['trip_id'].strip()] = (self._services[service_id], routes.get(route_id, route_id))
+        return trips
+
+    def _read_stop_times(self, feed, trips):
+        """Map trip_id -> flat array of (sequence, stop, arrival, departure) with interpolated blanks."""
+        stops = {stop_id: number for number, stop_id in enumerate(self.stop_ids)}
+        rows = feed.rows('stop_times.txt')
+        if rows is None:
+            raise ValueError("GTFS feed has no stop_times.txt")
+        stop_times = {}
+        blank = -1
+        for row in rows:
+            trip_id = row['trip_id'].strip()
+            stop = stops.get(row['stop_id'].strip())
+            if trip_id not in trips or stop is None:
+                continue
+            arrival = _parse_time(row.get('arrival_time') or '')
+            departure = _parse_time(row.get('departure_time') or '')
+            if arrival is None:
+                arrival = departure
+            if departure is None:
+                departure = arrival
+            times = stop_times.get(trip_id)
+            if times is None:
+                times = stop_times[trip_id] = array('i')
+            times.extend((int(row['stop_sequence']), stop,
+                          blank if arrival is None else arrival, blank if departure is None else departure))
+        return stop_times
+
+    @staticmethod
+    def _trip_events(times):
+        """Sorted (stop, arrival, departure) events of one trip, interpolating stops without times."""
+        events = sorted(zip(times[0::4], times[1::4], times[2::4], times[3::4]))
+        stops = [event[1] for event in events]
+        arrivals = [event[2] for event in events]
+        departures = [event[3] for event in events]
+        timed = [i for i, value in enumerate(arrivals) if value >= 0]
+        if len(timed) < 2 or timed[0] != 0 or timed[-1] != len(events) - 1:
+            return None
+        for before, after in zip(timed, timed[1:]):
+            for i in range(before + 1, after):
+                share = (i - before) / (after - before)
+                arrivals[i] = departures[i] = round(departures[before] + share * (arrivals[after] - departures[before]))
+        return stops, arrivals, departures
+
+    def _build_patterns(self, feed, trips):
+        # Trips with the same stop sequence share a pattern; trips that overtake
+        # another are split off so every pattern's trips stay in FIFO order
+        groups = {}
+        for trip_id, times in self._read_stop_times(feed, trips).items():
+            events = self._trip_events(times)
+            if events is None:
+                continue
+            stops, arrivals, departures = events
+            service, route_name = trips[trip_id]
+            groups.setdefault((route_name, tuple(stops)), []).append((departures[0], arrivals, departures, service))
+
+        for (route_name, stops), group in groups.items():
+            group.sort(key=lambda trip: trip[0])
+            lanes = []
+            for trip in group:
+                for lane in lanes:
+                    last = lane[-1]
+                    if all(a >= b for a, b in zip(trip[2], last[2])) and all(a >= b for a, b in zip(trip[1], last[1])):
+                        lane.append(trip)
+                        break
+                else:
+                    lanes.append([trip])
+            for lane in lanes:
+                self._add_pattern(route_name, stops, lane)
+
+    def _add_pattern(self, route_name, stops, trips):
+        km = 0.0
+        for position, stop in enumerate(stops):
+            if position:
+                previous = stops[position - 1]
+                km += _metres(self.stop_latitudes[previous], self.stop_longitudes[previous],
+                              self.stop_latitudes[stop], self.stop_longitudes[stop]) / 1000
+            self.pattern_stops.append(stop)
+            self.pattern_km.append(km)
+        self.pattern_stop_start.append(len(self.pattern_stops))
+        self.pattern_route_names.append(route_name)
+        for position in range(len(stops)):
+            self.arrivals.extend(trip[1][position] for trip in trips)
+            self.departures.extend(trip[2][position] for trip in trips)
+        self.pattern_time_start.append(len(self.arrivals))
+        self.trip_services.extend(trip[3] for trip in trips)
+        self.pattern_trip_start.append(len(self.trip_services))
+
+    def _index_stops(self):
+        """Build the stop -> (pattern, position) lists."""
+        serving = [[] for _ in self.stop_ids]
+        for pattern in range(len(self.pattern_stop_start) - 1):
+            start = self.pattern_stop_start[pattern]
+            for position in range(self.pattern_stop_start[pattern + 1] - start):
+                serving[self.pattern_stops[start + position]].append((pattern, position))
+        for entries in serving:
+            for pattern, position in entries:
+                self.stop_patterns.append(pattern)
+                self.stop_positions.append(position)
+            self.stop_pattern_start.append(len(self.stop_patterns))
+
+    def _build_footpaths(self):
+        """Walking transfers between every pair of stops within TRANSIT_MAX_TRANSFER_M."""
+        self._grid = {}
+        for stop in range(len(self.stop_ids)):
+            self._grid.setdefault(self._cell(self.stop_latitudes[stop], self.stop_longitudes[stop]), []).append(stop)
+        for stop in range(len(self.stop_ids)):
+            for other, metres in self.stops_near(self.stop_latitudes[stop], self.stop_longitudes[stop],
+                                                 TRANSIT_MAX_TRANSFER_M):
+                if other != stop:
+                    self.footpath_stops.append(other)
+                    self.footpath_seconds.append(walking_seconds(metres))
+            self.footpath_start.append(len(self.footpath_stops))
+
+    def save(self, path):
+        """Pickle the timetable, replacing path atomically so readers never see a partial file."""
+        path = Path(path)
+        state = {name: value for name, value in self.__dict__.items() if not name.startswith('_')}
+        temporary = path.with_name(path.name + '.tmp')
+        with open(temporary, 'wb') as handle:
+            pickle.dump((TIMETABLE_FORMAT, state), handle, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path):
+        """Load a timetable written by save(), or return None if it was written by another format."""
+        with open(path, 'rb') as handle:
+            version, state = pickle.load(handle)
+        if version != TIMETABLE_FORMAT:
+            return None
+        timetable = cls()
+        timetable.__dict__.update(state)
+        timetable._grid = {}
+        for stop in range(len(timetable.stop_ids)):
+            timetable._grid.setdefault(
+                timetable._cell(timetable.stop_latitudes[stop], timetable.stop_longitudes[stop]), []
+            ).append(stop)
+        return timetable
+
+    # Queries
+
+    def _cell(self, latitude, longitude):
+        return (math.floor(latitude / STOP_GRID_CELL), math.floor(longitude / STOP_GRID_CELL))
+
+    def stops_near(self, latitude, longitude, radius_m):
+        """(stop, metres) pairs for every stop within radius_m of a point."""
+        lat_cells = math.ceil(radius_m / (EARTH_RADIUS_KM * 1000 * math.radians(STOP_GRID_CELL)))
+        lon_cells = math.ceil(lat_cells / max(math.cos(math.radians(latitude)), 1e-6))
+        cx, cy = self._cell(latitude, longitude)
+        found = []
+        for x in range(cx - lat_cells, cx + lat_cells + 1):
+            for y in range(cy - lon_cells, cy + lon_cells + 1):
+                for stop in self._grid.get((x, y), ()):
+                    metres = _metres(latitude, longitude, self.stop_latitudes[stop], self.stop_longitudes[stop])
+                    if metres <= radius_m:
+                        found.append((stop, metres))
+        return found
+
+    def _active_services(self, day):
+        """bytearray with 1 for every service running on a date."""
+        key = day.year * 10000 + day.month * 100 + day.day
+        active = self._active.get(key)
+        if active is None:
+            weekday = 1 << day.weekday()
+            active = bytearray(
+                1 if self.service_exceptions.get(
+                    (number, key),
+                    bool(self.service_weekdays[number] & weekday)
+                    and self.service_start[number] <= key <= self.service_end[number],
+                ) else 0
+                for number in range(len(self.service_ids))
+            )
+            self._active[key] = active
+        return active
+
+    def _service_days(self, departure):
+        """(active services, offset) for the service days a journey leaving at `departure` can use."""
+        midnight = departure.replace(hour=0, minute=0, second=0, microsecond=0)
+        return [
+            (self._active_services((midnight + timedelta(days=shift)).date()), shift * SECONDS_PER_DAY)
+            for shift in (-1, 0, 1)
+        ]
+
+    def _earliest_trip(self, pattern, position, time, service_days):
+        """(trip, offset, departure) of the first trip leaving `position` at or after `time`, or None."""
+        first_trip = self.pattern_trip_start[pattern]
+        trip_count = self.pattern_trip_start[pattern + 1] - first_trip
+        column = self.pattern_time_start[pattern] + position * trip_count
+        best = None
+        for active, offset in service_days:
+            index = bisect_left(self.departures, time - offset, column, column + trip_count)
+            while index < column + trip_count:
+                trip = index - column
+                if active[self.trip_services[first_trip + trip]]:
+                    departure = self.departures[index] + offset
+                    if best is None or departure < best[2]:
+                        best = (trip, offset, departure)
+                    break
+                index += 1
+        return best
+
+    def search(self, latitude, longitude, departure):
+        """
+        Earliest arrival at every stop from a point (RAPTOR).
+
+        Returns:
+            _Search: Labels per round, queried with arrival_at() and legs()
+        """
+        local = departure.astimezone(ZoneInfo(self.time_zone))
+        midnight = local.replace(hour=0, minute=0, second=0, microsecond=0)
+        start = round((local - midnight).total_seconds())
+        service_days = self._service_days(local)
+        limit = start + TRANSIT_MAX_DURATION
+        stop_count = len(self.stop_ids)
+
+        best = [INFINITY] * stop_count
+        arrival = [INFINITY] * stop_count
+        km = [0.0] * stop_count
+        parent = [None] * stop_count
+        marked = set()
+        for stop, metres in self.stops_near(latitude, longitude, TRANSIT_MAX_ACCESS_M):
+            arrival[stop] = best[stop] = start + walking_seconds(metres)
+            km[stop] = metres * WALKING_DETOUR_FACTOR / 1000
+            parent[stop] = ('access',)
+            marked.add(stop)
+        rounds = [(arrival, km, parent)]
+
+        departures = self.departures
+        arrivals = self.arrivals
+        for _ in range(TRANSIT_MAX_ROUNDS):
+            previous, previous_km, _ = rounds[-1]
+            arrival = list(previous)
+            km = list(previous_km)
+            parent = [None] * stop_count
+            queue = {}
+            for stop in marked:
+                for entry in range(self.stop_pattern_start[stop], self.stop_pattern_start[stop + 1]):
+                    pattern = self.stop_patterns[entry]
+                    position = self.stop_positions[entry]
+                    if position < queue.get(pattern, INFINITY):
+                        queue[pattern] = position
+            marked = set()
+
+            for pattern, first_position in queue.items():
+                stop_start = self.pattern_stop_start[pattern]
+                length = self.pattern_stop_start[pattern + 1] - stop_start
+                trip_count = self.pattern_trip_start[pattern + 1] - self.pattern_trip_start[pattern]
+                time_start = self.pattern_time_start[pattern]
+                trip = None
+                for position in range(first_position, length):
+                    stop = self.pattern_stops[stop_start + position]
+                    if trip is not None:
+                        arrives = arrivals[time_start + position * trip_count + trip] + offset
+                        if arrives < best[stop] and arrives <= limit:
+                            arrival[stop] = best[stop] = arrives
+                            km[stop] = board_km + self.pattern_km[stop_start + position]
+                            parent[stop] = ('ride', pattern, board_position, position, trip, offset)
+                            marked.add(stop)
+                    ready = previous[stop]
+                    if ready == INFINITY:
+                        continue
+                    if trip is None or ready <= departures[time_start + position * trip_count + trip] + offset:
+                        found = self._earliest_trip(pattern, position, ready, service_days)
+                        if found is not None and (trip is None or found[2] < departures[
+                                time_start + position * trip_count + trip] + offset):
+                            trip, offset, _ = found
+                            board_position = position
+                            board_km = previous_km[stop] - self.pattern_km[stop_start + position]
+
+            for stop in list(marked):
+                for entry in range(self.footpath_start[stop], self.footpath_start[stop + 1]):
+                    target = self.footpath_stops[entry]
+                    arrives = arrival[stop] + self.footpath_seconds[entry]
+                    if arrives < best[target]:
+                        arrival[target] = best[target] = arrives
+                        km[target] = km[stop] + self.footpath_seconds[entry] * WALKING_SPEED_KMH / 3600
+                        parent[target] = ('walk', stop)
+                        marked.add(target)
+
+            rounds.append((arrival, km, parent))
+            if not marked:
+                break
+        return _Search(self, latitude, longitude, start, best, rounds)
+
+
+class _Search:
+    """Result of one TransitTimetable.search: labels per round from one origin."""
+
+    def __init__(self, timetable, latitude, longitude, start, best, rounds):
+        self.timetable = timetable
+        self.latitude = latitude
+        self.longitude = longitude
+        self.start = start
+        self.best = best
+        self.rounds = rounds
+
+    def arrival_at(self, latitude, longitude):
+        """
+        Fastest way to a point: walking straight there or via transit.
+
+        Returns:
+            tuple: (seconds, km, (stop, egress metres) or None when walking is fastest),
+                   or None when the point cannot be reached within TRANSIT_MAX_DURATION
+        """
+        direct = _metres(self.latitude, self.longitude, latitude, longitude)
+        seconds = walking_seconds(direct)
+        km = direct * WALKING_DETOUR_FACTOR / 1000
+        via = None
+        for stop, metres in self.timetable.stops_near(latitude, longitude, TRANSIT_MAX_ACCESS_M):
+            if self.best[stop] == INFINITY:
+                continue
+            arrives = self.best[stop] + walking_seconds(metres) - self.start
+            if arrives < seconds:
+                seconds = arrives
+                via = (stop, metres)
+        if via is not None:
+            arrival = self.best[via[0]]
+            # The earliest round that reached the stop has the fewest vehicles
+            labels = next(labels for labels in self.rounds if labels[0][via[0]] == arrival)
+            km = labels[1][via[0]] + via[1] * WALKING_DETOUR_FACTOR / 1000
+        if seconds > TRANSIT_MAX_DURATION:
+            return None
+        return seconds, km, via
+
+    def legs(self, via):
+        """Reconstruct the legs reaching via's stop, first leg first."""
+        timetable = self.timetable
+        stop = via[0]
+        round_number = next(number for number, labels in enumerate(self.rounds) if labels[0][stop] == self.best[stop])
+        legs = []
+        while True:
+            step = self.rounds[round_number][2][stop]
+            if step is None:
+                round_number -= 1
+                continue
+            if step[0] == 'access':
+                legs.append(('walk', [stop]))
+                break
+            if step[0] == 'walk':
+                legs.append(('walk', [step[1], stop]))
+                stop = step[1]
+                continue
+            _, pattern, board_position, alight_position, _, _ = step
+            start = timetable.pattern_stop_start[pattern]
+            stops = list(timetable.pattern_stops[start + board_position:start + alight_position + 1])
+            legs.append((timetable.pattern_route_names[pattern], stops))
+            stop = stops[0]
+            round_number -= 1
+        legs.reverse()
+        return legs
+
+
+def format_duration(seconds):
+    """Duration text in the style of the Google Maps APIs ('1 hour 5 mins')."""
+    minutes = max(1, round(seconds / 60))
+    hours, minutes = divmod(minutes, 60)
+    parts = []
+    if hours:
+        parts.append(f"{hours} hour{'s' if hours > 1 else ''}")
+    if minutes or not hours:
+        parts.append(f"{minutes} min{'s' if minutes > 1 else ''}")
+    return ' '.join(parts)
+
+
+def format_distance(km):
+    """Distance text in the style of the Google Maps APIs ('850 m', '1.2 km')."""
+    if km < 1:
+        return f"{round(km * 1000)} m"
+    return f"{km:.1f} km"
+
+
+def transit_elements(timetable, origin_points, destination_points, departure=None):
+    """
+    Distance Matrix style transit elements for every origin and destination.
+
+    Returns:
+        list: One row per origin, each a list of elements ({'status', 'distance',
+              'duration'}) aligned with destination_points; the status is
+              'ZERO_RESULTS' for destinations out of reach
+    """
+    departure = departure or timezone.now()
+    rows = []
+    for origin in origin_points:
+        search = timetable.search(origin[0], origin[1], departure)
+        row = []
+        for destination in destination_points:
+            arrival = search.arrival_at(destination[0], destination[1])
+            if arrival is None:
+                row.append({'status': 'ZERO_RESULTS'})
+                continue
+            seconds, km, _ = arrival
+            row.append({
+                'status': 'OK',
+                'distance': {'value': round(km * 1000), 'text': format_distance(km)},
+                'duration': {'value': seconds, 'text': format_duration(seconds)},
+            })
+        rows.append(row)
+    return rows
+
+
+def transit_route(timetable, origin, destination, departure=None):
+    """
+    Directions style summary of the fastest transit journey between two points.
+
+    Returns:
+        dict: 'distance_km', 'distance_text', 'duration_min', 'duration_text',
+              'steps' and 'polyline', like api.parse_directions ({} when the
+              destination is out of reach)
+    """
+    search = timetable.search(origin[0], origin[1], departure or timezone.now())
+    arrival = search.arrival_at(destination[0], destination[1])
+    if arrival is None:
+        return {}
+    seconds, km, via = arrival
+    latitudes = [origin[0]]
+    longitudes = [origin[1]]
+    steps = 1
+    if via is not None:
+        legs = search.legs(via)
+        steps = len(legs) + 1
+        previous = None
+        for _, stops in legs:
+            for stop in stops:
+                # Consecutive legs share their end stops
+                if stop != previous:
+                    latitudes.append(timetable.stop_latitudes[stop])
+                    longitudes.append(timetable.stop_longitudes[stop])
+                previous = stop
+    latitudes.append(destination[0])
+    longitudes.append(destination[1])
+    return {
+        'distance_km': round(km, 3),
+        'distance_text': format_distance(km),
+        'duration_min': seconds / 60,
+        'duration_text': format_duration(seconds),
+        'steps': steps,
+        'polyline': encode_polyline(latitudes, longitudes),
+    }
+
+
+def _feed_mtime(path):
+    if path.is_dir():
+        return max((child.stat().st_mtime for child in path.iterdir()), default=0)
+    return path.stat().st_mtime
+
+
+def compiled_timetable_path(path):
+    """Where the compiled timetable of a feed is kept."""
+    path = Path(path)
+    return path.with_name(path.name + '.timetable')
+
+
+def compile_timetable(path):
+    """Compile a GTFS feed and save the timetable next to it (see build_transit_timetable)."""
+    timetable = TransitTimetable.from_gtfs(Path(path))
+    timetable.save(compiled_timetable_path(path))
+    return timetable
+
+
+def open_compiled_timetable(path):
+    """
+    Load a feed's compiled timetable without compiling anything.
+
+    Returns:
+        TransitTimetable: The timetable, or None when it has not been compiled
+                          (or was compiled by an incompatible version)
+    """
+    compiled = compiled_timetable_path(path)
+    if not compiled.exists():
+        logger().warning(f"GTFS timetable {compiled} has not been compiled; run "
+                         f"'manage.py build_transit_timetable'. Transit falls back to Google")
+        return None
+    timetable = TransitTimetable.load(compiled)
+    if timetable is None:
+        logger().warning(f"GTFS timetable {compiled} was compiled by another version; run "
+                         f"'manage.py build_transit_timetable'. Transit falls back to Google")
+        return None
+    if Path(path).exists() and compiled.stat().st_mtime < _feed_mtime(Path(path)):
+        logger().warning(f"GTFS feed {path} is newer than its compiled timetable; run "
+                         f"'manage.py build_transit_timetable'")
+    return timetable
+
+
+def _compiled_stamp(path):
+    try:
+        return compiled_timetable_path(path).stat().st_mtime_ns
+    except (OSError, TypeError):
+        return None
+
+
+# (feed path, compiled file mtime, time.monotonic() of the last check, TransitTimetable or None)
+_timetable = None
+_timetable_lock = threading.Lock()
+
+
+def transit_backend():
+    return getattr(settings, 'TRANSIT_BACKEND', 'google')
+
+
+def get_transit_timetable():
+    """
+    Return the process-wide GTFS timetable when the 'gtfs' transit backend is enabled.
+
+    Only the compiled timetable is loaded, never the feed itself, so no
+    request pays for compiling it. The file is checked for a newer build at
+    most every TIMETABLE_RELOAD_INTERVAL seconds.
+
+    Returns:
+        TransitTimetable: The loaded timetable, or None when transit goes to
+                          Google (backend not enabled, or no usable compiled timetable)
+    """
+    global _timetable
+    if transit_backend() != 'gtfs':
+        return None
+    path = getattr(settings, 'GTFS_FEED_PATH', None)
+    entry = _timetable
+    if entry is not None and entry[0] == path and time.monotonic() - entry[2] < TIMETABLE_RELOAD_INTERVAL:
+        return entry[3]
+    with _timetable_lock:
+        entry = _timetable
+        now = time.monotonic()
+        if entry is not None and entry[0] == path and now - entry[2] < TIMETABLE_RELOAD_INTERVAL:
+            return entry[3]
+        stamp = _compiled_stamp(path)
+        if entry is not None and entry[0] == path and entry[1] == stamp:
+            timetable = entry[3]
+        elif not path:
+            timetable = None
+        else:
+            try:
+                timetable = open_compiled_timetable(path)
+            except Exception as e:
+                logger().error(f"Error loading GTFS timetable for {path}: {str(e)}")
+                timetable = None
+        _timetable = (path, stamp, now, timetable)
+        return timetable
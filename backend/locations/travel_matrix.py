@@ -0,0 +1,327 @@
+"""
+Precomputed POI x POI travel matrix.
+
+For each mode two square float32 files hold travel minutes and kilometres,
+row-major in the byte order recorded in index.json, with one row and
+column per POI slot. index.json maps 'Type:id' keys to slots and records
+the point each slot was routed from. The files are memory-mapped read-only
+by every worker, so all processes share one copy through the page cache.
+
+Cells are NaN until fetched and +inf when Google has no route, so a build
+that stops half way resumes with exactly the cells still missing, and new
+POIs only add their own rows and columns. A POI that has moved since its
+cells were fetched is treated as missing by readers, and the next build
+clears and refetches its row and column. See the build_travel_matrix
+management command.
+"""
+import json
+import logging
+import math
+import mmap
+import os
+import sys
+import threading
+import time
+from array import array
+from pathlib import Path
+
+from django.conf import settings
+
+
+FLOAT_SIZE = 4
+INDEX_FILE = 'index.json'
+# Readers look for a rebuilt index at most this often (seconds)
+RELOAD_INTERVAL = 10
+# A POI whose point differs by more than this (degrees, ~0.1 m) has moved
+POINT_TOLERANCE_DEGREES = 1e-6
+
+
+def logger():
+    return logging.getLogger(__name__)
+
+
+def travel_matrix_dir():
+    return Path(getattr(settings, 'TRAVEL_MATRIX_DIR', Path(settings.BASE_DIR) / 'travel_matrix'))
+
+
+def location_key(location_type, location_id, venue_id=None):
+    """Matrix key of a location; entries sharing a venue share the venue's row and column."""
+    if venue_id:
+        return f"venue:{venue_id}"
+    return f"{location_type}:{location_id}"
+
+
+def same_point(first, second):
+    """Whether two (latitude, longitude) points are the same within POINT_TOLERANCE_DEGREES."""
+    return (first is not None and second is not None
+            and abs(first[0] - second[0]) <= POINT_TOLERANCE_DEGREES
+            and abs(first[1] - second[1]) <= POINT_TOLERANCE_DEGREES)
+
+
+def _stored_points(index):
+    """Map key -> (latitude, longitude) the key's cells were fetched for."""
+    return {
+        key: tuple(point)
+        for key, point in zip(index['keys'], index.get('points') or ())
+        if key and point
+    }
+
+
+def _matrix_path(directory, mode, quantity):
+    return directory / f"{mode}-{quantity}.f32"
+
+
+def read_index(directory):
+    try:
+        with open(directory / INDEX_FILE, encoding='utf-8') as handle:
+            return json.load(handle)
+    except FileNotFoundError:
+        return {'capacity': 0, 'keys': [], 'modes': {}}
+
+
+def write_index(directory, index):
+    """Replace index.json atomically so readers never see a partial file."""
+    temporary = directory / f"{INDEX_FILE}.tmp"
+    with open(temporary, 'w', encoding='utf-8') as handle:
+        json.dump(index, handle)
+    os.replace(temporary, directory / INDEX_FILE)
+
+
+class MatrixFile:
+    """One capacity x capacity float32 matrix backed by a writable memory map."""
+
+    def __init__(self, path, capacity):
+        self.path = path
+        self.capacity = capacity
+        self._ensure(path, capacity)
+        self._handle = open(path, 'r+b')
+        self._map = mmap.mmap(self._handle.fileno(), capacity * capacity * FLOAT_SIZE)
+        self.cells = memoryview(self._map).cast('f')
+
+    @staticmethod
+    def _ensure(path, capacity):
+        """Create the file filled with NaN, or grow an existing smaller one preserving its rows."""
+        size = capacity * capacity * FLOAT_SIZE
+        if path.exists() and path.stat().st_size == size:
+            return
+        old_capacity = int(math.isqrt(path.stat().st_size // FLOAT_SIZE)) if path.exists() else 0
+        empty_row = array('f', [math.nan]) * capacity
+        temporary = path.with_suffix('.tmp')
+        with open(temporary, 'wb') as out:
+            source = open(path, 'rb') if old_capacity else None
+            try:
+                for _ in range(old_capacity):
+                    row = array('f')
+                    row.frombytes(source.read(old_capacity * FLOAT_SIZE))
+                    out.write(row.tobytes() + empty_row[old_capacity:].tobytes())
+                for _ in range(capacity - old_capacity):
+                    out.write(empty_row.tobytes())
+            finally:
+                if source:
+                    source.close()
+        os.replace(temporary, path)
+
+    def get(self, row, column):
+        return self.cells[row * self.capacity + column]
+
+    def set(self, row, column, value):
+        self.cells[row * self.capacity + column] = value
+
+    def clear(self, slots):
+        """Reset the rows and columns of slots to NaN so they are fetched again."""
+        empty_row = memoryview(array('f', [math.nan]) * self.capacity)
+        for slot in slots:
+            self.cells[slot * self.capacity:(slot + 1) * self.capacity] = empty_row
+            for row in range(self.capacity):
+                self.cells[row * self.capacity + slot] = math.nan
+
+    def flush(self):
+        self._map.flush()
+
+    def close(self):
+        self.cells.release()
+        self._map.close()
+        self._handle.close()
+
+
+class TravelMatrix:
+    """Read-only view of the precomputed matrix for one mode."""
+
+    def __init__(self, directory, mode):
+        index = read_index(directory)
+        self.mode = mode
+        self.capacity = index['capacity']
+        if index.get('byteorder', sys.byteorder) != sys.byteorder:
+            logger().error(f"Travel matrix in {directory} was written {index['byteorder']}-endian; "
+                           f"rebuild it on this host")
+            self.capacity = 0
+        self.slots = {key: slot for slot, key in enumerate(index['keys']) if key}
+        self.points = _stored_points(index)
+        self._maps = []
+        self.minutes = self._map(_matrix_path(directory, mode, 'minutes'))
+        self.km = self._map(_matrix_path(directory, mode, 'km'))
+
+    def _map(self, path):
+        size = self.capacity * self.capacity * FLOAT_SIZE
+        if not size or not path.exists() or path.stat().st_size != size:
+            return None
+        with open(path, 'rb') as handle:
+            mapped = mmap.mmap(handle.fileno(), size, access=mmap.ACCESS_READ)
+        self._maps.append(mapped)
+        return memoryview(mapped).cast('f')
+
+    @property
+    def available(self):
+        return self.minutes is not None and self.km is not None
+
+    def covers(self, key, point):
+        """Whether key has a slot whose cells were fetched for point."""
+        return key in self.slots and same_point(self.points.get(key), point)
+
+    def legs(self, keys, points):
+        """
+        Minutes and kilometres between every pair of keys.
+
+        Args:
+            keys (list): location_key() of each POI
+            points (list): Current (latitude, longitude) of each POI
+
+        Returns:
+            tuple: (minutes, km) square matrices aligned with keys, or None when
+                   any key or cell has not been computed yet or a POI has moved
+        """
+        if not self.available:
+            return None
+        if not all(self.covers(key, point) for key, point in zip(keys, points)):
+            return None
+        slots = [self.slots[key] for key in keys]
+        minutes = []
+        distances = []
+        for origin in slots:
+            base = origin * self.capacity
+            minute_row = [self.minutes[base + slot] for slot in slots]
+            km_row = [self.km[base + slot] for slot in slots]
+            if any(math.isnan(value) for value in minute_row):
+                return None
+            minutes.append(minute_row)
+            distances.append(km_row)
+        return minutes, distances
+
+
+_matrices = {}
+_matrices_lock = threading.Lock()
+
+
+def get_travel_matrix(mode):
+    """Return the process-wide TravelMatrix for a mode, reopening it when index.json changes."""
+    now = time.monotonic()
+    entry = _matrices.get(mode)
+    if entry is not None and now - entry[1] < RELOAD_INTERVAL:
+        return entry[0]
+    with _matrices_lock:
+        directory = travel_matrix_dir()
+        try:
+            stamp = os.stat(directory / INDEX_FILE).st_mtime_ns
+        except FileNotFoundError:
+            stamp = None
+        if entry is None or entry[2] != stamp:
+            matrix = TravelMatrix(directory, mode)
+        else:
+            matrix = entry[0]
+        _matrices[mode] = (matrix, now, stamp)
+        return matrix
+
+
+class TravelMatrixBuilder:
+    """
+    Writer side of the matrix: registers POIs and fills missing cells for a mode.
+
+    Args:
+        directory (Path): Where index.json and the matrix files live
+        points (dict): location_key() -> (latitude, longitude) of every current POI
+
+    Raises:
+        ValueError: The existing files were written with another byte order
+    """
+
+    def __init__(self, directory, points):
+        directory.mkdir(parents=True, exist_ok=True)
+        self.directory = directory
+        self.index = read_index(directory)
+        if self.index.get('byteorder', sys.byteorder) != sys.byteorder:
+            raise ValueError(f"Travel matrix in {directory} was written {self.index['byteorder']}-endian; "
+                             f"delete it to rebuild on this host")
+        keys = list(points)
+        stored = _stored_points(self.index)
+        known = set(self.index['keys'])
+        added = [key for key in keys if key not in known]
+        self.index['keys'].extend(added)
+        # Slots of POIs that no longer exist are kept (blanked) so other slots never move
+        current = set(keys)
+        self.index['keys'] = [key if key in current else '' for key in self.index['keys']]
+        self.added = len(added)
+        if len(self.index['keys']) > self.index['capacity']:
+            # Grow geometrically so adding a few POIs at a time rarely rewrites the files
+            self.index['capacity'] = max(len(self.index['keys']), self.index['capacity'] * 2, 16)
+        self.capacity = self.index['capacity']
+        self.slots = {key: slot for slot, key in enumerate(self.index['keys']) if key}
+        # Cells fetched for a POI's old point are cleared in every mode before the index is published
+        self.moved = [self.slots[key] for key in keys if key in stored and not same_point(stored[key], points[key])]
+        self.index['points'] = [list(points[key]) if key else None for key in self.index['keys']]
+        self._files = {}
+
+    def files(self, mode):
+        if mode not in self._files:
+            self._files[mode] = (
+                MatrixFile(_matrix_path(self.directory, mode, 'minutes'), self.capacity),
+                MatrixFile(_matrix_path(self.directory, mode, 'km'), self.capacity),
+            )
+            for matrix in self._files[mode]:
+                matrix.clear(self.moved)
+        return self._files[mode]
+
+    def missing(self, mode):
+        """Map origin slot -> destination slots still NaN (diagonal cells are filled with 0)."""
+        minutes, km = self.files(mode)
+        slots = sorted(self.slots.values())
+        missing = {}
+        for origin in slots:
+            base = origin * self.capacity
+            if math.isnan(minutes.cells[base + origin]):
+                minutes.set(origin, origin, 0.0)
+                km.set(origin, origin, 0.0)
+            row = [slot for slot in slots if math.isnan(minutes.cells[base + slot])]
+            if row:
+                missing[origin] = row
+        return missing
+
+    def store(self, mode, origins, destinations, rows):
+        """Write one Distance Matrix batch; elements without a route are stored as +inf."""
+        minutes, km = self.files(mode)
+        for origin, row in zip(origins, rows):
+            for destination, element in zip(destinations, row):
+                if element:
+                    minutes.set(origin, destination, element['duration']['value'] / 60)
+                    km.set(origin, destination, element['distance']['value'] / 1000)
+                else:
+                    minutes.set(origin, destination, math.inf)
+                    km.set(origin, destination, math.inf)
+
+    def save(self, mode=None, complete=None):
+        """Flush the matrix files and publish the index."""
+        # Modes built earlier must be grown too before the index announces a new capacity
+        for built in self.index['modes']:
+            self.files(built)
+        for minutes, km in self._files.values():
+            minutes.flush()
+            km.flush()
+        if mode is not None:
+            self.index['modes'][mode] = {'complete': complete, 'updated_at': time.time()}
+        self.index['byteorder'] = sys.byteorder
+        write_index(self.directory, self.index)
+
+    def close(self):
+        for minutes, km in self._files.values():
+            minutes.close()
+            km.close()
+        self._files = {}
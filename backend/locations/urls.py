@@ -0,0 +1,17 @@
+from django.urls import path
+
+from . import views
+
+urlpatterns = [
+    path('locations/', views.location_list, name='location-list'),
+    path('catalog/', views.catalog_snapshot, name='catalog-snapshot'),
+    path('search/', views.search, name='search'),
+    path('clusters/', views.map_clusters, name='map-clusters'),
+    path('route/', views.route, name='route'),
+    path('tours/', views.tour, name='tour'),
+    path('nearby/', views.nearby, name='nearby'),
+    path('nearby/feed/', views.nearby_feed, name='nearby-feed'),
+    path('places/details/', views.place_details, name='place-details'),
+    path('commute/', views.commute, name='commute'),
+    path('commute/geometry/', views.route_geometry_view, name='route-geometry'),
+]
@@ -0,0 +1,215 @@
+"""
+Canonical venues shared by catalog entries of different categories.
+
+The same building often appears as several entries (Chicago Cultural
+Center is an Architecture, Films and History location). Entries close to
+each other with similar names are clustered into one Venue, so the
+Distance Matrix and Places lookups for them run once. See the link_venues
+management command.
+"""
+import logging
+import math
+import re
+import unicodedata
+from collections import Counter
+from difflib import SequenceMatcher
+
+from django.db import transaction
+from django.db.models import F
+
+from .catalog import CATEGORY_MODELS, iter_catalog
+from .geo import haversine_km
+from .models import Venue
+from .places import PLACE_DETAILS_FIELDS, store_venue_place_details
+from .routers import use_primary
+from .signals import catalog_changed
+
+
+# Entries further apart than this are never the same venue (metres)
+VENUE_MAX_DISTANCE_M = 75
+# Entries this close only need to share a distinctive word
+VENUE_SAME_SPOT_M = 25
+VENUE_NAME_SIMILARITY = 0.6
+VENUE_SAME_SPOT_NAME_SIMILARITY = 0.3
+NAME_STOPWORDS = {'a', 'an', 'and', 'at', 'of', 'the', 'chicago'}
+METRES_PER_DEGREE = 111_320
+
+
+def logger():
+    return logging.getLogger(__name__)
+
+
+def name_tokens(name):
+    """Lowercase, accent-free words of a name without stopwords."""
+    text = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode().casefold()
+    return {word for word in re.findall(r'\w+', text) if word not in NAME_STOPWORDS}
+
+
+def name_similarity(first, second):
+    """
+    Similarity of two venue names between 0 and 1.
+
+    The larger of the share of the shorter name's words found in the other
+    name and the character similarity of the sorted words, so that both
+    'Chicago Theatre' / 'The Chicago Theater' and 'Pritzker Pavilion' /
+    'Jay Pritzker Pavilion' score high.
+    """
+    first_tokens = name_tokens(first)
+    second_tokens = name_tokens(second)
+    if not first_tokens or not second_tokens:
+        return 0.0
+    containment = len(first_tokens & second_tokens) / min(len(first_tokens), len(second_tokens))
+    ratio = SequenceMatcher(None, ' '.join(sorted(first_tokens)), ' '.join(sorted(second_tokens))).ratio()
+    return max(containment, ratio)
+
+
+def same_venue(distance_m, similarity, max_distance_m=VENUE_MAX_DISTANCE_M, min_similarity=VENUE_NAME_SIMILARITY):
+    if distance_m <= VENUE_SAME_SPOT_M and similarity >= VENUE_SAME_SPOT_NAME_SIMILARITY:
+        return True
+    return distance_m <= max_distance_m and similarity >= min_similarity
+
+
+def cluster_locations(rows, max_distance_m=VENUE_MAX_DISTANCE_M, min_similarity=VENUE_NAME_SIMILARITY):
+    """
+    Group catalog rows that describe the same venue.
+
+    Rows are bucketed on a grid of cells max_distance_m tall so only
+    neighbouring cells are compared (more of them east-west, where the
+    cells are narrower), and matching pairs are merged with union-find.
+
+    Args:
+        rows (list): Catalog row dicts with 'name', 'latitude' and 'longitude'
+        max_distance_m (float): Largest distance between entries of one venue
+        min_similarity (float): Smallest name similarity for entries that are not on the same spot
+
+    Returns:
+        list: Clusters as lists of rows, every row in exactly one cluster
+    """
+    cell_degrees = max_distance_m / METRES_PER_DEGREE
+    parent = list(range(len(rows)))
+
+    def find(node):
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    cells = {}
+    for number, row in enumerate(rows):
+        cell = (math.floor(row['latitude'] / cell_degrees), math.floor(row['longitude'] / cell_degrees))
+        # Longitude cells narrow towards the poles, so more of them span max_distance_m east-west
+        lon_cells = math.ceil(1 / max(math.cos(math.radians(row['latitude'])), 1e-6))
+        for dx in (-1, 0, 1):
+            for dy in range(-lon_cells, lon_cells + 1):
+                for other in cells.get((cell[0] + dx, cell[1] + dy), ()):
+                    candidate = rows[other]
+                    distance_m = haversine_km(row['latitude'], row['longitude'],
+                                              candidate['latitude'], candidate['longitude']) * 1000
+                    if distance_m > max_distance_m:
+                        continue
+                    if same_venue(distance_m, name_similarity(row['name'], candidate['name']),
+                                  max_distance_m, min_similarity):
+                        parent[find(number)] = find(other)
+        cells.setdefault(cell, []).append(number)
+
+    clusters = {}
+    for number, row in enumerate(rows):
+        clusters.setdefault(find(number), []).append(row)
+    return list(clusters.values())
+
+
+def _venue_fields(cluster):
+    """Name (the most common one, then the shortest) and centroid of a cluster."""
+    names = Counter(row['name'] for row in cluster)
+    name = min(names, key=lambda candidate: (-names[candidate], len(candidate), candidate))
+    return {
+        'name': name,
+        'latitude': sum(row['latitude'] for row in cluster) / len(cluster),
+        'longitude': sum(row['longitude'] for row in cluster) / len(cluster),
+    }
+
+
+def _share_place_details(venue_ids):
+    """
+    Give every entry of these venues the most recent Places data known for any of them.
+
+    New venues inherit what their entries were already refreshed with, and
+    entries that joined an existing venue get the venue's data, so nothing
+    is looked up again just because it was relinked.
+    """
+    fields = ('place_details_refreshed_at', *PLACE_DETAILS_FIELDS)
+    latest = {}
+    sources = [Venue.objects.filter(id__in=venue_ids).annotate(venue_key=F('id'))]
+    sources += [model.objects.filter(venue_id__in=venue_ids).annotate(venue_key=F('venue_id'))
+                for model in CATEGORY_MODELS.values()]
+    for queryset in sources:
+        for row in queryset.filter(place_details_refreshed_at__isnull=False).values('venue_key', *fields):
+            current = latest.get(row['venue_key'])
+            if current is None or row['place_details_refreshed_at'] > current['place_details_refreshed_at']:
+                latest[row['venue_key']] = row
+    for venue_id, row in latest.items():
+        store_venue_place_details(venue_id, **{name: row[name] for name in fields})
+
+
+def link_venues(max_distance_m=VENUE_MAX_DISTANCE_M, min_similarity=VENUE_NAME_SIMILARITY, dry_run=False):
+    """
+    Cluster the whole catalog and link the entries that share a venue to it.
+
+    Only venues with more than one entry are stored; entries on their own
+    stay unlinked. Existing venues are kept when their entries still cluster
+    together, so venue ids (and their stored Places data) survive re-runs.
+    Venues left without entries are deleted.
+
+    Args:
+        max_distance_m (float): Largest distance between entries of one venue
+        min_similarity (float): Smallest name similarity for entries that are not on the same spot
+        dry_run (bool): Only count what would change
+
+    Returns:
+        dict: Counts of 'locations', 'venues' (shared venues after linking),
+              'created', 'relinked' and 'deleted'
+    """
+    with use_primary():
+        rows = list(iter_catalog())
+    clusters = [cluster for cluster in cluster_locations(rows, max_distance_m, min_similarity) if len(cluster) > 1]
+    linked = {(row['location_type'], row['id']) for cluster in clusters for row in cluster}
+    stats = {'locations': len(rows), 'venues': len(clusters), 'created': 0, 'relinked': 0, 'deleted': 0}
+
+    with transaction.atomic():
+        claimed = set()
+        links = {location_type: {} for location_type in CATEGORY_MODELS}
+        # Entries that no longer share a venue with anything are unlinked
+        for row in rows:
+            if row['venue_id'] is not None and (row['location_type'], row['id']) not in linked:
+                links[row['location_type']].setdefault(None, []).append(row['id'])
+                stats['relinked'] += 1
+        # Big clusters pick their existing venue first
+        for cluster in sorted(clusters, key=len, reverse=True):
+            current = Counter(row['venue_id'] for row in cluster if row['venue_id'] not in (None, *claimed))
+            fields = _venue_fields(cluster)
+            if current:
+                venue_id = current.most_common(1)[0][0]
+                if not dry_run:
+                    Venue.objects.filter(id=venue_id).update(**fields)
+            else:
+                stats['created'] += 1
+                venue_id = None if dry_run else Venue.objects.create(**fields).id
+            claimed.add(venue_id)
+            for row in cluster:
+                if row['venue_id'] != venue_id or venue_id is None:
+                    links[row['location_type']].setdefault(venue_id, []).append(row['id'])
+                    stats['relinked'] += 1
+
+        used = claimed - {None}
+        stats['deleted'] = Venue.objects.exclude(id__in=used).count()
+        if not dry_run:
+            for location_type, by_venue in links.items():
+                for venue_id, ids in by_venue.items():
+                    CATEGORY_MODELS[location_type].objects.filter(id__in=ids).update(venue_id=venue_id)
+            _share_place_details({venue_id for by_venue in links.values() for venue_id in by_venue} - {None})
+            Venue.objects.exclude(id__in=used).delete()
+
+    if not dry_run and (stats['relinked'] or stats['deleted']):
+        catalog_changed()
+    logger().info(f"Linked {len(linked)} of {stats['locations']} locations to {stats['venues']} shared venues")
+    return stats
@@ -0,0 +1,472 @@
+import hashlib
+import json
+import math
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse, HttpResponseForbidden, HttpResponseNotModified, JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+
+from .api import COMMUTE_MODES, get_route, plan_route
+from .async_api import aget_best_commute_options, aget_nearby_travel_times
+from .catalog import CATALOG_PAGE_SIZE, CATEGORY_MODELS, format_keyset, get_catalog_page, parse_keyset
+from .clusters import get_map_clusters
+from .feed import FEED_DEFAULT_LIMIT, FEED_DEFAULT_RADIUS_KM, get_nearby_feed
+from .geometry import MAX_ZOOM, MIN_ZOOM, route_geometry
+from .metrics import REGISTRY, metrics_allowed
+from .places import get_stored_place_details, nearest_stored_place_details
+from .search import SEARCH_DEFAULT_LIMIT, search_locations
+from .snapshot import choose_encoding, get_catalog_snapshot
+from .spatial import get_spatial_index
+from .tours import DEFAULT_VISIT_MINUTES, MAX_TOUR_MINUTES, TOUR_MODES, recommend_tour
+
+
+ROUTE_MODES = ('walking', 'transit', 'bicycling', 'driving')
+# Most locations a nearby request may send to Distance Matrix
+MAX_NEARBY_LIMIT = 25
+MAX_FEED_LIMIT = 100
+MAX_FEED_RADIUS_KM = 10
+MAX_SEARCH_LIMIT = 50
+# Geometry responses can be reused by the browser for this long (seconds)
+ROUTE_GEOMETRY_MAX_AGE = 60 * 60
+# A snapshot requested with its own version (?v=) never changes
+CATALOG_SNAPSHOT_IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+
+def _bad_request(message):
+    return JsonResponse({'error': message}, status=400)
+
+
+def _json_body(request):
+    try:
+        body = json.loads(request.body or b'{}')
+    except ValueError:
+        raise ValueError("Request body must be JSON")
+    if not isinstance(body, dict):
+        raise ValueError("Request body must be a JSON object")
+    return body
+
+
+def _float_param(request, name, default=None):
+    value = request.GET.get(name)
+    if value in (None, ''):
+        if default is None:
+            raise ValueError(f"{name} is required")
+        return default
+    try:
+        number = float(value)
+    except ValueError:
+        raise ValueError(f"{name} must be a number")
+    if not math.isfinite(number):
+        raise ValueError(f"{name} must be a finite number")
+    return number
+
+
+def _location_type_param(request):
+    location_type = request.GET.get('type') or None
+    if location_type is not None and location_type not in CATEGORY_MODELS:
+        raise ValueError(f"Unknown location type: {location_type}")
+    return location_type
+
+
+def _coordinates(value, name):
+    """Read a {'latitude': .., 'longitude': ..} object from a request body."""
+    try:
+        return float(value['latitude']), float(value['longitude'])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError(f"{name} must have numeric latitude and longitude")
+
+
+@require_GET
+def location_list(request):
+    """
+    List catalog locations one keyset page at a time.
+
+    Query parameters:
+        type: Restrict to one location type ('Architecture', 'Films', 'History', 'Music')
+        fact: Set to 1 to include the fact text
+        after: Cursor returned as 'next' by the previous page
+        limit: Page size (at most 500)
+    """
+    try:
+        location_type = _location_type_param(request)
+        after = parse_keyset(request.GET.get('after'))
+        limit = min(int(request.GET.get('limit', 100)), CATALOG_PAGE_SIZE)
+    except ValueError as e:
+        return _bad_request(str(e))
+    if limit < 1:
+        return _bad_request("limit must be positive")
+
+    rows, next_after = get_catalog_page(
+        location_type=location_type,
+        include_fact=request.GET.get('fact') == '1',
+        after=after,
+        limit=limit,
+    )
+    return JsonResponse({'results': rows, 'next': format_keyset(next_after)})
+
+
+def _entity_tags(header):
+    """Entity tags listed in an If-None-Match header, without W/ prefixes or quotes."""
+    return {tag.strip().removeprefix('W/').strip('"') for tag in (header or '').split(',') if tag.strip()}
+
+
+@require_GET
+def catalog_snapshot(request):
+    """
+    The whole catalog (every location with its fact) as one precompressed JSON document.
+
+    The body only changes when a location is written. Revalidate with
+    If-None-Match to get a 304, or request ?v=<version> (the 'version' in the
+    body and the X-Catalog-Version header) for a response that can be cached
+    for good.
+    """
+    snapshot = get_catalog_snapshot()
+    encoding = choose_encoding(request.headers.get('Accept-Encoding'), snapshot.bodies)
+    # Each content coding is a different representation and gets its own strong tag
+    etag = snapshot.etag if encoding == 'identity' else f"{snapshot.etag}-{encoding}"
+    # Every coding holds the same JSON, so a tag for any of them is still current
+    current = {snapshot.etag} | {f"{snapshot.etag}-{coding}" for coding in snapshot.bodies}
+    requested = _entity_tags(request.headers.get('If-None-Match'))
+    if '*' in requested or requested & current:
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(snapshot.bodies[encoding], content_type='application/json')
+        if encoding != 'identity':
+            response['Content-Encoding'] = encoding
+    response['ETag'] = f'"{etag}"'
+    response['Vary'] = 'Accept-Encoding'
+    response['X-Catalog-Version'] = str(snapshot.version)
+    if request.GET.get('v') == str(snapshot.version):
+        response['Cache-Control'] = f"public, max-age={CATALOG_SNAPSHOT_IMMUTABLE_MAX_AGE}, immutable"
+    else:
+        response['Cache-Control'] = 'public, no-cache'
+    return response
+
+
+@require_GET
+def search(request):
+    """
+    Search location names and facts; the last word matches as a prefix for typeahead.
+
+    Query parameters:
+        q: Search text
+        type: Restrict to one location type
+        limit: Most results (default 10, at most 50)
+        fact: Set to 1 to include the fact text
+        lat, lon: Only return matches near this position, nearest first
+        radius_km: Radius of the "near me" search (default 2)
+    """
+    query = request.GET.get('q', '').strip()
+    if not query:
+        return _bad_request("q is required")
+    try:
+        location_type = _location_type_param(request)
+        limit = min(int(request.GET.get('limit', SEARCH_DEFAULT_LIMIT)), MAX_SEARCH_LIMIT)
+        latitude = longitude = radius_km = None
+        if request.GET.get('lat') or request.GET.get('lon'):
+            latitude = _float_param(request, 'lat')
+            longitude = _float_param(request, 'lon')
+            radius_km = request.GET.get('radius_km')
+            radius_km = min(float(radius_km), MAX_FEED_RADIUS_KM) if radius_km else None
+    except ValueError as e:
+        return _bad_request(str(e))
+    if limit < 1 or (radius_km is not None and radius_km <= 0):
+        return _bad_request("limit and radius_km must be positive")
+
+    results = search_locations(
+        query,
+        location_type=location_type,
+        limit=limit,
+        include_fact=request.GET.get('fact') == '1',
+        latitude=latitude,
+        longitude=longitude,
+        radius_km=radius_km,
+    )
+    return JsonResponse({'results': results})
+
+
+@require_GET
+def map_clusters(request):
+    """
+    Marker clusters for a map viewport.
+
+    Query parameters:
+        south, west, north, east: Viewport bounds (west > east crosses the antimeridian)
+        zoom: Map zoom level
+        type: Restrict to one location type
+
+    Each cluster has a 'count', a centroid, per-type counts, the zoom at
+    which it splits up and a representative location. Past the deepest
+    cluster level every location comes back on its own with a count of 1.
+    The ETag changes only with the catalog and the query, so revalidating an
+    unchanged viewport costs a 304.
+    """
+    try:
+        south, west, north, east = (_float_param(request, name) for name in ('south', 'west', 'north', 'east'))
+        zoom = int(_float_param(request, 'zoom'))
+        location_type = _location_type_param(request)
+    except ValueError as e:
+        return _bad_request(str(e))
+    if not (-90 <= south <= north <= 90 and -180 <= west <= 180 and -180 <= east <= 180):
+        return _bad_request("Bounds must be valid coordinates with south <= north")
+    zoom = max(MIN_ZOOM, min(MAX_ZOOM, zoom))
+
+    payload = get_map_clusters(south, west, north, east, zoom, location_type)
+    query = f"{payload['version']}|{south},{west},{north},{east}|{zoom}|{location_type}"
+    etag = hashlib.sha1(query.encode()).hexdigest()[:20]
+    if etag in _entity_tags(request.headers.get('If-None-Match')):
+        response = HttpResponseNotModified()
+    else:
+        response = JsonResponse(payload)
+    response['ETag'] = f'"{etag}"'
+    response['Cache-Control'] = 'public, no-cache'
+    return response
+
+
+@csrf_exempt
+@require_POST
+def route(request):
+    """
+    Plan the visiting order for a set of locations.
+
+    Body:
+        {"origin": {"latitude": .., "longitude": ..},
+         "stops": [{"location_type": "Architecture", "id": 3}, ...],
+         "mode": "walking"}
+    """
+    try:
+        body = _json_body(request)
+        origin_lat, origin_lon = _coordinates(body.get('origin'), 'origin')
+        stops = [(stop['location_type'], int(stop['id'])) for stop in body.get('stops') or []]
+    except (KeyError, TypeError, ValueError) as e:
+        return _bad_request(str(e) if isinstance(e, ValueError) else "Each stop needs location_type and id")
+    mode = body.get('mode', 'walking')
+    if mode not in ROUTE_MODES:
+        return _bad_request(f"Unknown mode: {mode}")
+    if not stops:
+        return _bad_request("At least one stop is required")
+
+    try:
+        plan = plan_route(origin_lat, origin_lon, stops, mode=mode)
+    except ValueError as e:
+        return _bad_request(str(e))
+    return JsonResponse(plan)
+
+
+@csrf_exempt
+@require_POST
+def tour(request):
+    """
+    Recommend the best stops to visit in the time available, in visiting order.
+
+    Body:
+        {"origin": {"latitude": .., "longitude": ..},
+         "minutes": 120,
+         "preferences": {"Architecture": 3, "Music": 1},
+         "mode": "walking",
+         "visit_minutes": 15}
+    """
+    try:
+        body = _json_body(request)
+        origin_lat, origin_lon = _coordinates(body.get('origin'), 'origin')
+        minutes = float(body.get('minutes'))
+        visit_minutes = float(body.get('visit_minutes', DEFAULT_VISIT_MINUTES))
+        preferences = {
+            location_type: float(weight) for location_type, weight in (body.get('preferences') or {}).items()
+        }
+    except (AttributeError, TypeError, ValueError) as e:
+        return _bad_request(str(e) if isinstance(e, ValueError) else "minutes and preference weights must be numbers")
+    mode = body.get('mode', 'walking')
+    if mode not in TOUR_MODES:
+        return _bad_request(f"Unknown mode: {mode}")
+    unknown = set(preferences) - set(CATEGORY_MODELS)
+    if unknown:
+        return _bad_request(f"Unknown location type: {', '.join(sorted(unknown))}")
+    if not any(weight > 0 for weight in preferences.values()):
+        return _bad_request("At least one preference weight must be positive")
+    if not 0 < minutes <= MAX_TOUR_MINUTES:
+        return _bad_request(f"minutes must be between 0 and {MAX_TOUR_MINUTES}")
+    if visit_minutes < 0:
+        return _bad_request("visit_minutes must not be negative")
+
+    return JsonResponse(recommend_tour(
+        origin_lat, origin_lon, minutes, preferences, mode=mode, visit_minutes=visit_minutes
+    ))
+
+
+@require_GET
+async def nearby(request):
+    """
+    Rank every location by distance and add real travel times for the nearest ones.
+
+    Query parameters:
+        lat, lon: User's position
+        type: Restrict to one location type
+        limit: How many of the nearest locations get Distance Matrix times (default 10)
+        radius_km: Only look up travel times within this distance
+        details: Set to 1 to also include stored place details for those locations
+    """
+    try:
+        latitude = _float_param(request, 'lat')
+        longitude = _float_param(request, 'lon')
+        location_type = _location_type_param(request)
+        limit = min(int(request.GET.get('limit', 10)), MAX_NEARBY_LIMIT)
+        radius_km = request.GET.get('radius_km')
+        radius_km = float(radius_km) if radius_km else None
+    except ValueError as e:
+        return _bad_request(str(e))
+    if limit < 1:
+        return _bad_request("limit must be positive")
+
+    results = await aget_nearby_travel_times(
+        latitude, longitude, location_type=location_type, limit=limit, radius_km=radius_km
+    )
+    if request.GET.get('details') == '1':
+        enriched = [result for result in results if 'travel_mode' in result]
+        details = await sync_to_async(get_stored_place_details)([
+            (result['location_type'], result['location_id']) for result in enriched
+        ])
+        for result in enriched:
+            result['place_details'] = details[(result['location_type'], result['location_id'])]
+    return JsonResponse({'results': results})
+
+
+@require_GET
+def nearby_feed(request):
+    """
+    Poll-friendly nearby list that only sends what changed since the last poll.
+
+    Query parameters:
+        lat, lon: User's position
+        client: Client identifier (or the X-Client-Id header); one is issued when missing
+        type: Restrict to one location type
+        radius_km: Search radius (default 1.5)
+        limit: Most locations to return (default 20)
+
+    Send the last ETag as If-None-Match: an unchanged list returns 304, a
+    changed one returns {'entered', 'left', 'order'} relative to it.
+    """
+    try:
+        latitude = _float_param(request, 'lat')
+        longitude = _float_param(request, 'lon')
+        location_type = _location_type_param(request)
+        radius_km = min(_float_param(request, 'radius_km', FEED_DEFAULT_RADIUS_KM), MAX_FEED_RADIUS_KM)
+        limit = min(int(request.GET.get('limit', FEED_DEFAULT_LIMIT)), MAX_FEED_LIMIT)
+    except ValueError as e:
+        return _bad_request(str(e))
+    if limit < 1 or radius_km <= 0:
+        return _bad_request("limit and radius_km must be positive")
+    client_id = (request.GET.get('client') or request.headers.get('X-Client-Id') or '')[:64] or uuid.uuid4().hex
+
+    payload, etag = get_nearby_feed(
+        client_id, latitude, longitude,
+        location_type=location_type,
+        radius_km=radius_km,
+        limit=limit,
+        if_none_match=request.headers.get('If-None-Match'),
+    )
+    if payload is None:
+        response = HttpResponseNotModified()
+    else:
+        payload['client'] = client_id
+        response = JsonResponse(payload)
+    response['ETag'] = etag
+    response['X-Client-Id'] = client_id
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@require_GET
+def place_details(request):
+    """
+    Opening hours, rating and address of a location.
+
+    The data is stored on the location by the refresh_place_details command
+    and is_open is worked out from the stored weekly schedule.
+
+    Query parameters:
+        type, id: The location
+        lat, lon: Alternatively, the location's coordinates
+    """
+    try:
+        if request.GET.get('id'):
+            location_type = _location_type_param(request)
+            if location_type is None:
+                raise ValueError("type is required with id")
+            location = (location_type, int(request.GET['id']))
+            return JsonResponse(get_stored_place_details([location])[location])
+        latitude = _float_param(request, 'lat')
+        longitude = _float_param(request, 'lon')
+    except ValueError as e:
+        return _bad_request(str(e))
+    return JsonResponse(nearest_stored_place_details(get_spatial_index(), latitude, longitude))
+
+
+@require_GET
+async def commute(request):
+    """Best commute between ?origin_lat=&origin_lon= and ?destination_lat=&destination_lon=."""
+    try:
+        points = [
+            _float_param(request, name)
+            for name in ('origin_lat', 'origin_lon', 'destination_lat', 'destination_lon')
+        ]
+    except ValueError as e:
+        return _bad_request(str(e))
+    return JsonResponse(await aget_best_commute_options(*points))
+
+
+@require_GET
+def route_geometry_view(request):
+    """
+    Route line between two points, simplified for a map zoom level.
+
+    Query parameters:
+        origin_lat, origin_lon, destination_lat, destination_lon: Route end points
+        mode: 'transit' or 'walking' (default walking)
+        zoom: Map zoom level the line is drawn at (default 14)
+        format: 'polyline' (JSON with a Google encoded polyline, the default) or
+                'binary' (little-endian int32 lat/lon deltas in 1e-5 degrees,
+                the first pair absolute)
+    """
+    try:
+        points = [
+            _float_param(request, name)
+            for name in ('origin_lat', 'origin_lon', 'destination_lat', 'destination_lon')
+        ]
+        zoom = int(_float_param(request, 'zoom', 14))
+    except ValueError as e:
+        return _bad_request(str(e))
+    mode = request.GET.get('mode', 'walking')
+    if mode not in COMMUTE_MODES:
+        return _bad_request(f"Unknown mode: {mode}")
+    output = request.GET.get('format', 'polyline')
+    if output not in ('polyline', 'binary'):
+        return _bad_request(f"Unknown format: {output}")
+    zoom = max(MIN_ZOOM, min(MAX_ZOOM, zoom))
+
+    route = get_route(*points, mode)
+    if not route:
+        return JsonResponse({'error': "No route found"}, status=404)
+    geometry = route_geometry(route['polyline'])
+    if output == 'binary':
+        response = HttpResponse(geometry.deltas(zoom), content_type='application/octet-stream')
+        response['X-Point-Count'] = len(geometry.indices(zoom))
+    else:
+        response = JsonResponse({
+            'mode': mode,
+            'zoom': zoom,
+            'points': len(geometry.indices(zoom)),
+            'polyline': geometry.polyline(zoom),
+        })
+    response['Cache-Control'] = f"private, max-age={ROUTE_GEOMETRY_MAX_AGE}"
+    return response
+
+
+@require_GET
+def metrics(request):
+    """Prometheus text exposition of this process's metrics, for allowed clients only."""
+    if not metrics_allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')